@@ -26,6 +26,10 @@ def create_app():
     # 启用CORS
     CORS(app)
     
+    # 安装了orjson时使用orjson序列化响应
+    from app.utils.json_provider import init_json_provider
+    init_json_provider(app)
+    
     # 注册路由
     from app.routes import bp
     app.register_blueprint(bp)
@@ -169,6 +169,10 @@ class ConfigManager:
         """检查是否启用静态模式（强制使用静态配置文件）"""
         return self.get_env_var('USE_STATIC_MODE', 'false').lower() == 'true'
     
+    def is_debug_tracebacks_enabled(self) -> bool:
+        """检查是否记录处理失败时的完整堆栈"""
+        return self.get_env_var('DEBUG_TRACEBACKS', 'false').lower() == 'true'
+    
     def get_notification_config(self) -> Dict[str, Any]:
         """获取通知配置"""
         try:
@@ -325,6 +329,39 @@ class ConfigManager:
             'timeout': 300  # 5分钟超时
         }
     
+    def get_project_concurrency(self) -> int:
+        """获取同时处理的项目数量"""
+        return max(1, int(self.get_env_var('PROJECT_CONCURRENCY', '4')))
+    
+    def get_file_concurrency(self) -> int:
+        """获取同步处理模式下同时处理的文件数量"""
+        return max(1, int(self.get_env_var('FILE_CONCURRENCY', '8')))
+    
+    def get_worker_concurrency(self) -> int:
+        """获取后台任务并发数，MockCelery和Celery worker共用，默认为CPU核数"""
+        return max(1, int(self.get_env_var('CODEREVIEW_CONCURRENCY', str(os.cpu_count() or 4))))
+    
+    def get_mock_celery_workers(self) -> int:
+        """获取MockCelery后台任务线程池的最大线程数，未单独配置时使用CODEREVIEW_CONCURRENCY"""
+        workers = self.get_env_var('MOCK_CELERY_WORKERS')
+        return max(1, int(workers)) if workers else self.get_worker_concurrency()
+    
+    def get_mock_celery_queue_size(self) -> int:
+        """获取MockCelery排队等待的任务数量上限，超出时由提交方直接执行"""
+        return max(0, int(self.get_env_var('MOCK_CELERY_QUEUE_SIZE', '100')))
+    
+    def get_llm_batch_size(self) -> int:
+        """获取单次LLM请求合并的最大文件数量，1表示不合并"""
+        return max(1, int(self.get_env_var('LLM_BATCH_SIZE', '4')))
+    
+    def get_llm_batch_max_chars(self) -> int:
+        """获取合并到同一次LLM请求中的补丁总字符数上限"""
+        return max(0, int(self.get_env_var('LLM_BATCH_MAX_CHARS', '12000')))
+    
+    def get_llm_cache_ttl(self) -> int:
+        """获取LLM结果缓存有效期（秒），0表示不缓存"""
+        return max(0, int(self.get_env_var('LLM_CACHE_TTL', '604800')))
+    
     def get_server_host(self) -> str:
         """获取服务器主机"""
         return self.get_env_var('HOST', '0.0.0.0')
@@ -10,6 +10,30 @@ import os
 from pathlib import Path
 from typing import Optional, Union
 from datetime import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 当前上下文正在处理的任务ID，由task_context绑定，日志输出时自动带上
+_current_task_id: ContextVar[str] = ContextVar('task_id', default='-')
+
+
+class _TaskIdFilter(logging.Filter):
+    """为日志记录附加当前任务ID"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.task_id = _current_task_id.get()
+        return True
+
+
+@contextmanager
+def task_context(task_id: str):
+    """在上下文内绑定任务ID，期间的日志自动带上该任务ID"""
+    token = _current_task_id.set(task_id)
+    try:
+        yield
+    finally:
+        _current_task_id.reset(token)
+
 
 class CodeReviewLogger:
     """代码审查系统日志管理器"""
@@ -57,20 +81,23 @@ class CodeReviewLogger:
         
         # 创建格式器
         detailed_formatter = logging.Formatter(
-            '%(asctime)s | %(name)s | %(levelname)-8s | %(filename)s:%(lineno)d | %(message)s',
+            '%(asctime)s | %(name)s | %(levelname)-8s | %(task_id)s | %(filename)s:%(lineno)d | %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
         simple_formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(message)s',
+            '%(asctime)s | %(levelname)-8s | %(task_id)s | %(message)s',
             datefmt='%H:%M:%S'
         )
         
+        task_id_filter = _TaskIdFilter()
+        
         # 添加控制台处理器
         if self.enable_console:
             console_handler = logging.StreamHandler(sys.stdout)
             console_handler.setLevel(self.log_level)
             console_handler.setFormatter(simple_formatter)
+            console_handler.addFilter(task_id_filter)
             self.logger.addHandler(console_handler)
         
         # 添加文件处理器（带轮转）
@@ -85,6 +112,7 @@ class CodeReviewLogger:
             )
             file_handler.setLevel(self.log_level)
             file_handler.setFormatter(detailed_formatter)
+            file_handler.addFilter(task_id_filter)
             self.logger.addHandler(file_handler)
             
             # 错误日志文件
@@ -97,6 +125,7 @@ class CodeReviewLogger:
             )
             error_handler.setLevel(logging.ERROR)
             error_handler.setFormatter(detailed_formatter)
+            error_handler.addFilter(task_id_filter)
             self.logger.addHandler(error_handler)
     
     def debug(self, message: str, *args, **kwargs):
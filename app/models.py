@@ -19,7 +19,15 @@ class TaskInfo:
     result: Optional[Dict[str, Any]] = None
 
 
-@dataclass
+@dataclass(slots=True)
+class FileTask:
+    """异步处理的单个文件"""
+    filename: str
+    filestatus: Dict[str, Any]
+    diff_content: str
+
+
+@dataclass(slots=True)
 class CodeIssue:
     """代码问题"""
     type: str
@@ -30,7 +38,7 @@ class CodeIssue:
     language_specific: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ReviewReport:
     """审查报告"""
     project_name: str
@@ -43,7 +51,7 @@ class ReviewReport:
     diff_content: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class UnitTestCase:
     """单元测试用例"""
     project_name: str
@@ -52,7 +60,7 @@ class UnitTestCase:
     description: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ScenarioTestCase:
     """场景测试用例"""
     case_id: str
@@ -1,17 +1,22 @@
 # -*- coding: utf-8 -*-
 from flask import Blueprint, request, jsonify
-from app.tasks import review_code_task
+from app.tasks import review_code_task, clear_config_cache
+from app.task_processor import TaskStatusManager, _task_file_lock, _write_task_file
 from app.config_manager import config_manager
+from app.utils.cache_manager import global_cache
 from app.logger import info, warning, error
 from datetime import datetime
+from operator import attrgetter
 import yaml
 import os
+from pathlib import Path
 import uuid
 import requests
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
 from app.utils.git_api import GitAPIClient
+from app.task_state import TaskStateManager
 git_client = GitAPIClient()
 
 @bp.route('/health', methods=['GET'])
@@ -94,8 +99,6 @@ def get_branches(system_name):
 @bp.route('/systems', methods=['GET'])
 def get_systems():
     """获取所有系统列表"""
-    from app.utils.cache_manager import global_cache
-    
     # 缓存键
     cache_key = 'systems_list'
     force_refresh = request.args.get('force_refresh', 'false').lower() == 'true'
@@ -339,11 +342,11 @@ def create_multi_review():
                 'is_main_task': (i == 0)    # 标记主任务
             }
             
-            # 保存任务文件
+            # 保存任务文件，恢复的任务需先删除上次残留的中止标记
             task_file = f'data/tasks/{task_id}.yaml'
             os.makedirs(os.path.dirname(task_file), exist_ok=True)
-            with open(task_file, 'w', encoding='utf-8') as f:
-                yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+            TaskStatusManager.clear_abort_marker(task_id)
+            _save_task_file(task_file, task_data)
             
             # 启动异步任务
             try:
@@ -363,8 +366,7 @@ def create_multi_review():
                 # 更新任务状态为失败
                 task_data['status'] = 'failed'
                 task_data['error'] = str(task_error)
-                with open(task_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+                _save_task_file(task_file, task_data)
         
         # 返回主任务信息
         if main_task_id:
@@ -421,11 +423,11 @@ def _create_single_review(system_name: str, branch_name: str):
         'multi_system': False
     }
     
-    # 保存任务文件
+    # 保存任务文件，恢复的任务需先删除上次残留的中止标记
     task_file = f'data/tasks/{task_id}.yaml'
     os.makedirs(os.path.dirname(task_file), exist_ok=True)
-    with open(task_file, 'w', encoding='utf-8') as f:
-        yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+    TaskStatusManager.clear_abort_marker(task_id)
+    _save_task_file(task_file, task_data)
     
     # 启动任务
     try:
@@ -436,8 +438,7 @@ def _create_single_review(system_name: str, branch_name: str):
     except Exception as task_error:
         task_data['status'] = 'failed'
         task_data['error'] = str(task_error)
-        with open(task_file, 'w', encoding='utf-8') as f:
-            yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+        _save_task_file(task_file, task_data)
     
     return jsonify({
         'task_id': task_id,
@@ -475,17 +476,14 @@ def get_task_result(task_id):
         with open(task_file, 'r', encoding='utf-8') as f:
             task_data = yaml.safe_load(f)
         
-        # 尝试加载状态文件
-        state_file = os.path.join('data', 'tasks', f'{task_id}_state.yaml')
+        # 尝试加载状态文件（快照及尚未合并的增量）
         file_states = {}
-        if os.path.exists(state_file):
-            try:
-                with open(state_file, 'r', encoding='utf-8') as f:
-                    state_data = yaml.safe_load(f) or {}
-                file_states = state_data.get('files', {})
+        try:
+            file_states = TaskStateManager(task_id).get_file_states()
+            if file_states:
                 info(f"加载了任务 {task_id} 的状态文件，包含 {len(file_states)} 个文件状态")
-            except Exception as e:
-                warning(f"加载状态文件失败: {e}")
+        except Exception as e:
+            warning(f"加载状态文件失败: {e}")
         
         # 将状态信息添加到任务数据中
         task_data['file_states'] = file_states
@@ -509,40 +507,44 @@ def abort_task(task_id):
         if not os.path.exists(task_file):
             return jsonify({'error': 'Task not found'}), 404
         
-        # 读取任务数据
-        with open(task_file, 'r', encoding='utf-8') as f:
-            task_data = yaml.safe_load(f)
-        
-        # 检查任务是否可以中止
-        current_status = task_data.get('status')
-        if current_status not in ['pending', 'processing']:
-            if current_status == 'completed':
-                return jsonify({'error': '任务已完成，无法中止'}), 400
-            elif current_status == 'failed':
-                return jsonify({'error': '任务已失败，无法中止'}), 400
-            elif current_status == 'aborted':
-                return jsonify({'error': '任务已中止'}), 400
-            else:
-                return jsonify({'error': f'任务状态为"{current_status}"，无法中止'}), 400
-        
-        # 更新任务状态为已中止
-        task_data['status'] = 'aborted'
-        task_data['updated_at'] = datetime.now().isoformat()
-        
-        # 添加中止原因到debug_log
-        if 'debug_log' not in task_data:
-            task_data['debug_log'] = []
-        task_data['debug_log'].append(f"{datetime.now().isoformat()}: 任务被用户手动中止")
-        
-        # 设置错误结果
-        task_data['result'] = {
-            'error': '任务被用户手动中止',
-            'aborted_by_user': True
-        }
+        # 读改写期间持有任务文件锁，避免与处理器的状态写入交错
+        with _task_file_lock(task_id):
+            # 读取任务数据
+            with open(task_file, 'r', encoding='utf-8') as f:
+                task_data = yaml.safe_load(f)
+            
+            # 检查任务是否可以中止
+            current_status = task_data.get('status')
+            if current_status not in ['pending', 'processing']:
+                if current_status == 'completed':
+                    return jsonify({'error': '任务已完成，无法中止'}), 400
+                elif current_status == 'failed':
+                    return jsonify({'error': '任务已失败，无法中止'}), 400
+                elif current_status == 'aborted':
+                    return jsonify({'error': '任务已中止'}), 400
+                else:
+                    return jsonify({'error': f'任务状态为"{current_status}"，无法中止'}), 400
+            
+            # 更新任务状态为已中止
+            task_data['status'] = 'aborted'
+            task_data['updated_at'] = datetime.now().isoformat()
+            
+            # 添加中止原因到debug_log
+            if 'debug_log' not in task_data:
+                task_data['debug_log'] = []
+            task_data['debug_log'].append(f"{datetime.now().isoformat()}: 任务被用户手动中止")
+            
+            # 设置错误结果
+            task_data['result'] = {
+                'error': '任务被用户手动中止',
+                'aborted_by_user': True
+            }
+            
+            # 保存更新后的任务数据
+            _save_task_file(task_file, task_data)
         
-        # 保存更新后的任务数据
-        with open(task_file, 'w', encoding='utf-8') as f:
-            yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+        # 创建中止标记文件，处理器无需解析YAML即可感知中止
+        Path(os.path.join('data', 'tasks', f'{task_id}.aborted')).touch()
         
         info(f"任务 {task_id} 被用户手动中止")
         
@@ -591,6 +593,12 @@ def list_tasks():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _save_task_file(task_file: str, task_data: dict):
+    """与处理器共用任务文件锁和原子写入，避免与状态更新、调试日志合并互相覆盖"""
+    task_file = Path(task_file)
+    with _task_file_lock(task_file.stem):
+        _write_task_file(task_file, task_data)
+
 def _find_running_task(system_name: str, branch_name: str):
     """查找正在执行的相同系统和分支的任务"""
     try:
@@ -653,12 +661,20 @@ def _find_failed_task(system_name: str, branch_name: str):
 
 # ============ 通知管理相关路由 ============
 
+def _notification_result_to_dict(result) -> dict:
+    """将通知发送结果转换为响应字典"""
+    return {
+        'provider': result.provider,
+        'success': result.success,
+        'message': result.message,
+        'timestamp': result.timestamp
+    }
+
+
 @bp.route('/notifications/config', methods=['GET'])
 def get_notification_config():
     """获取通知公开配置"""
     try:
-        from app.utils.cache_manager import global_cache
-        
         # 尝试从缓存获取
         cache_key = 'notification_config'
         cached_config = global_cache.get(cache_key)
@@ -717,8 +733,8 @@ def update_notification_config():
         
         if success:
             # 清除缓存
-            from app.utils.cache_manager import global_cache
             global_cache.delete('notification_config')
+            clear_config_cache()
             
             # 重新加载通知管理器
             from .utils.notification_manager import notification_manager
@@ -767,21 +783,13 @@ def test_notification():
         results = notification_manager.send_notification_sync(provider, recipients, message)
         
         # 处理结果
-        success_count = sum(1 for result in results if result.success)
+        success_count = sum(map(attrgetter('success'), results))
         total_count = len(results)
         
         response_data = {
             'success': success_count > 0,
             'message': f'发送完成：{success_count}/{total_count} 成功',
-            'results': [
-                {
-                    'provider': result.provider,
-                    'success': result.success,
-                    'message': result.message,
-                    'timestamp': result.timestamp
-                }
-                for result in results
-            ]
+            'results': list(map(_notification_result_to_dict, results))
         }
         
         return jsonify(response_data)
@@ -853,31 +861,54 @@ def send_custom_notification():
             level=notification_level
         )
         
-        # 发送通知
-        results = notification_manager.send_notification_sync(providers, recipients, message)
+        # 提交后台发送，不阻塞请求
+        ticket_id = notification_manager.submit_notification(providers, recipients, message)
+        
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'ticket_id': ticket_id,
+            'message': '通知已加入发送队列'
+        }), 202
+        
+    except Exception as e:
+        error(f"发送自定义通知失败: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/notifications/send/<ticket_id>', methods=['GET'])
+def get_custom_notification_status(ticket_id):
+    """查询自定义通知的发送结果"""
+    try:
+        from .utils.notification_manager import notification_manager
+        
+        ticket = notification_manager.get_ticket(ticket_id)
+        if ticket is None:
+            return jsonify({'success': False, 'error': '发送记录不存在'}), 404
+        
+        if ticket['status'] == 'pending':
+            return jsonify({
+                'success': True,
+                'ticket_id': ticket_id,
+                'status': 'pending',
+                'message': '通知发送中'
+            })
         
         # 处理结果
-        success_count = sum(1 for result in results if result.success)
+        results = ticket['results']
+        success_count = sum(map(attrgetter('success'), results))
         total_count = len(results)
         
-        response_data = {
+        return jsonify({
             'success': success_count > 0,
+            'ticket_id': ticket_id,
+            'status': ticket['status'],
             'message': f'发送完成：{success_count}/{total_count} 成功',
-            'results': [
-                {
-                    'provider': result.provider,
-                    'success': result.success,
-                    'message': result.message,
-                    'timestamp': result.timestamp
-                }
-                for result in results
-            ]
-        }
-        
-        return jsonify(response_data)
+            'results': list(map(_notification_result_to_dict, results))
+        })
         
     except Exception as e:
-        error(f"发送自定义通知失败: {e}")
+        error(f"查询通知发送结果失败: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -903,7 +934,6 @@ def add_repository():
         
         if success:
             # 清除系统列表缓存
-            from app.utils.cache_manager import global_cache
             global_cache.delete('systems_list')
             
             info(f"用户添加了新系统: {data.get('name')}")
@@ -924,7 +954,6 @@ def delete_repository(repo_id):
         
         if success:
             # 清除系统列表缓存
-            from app.utils.cache_manager import global_cache
             global_cache.delete('systems_list')
             
             info(f"用户删除了系统: {repo_id}")
@@ -1,18 +1,115 @@
 """
 统计模块：用于计算和分析代码审查、单元测试、场景测试的统计信息
 """
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Any, Mapping, Optional, Set, Tuple
+from dataclasses import dataclass, field, fields, is_dataclass
 from collections import Counter, defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+import hashlib
+import json
+import os
 import re
 from datetime import datetime
 
+from .utils.cache_manager import LRUCache
+
+# 参与统计的结果分区
+_SECTIONS = ('review_results', 'unit_cases', 'scenario_cases')
+
+# 严重程度与优先级顺序
+_SEVERITY_ORDER = ('Critical', 'High', 'Medium', 'Low')
+_PRIORITY_ORDER = ('High', 'Medium', 'Low')
+
+# 单元测试代码分析正则
+_ASSERTION_RE = re.compile(r'\bassert\w*\(|\bassertThat\(|\bexpected?\(', re.IGNORECASE)
+_MOCK_RE = re.compile(r'\bmock\w*\(|\bMock\w*\(|\b@mock\b', re.IGNORECASE)
+_TEST_METHOD_RE = re.compile(r'\bdef test_|\btest\w*\(|\b@Test\b', re.IGNORECASE)
+
+# 场景类型检测关键词，编译为单个正则，命中任一关键词即返回
+_BUSINESS_KEYWORDS_RE = re.compile('|'.join(['用户', '业务', '流程', '操作', '交互', '场景']))
+_INTEGRATION_KEYWORDS_RE = re.compile('|'.join(['集成', '接口', 'api', '服务', '系统', '数据库']))
+
+# 文件扩展名 -> 编程语言（只读，所有计算器实例共享）
+_LANGUAGE_EXTENSIONS = MappingProxyType({
+    '.py': 'Python',
+    '.js': 'JavaScript',
+    '.ts': 'TypeScript', 
+    '.jsx': 'React JSX',
+    '.tsx': 'React TSX',
+    '.java': 'Java',
+    '.go': 'Go',
+    '.php': 'PHP',
+    '.rb': 'Ruby',
+    '.cpp': 'C++',
+    '.c': 'C',
+    '.cs': 'C#',
+    '.swift': 'Swift',
+    '.kt': 'Kotlin',
+    '.rs': 'Rust',
+    '.scala': 'Scala',
+    '.sh': 'Shell',
+    '.sql': 'SQL',
+    '.html': 'HTML',
+    '.css': 'CSS',
+    '.scss': 'SCSS',
+    '.less': 'LESS',
+    '.vue': 'Vue',
+    '.yaml': 'YAML',
+    '.yml': 'YAML',
+    '.json': 'JSON',
+    '.xml': 'XML',
+    '.md': 'Markdown'
+})
+
+# 总体统计结果缓存（按result_data内容摘要）
+_overall_stats_cache = LRUCache(capacity=128)
+
+def _result_data_digest(result_data: Dict[str, Any]) -> Optional[str]:
+    """计算result_data的内容摘要，无法序列化时返回None（不缓存）"""
+    if not result_data:
+        return None
+    try:
+        payload = json.dumps(result_data, sort_keys=True, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+@lru_cache(maxsize=1024)
+def _detect_language(filename: str) -> str:
+    """根据文件名检测编程语言，同名文件只解析一次"""
+    _, ext = os.path.splitext(filename.lower())
+    return _LANGUAGE_EXTENSIONS.get(ext, 'Unknown')
+
+def _quality_score(critical: int, high: int, medium: int, low: int,
+                   unit_count: int, scenario_count: int) -> float:
+    """
+    根据问题数和测试数计算代码质量得分 (0-100)
+    
+    只接收数值参数，批量计算时可直接传入各报告的计数，无需构造统计对象
+    """
+    score = 100.0
+    
+    # 根据问题严重程度扣分
+    score -= critical * 15
+    score -= high * 8
+    score -= medium * 3
+    score -= low * 1
+    
+    # 根据测试覆盖度加分
+    if unit_count > 0:
+        score += min(10, unit_count * 2)
+    if scenario_count > 0:
+        score += min(10, scenario_count * 1.5)
+    
+    return max(0.0, min(100.0, score))
+
 @dataclass
 class StatisticsData:
     """统计数据基类"""
     total_count: int = 0
-    category_counts: Dict[str, int] = None
-    severity_counts: Dict[str, int] = None
+    category_counts: Mapping[str, int] = None
+    severity_counts: Mapping[str, int] = None
     
     def __post_init__(self):
         if self.category_counts is None:
@@ -27,29 +124,25 @@ class ReviewStatistics(StatisticsData):
     high_issues: int = 0
     medium_issues: int = 0
     low_issues: int = 0
-    languages_detected: List[str] = None
+    languages_detected: Set[str] = field(default_factory=set)
     most_common_issues: List[Tuple[str, int]] = None
     files_reviewed: int = 0
     lines_reviewed: int = 0
     
     def __post_init__(self):
         super().__post_init__()
-        if self.languages_detected is None:
-            self.languages_detected = []
         if self.most_common_issues is None:
             self.most_common_issues = []
 
 @dataclass
 class TestStatistics(StatisticsData):
     """测试统计基类"""
-    frameworks_used: List[str] = None
+    frameworks_used: Set[str] = field(default_factory=set)
     test_methods_count: int = 0
     complexity_levels: Dict[str, int] = None
     
     def __post_init__(self):
         super().__post_init__()
-        if self.frameworks_used is None:
-            self.frameworks_used = []
         if self.complexity_levels is None:
             self.complexity_levels = {}
 
@@ -63,112 +156,187 @@ class UnitTestStatistics(TestStatistics):
 @dataclass
 class ScenarioTestStatistics(TestStatistics):
     """场景测试统计"""
-    modules_covered: List[str] = None
+    modules_covered: Set[str] = field(default_factory=set)
     business_scenarios: int = 0
     integration_tests: int = 0
-    
-    def __post_init__(self):
-        super().__post_init__()
-        if self.modules_covered is None:
-            self.modules_covered = []
 
 class StatisticsCalculator:
     """统计计算器"""
     
     def __init__(self):
-        self.severity_order = ['Critical', 'High', 'Medium', 'Low']
-        self.priority_order = ['High', 'Medium', 'Low']
-        self.language_extensions = {
-            '.py': 'Python',
-            '.js': 'JavaScript',
-            '.ts': 'TypeScript', 
-            '.jsx': 'React JSX',
-            '.tsx': 'React TSX',
-            '.java': 'Java',
-            '.go': 'Go',
-            '.php': 'PHP',
-            '.rb': 'Ruby',
-            '.cpp': 'C++',
-            '.c': 'C',
-            '.cs': 'C#',
-            '.swift': 'Swift',
-            '.kt': 'Kotlin',
-            '.rs': 'Rust',
-            '.scala': 'Scala',
-            '.sh': 'Shell',
-            '.sql': 'SQL',
-            '.html': 'HTML',
-            '.css': 'CSS',
-            '.scss': 'SCSS',
-            '.less': 'LESS',
-            '.vue': 'Vue',
-            '.yaml': 'YAML',
-            '.yml': 'YAML',
-            '.json': 'JSON',
-            '.xml': 'XML',
-            '.md': 'Markdown'
+        self.severity_order = _SEVERITY_ORDER
+        self.priority_order = _PRIORITY_ORDER
+        self.language_extensions = _LANGUAGE_EXTENSIONS
+        
+        # 分区名 -> 单条累加函数 / 结果生成函数
+        self._accumulators = {
+            'review_results': self._accumulate_review,
+            'unit_cases': self._accumulate_unit_case,
+            'scenario_cases': self._accumulate_scenario_case
+        }
+        self._finalizers = {
+            'review_results': self._build_review_statistics,
+            'unit_cases': self._build_unit_test_statistics,
+            'scenario_cases': self._build_scenario_test_statistics
         }
     
     def _detect_language_from_filename(self, filename: str) -> str:
         """根据文件名检测编程语言"""
-        import os
-        _, ext = os.path.splitext(filename.lower())
-        return self.language_extensions.get(ext, 'Unknown')
+        return _detect_language(filename)
     
     def calculate_review_statistics(self, result_data: Dict[str, Any]) -> ReviewStatistics:
         """计算代码审查统计信息"""
-        stats = ReviewStatistics()
+        return self._calculate_sections(result_data, ('review_results',))['review_results']
+    
+    def calculate_unit_test_statistics(self, result_data: Dict[str, Any]) -> UnitTestStatistics:
+        """计算单元测试统计信息"""
+        return self._calculate_sections(result_data, ('unit_cases',))['unit_cases']
+    
+    def calculate_scenario_test_statistics(self, result_data: Dict[str, Any]) -> ScenarioTestStatistics:
+        """计算场景测试统计信息"""
+        return self._calculate_sections(result_data, ('scenario_cases',))['scenario_cases']
+    
+    def _calculate_sections(self, result_data: Dict[str, Any], sections: Tuple[str, ...]) -> Dict[str, Any]:
+        """单次遍历指定分区，逐条累加后再生成各分区的统计数据"""
+        buckets = self._new_buckets()
         
-        if not result_data or 'review_results' not in result_data:
-            return stats
+        if result_data:
+            for section_name in sections:
+                items = result_data.get(section_name) or ()
+                bucket = buckets[section_name]
+                bucket['count'] += len(items)
+                accumulate = self._accumulators[section_name]
+                
+                # 条目类型只在入口校验一次，各累加函数只接收字典
+                for item in items:
+                    if isinstance(item, dict):
+                        accumulate(item, bucket)
         
-        review_results = result_data['review_results']
-        all_issues = []
-        languages = set()
-        files_count = 0
+        return {
+            section_name: self._finalizers[section_name](buckets[section_name])
+            for section_name in sections
+        }
+    
+    @staticmethod
+    def _new_buckets() -> Dict[str, Dict[str, Any]]:
+        """为每个分区创建累加器"""
+        return {
+            'review_results': {
+                'count': 0,
+                'files': 0,
+                'issues': 0,
+                'languages': set(),
+                'severity': Counter(),
+                'types': Counter()
+            },
+            'unit_cases': {
+                'count': 0,
+                'frameworks': set(),
+                'assertions': 0,
+                'mocks': 0,
+                'methods': 0
+            },
+            'scenario_cases': {
+                'count': 0,
+                'modules': set(),
+                'priority': Counter(),
+                'business': 0,
+                'integration': 0
+            }
+        }
+    
+    def _accumulate_review(self, file_result: Dict[str, Any], bucket: Dict[str, Any]) -> None:
+        """累加单个文件的审查结果"""
+        if 'issues' not in file_result:
+            return
         
-        # 收集所有问题和语言信息
-        for file_result in review_results:
-            if isinstance(file_result, dict) and 'issues' in file_result:
-                files_count += 1
-                issues = file_result['issues']
-                all_issues.extend(issues)
-                
-                # 从文件名检测编程语言
-                filename = file_result.get('filename', '')
-                if filename:
-                    detected_language = self._detect_language_from_filename(filename)
-                    if detected_language != 'Unknown':
-                        languages.add(detected_language)
+        bucket['files'] += 1
+        issues = file_result['issues']
+        bucket['issues'] += len(issues)
         
-        stats.files_reviewed = files_count
-        stats.total_count = len(all_issues)
-        stats.languages_detected = list(languages)
+        # 直接统计问题，不再汇总成中间列表
+        bucket['severity'].update(
+            issue.get('severity', 'Unknown') for issue in issues if isinstance(issue, dict)
+        )
+        bucket['types'].update(
+            issue.get('type', 'Unknown') for issue in issues if isinstance(issue, dict)
+        )
         
-        # 统计严重程度
-        severity_counter = Counter()
-        issue_type_counter = Counter()
+        # 从文件名检测编程语言
+        filename = file_result.get('filename', '')
+        if filename:
+            detected_language = self._detect_language_from_filename(filename)
+            if detected_language != 'Unknown':
+                bucket['languages'].add(detected_language)
+    
+    def _accumulate_unit_case(self, case: Dict[str, Any], bucket: Dict[str, Any]) -> None:
+        """累加单个单元测试用例"""
+        # 检测测试框架
+        framework = case.get('test_framework', 'Unknown')
+        if framework != 'Unknown':
+            bucket['frameworks'].add(framework)
         
-        for issue in all_issues:
-            if isinstance(issue, dict):
-                severity = issue.get('severity', 'Unknown')
-                issue_type = issue.get('type', 'Unknown')
-                
-                severity_counter[severity] += 1
-                issue_type_counter[issue_type] += 1
-                
-                # 按严重程度分类计数
-                if severity == 'Critical':
-                    stats.critical_issues += 1
-                elif severity == 'High':
-                    stats.high_issues += 1
-                elif severity == 'Medium':
-                    stats.medium_issues += 1
-                elif severity == 'Low':
-                    stats.low_issues += 1
+        # 分析测试代码
+        test_code = case.get('code', '')
+        if test_code:
+            # 统计断言数量（简单正则匹配）
+            bucket['assertions'] += sum(1 for _ in _ASSERTION_RE.finditer(test_code))
+            
+            # 统计Mock使用
+            bucket['mocks'] += sum(1 for _ in _MOCK_RE.finditer(test_code))
+            
+            # 统计测试方法数量
+            bucket['methods'] += sum(1 for _ in _TEST_METHOD_RE.finditer(test_code))
+    
+    def _accumulate_scenario_case(self, case: Dict[str, Any], bucket: Dict[str, Any]) -> None:
+        """累加单个场景测试用例"""
+        # 收集模块信息
+        module = case.get('module', 'Unknown')
+        if module != 'Unknown':
+            bucket['modules'].add(module)
         
-        stats.severity_counts = dict(severity_counter)
-        stats.category_counts = dict(issue_type_counter)
+        # 统计优先级
+        bucket['priority'][case.get('priority', 'Medium')] += 1
+        
+        # 分析场景类型
+        title = case.get('title', '').lower()
+        steps_raw = case.get('steps', '')
+        # 处理steps可能是列表或字符串的情况
+        if isinstance(steps_raw, list):
+            steps = ' '.join(str(step) for step in steps_raw).lower()
+        else:
+            steps = str(steps_raw).lower()
+        
+        # 标题和步骤拼接后只扫描一次（换行分隔，关键词不会跨越两段匹配）
+        text = f"{title}\n{steps}"
+        
+        # 简单的业务场景检测
+        if _BUSINESS_KEYWORDS_RE.search(text):
+            bucket['business'] += 1
+        
+        # 简单的集成测试检测
+        if _INTEGRATION_KEYWORDS_RE.search(text):
+            bucket['integration'] += 1
+    
+    @staticmethod
+    def _build_review_statistics(bucket: Dict[str, Any]) -> ReviewStatistics:
+        """根据累加器生成代码审查统计"""
+        severity_counter = bucket['severity']
+        issue_type_counter = bucket['types']
+        
+        stats = ReviewStatistics()
+        stats.files_reviewed = bucket['files']
+        stats.total_count = bucket['issues']
+        stats.languages_detected = bucket['languages']
+        
+        # 按严重程度分类计数
+        stats.critical_issues = severity_counter['Critical']
+        stats.high_issues = severity_counter['High']
+        stats.medium_issues = severity_counter['Medium']
+        stats.low_issues = severity_counter['Low']
+        
+        stats.severity_counts = severity_counter
+        stats.category_counts = issue_type_counter
         # 将tuple列表转换为字典列表，避免YAML序列化问题
         stats.most_common_issues = [
             {"type": item[0], "count": item[1]} 
@@ -177,111 +345,60 @@ class StatisticsCalculator:
         
         return stats
     
-    def calculate_unit_test_statistics(self, result_data: Dict[str, Any]) -> UnitTestStatistics:
-        """计算单元测试统计信息"""
+    @staticmethod
+    def _build_unit_test_statistics(bucket: Dict[str, Any]) -> UnitTestStatistics:
+        """根据累加器生成单元测试统计"""
         stats = UnitTestStatistics()
-        
-        if not result_data or 'unit_cases' not in result_data:
-            return stats
-        
-        unit_cases = result_data['unit_cases']
-        stats.total_count = len(unit_cases)
-        
-        frameworks = set()
-        total_assertions = 0
-        total_mocks = 0
-        test_methods = 0
-        
-        for case in unit_cases:
-            if isinstance(case, dict):
-                # 检测测试框架
-                framework = case.get('test_framework', 'Unknown')
-                if framework != 'Unknown':
-                    frameworks.add(framework)
-                
-                # 分析测试代码
-                test_code = case.get('code', '')
-                if test_code:
-                    # 统计断言数量（简单正则匹配）
-                    assertions = len(re.findall(r'\bassert\w*\(|\bassertThat\(|\bexpected?\(', test_code, re.IGNORECASE))
-                    total_assertions += assertions
-                    
-                    # 统计Mock使用
-                    mocks = len(re.findall(r'\bmock\w*\(|\bMock\w*\(|\b@mock\b', test_code, re.IGNORECASE))
-                    total_mocks += mocks
-                    
-                    # 统计测试方法数量
-                    methods = len(re.findall(r'\bdef test_|\btest\w*\(|\b@Test\b', test_code, re.IGNORECASE))
-                    test_methods += methods
-        
-        stats.frameworks_used = list(frameworks)
-        stats.assertion_count = total_assertions
-        stats.mock_usage_count = total_mocks
-        stats.test_methods_count = test_methods
+        stats.total_count = bucket['count']
+        stats.frameworks_used = bucket['frameworks']
+        stats.assertion_count = bucket['assertions']
+        stats.mock_usage_count = bucket['mocks']
+        stats.test_methods_count = bucket['methods']
         
         # 估算覆盖率（基于测试方法数量的简单估算）
         if stats.total_count > 0:
-            stats.coverage_estimate = min(100.0, (test_methods / stats.total_count) * 80)
+            stats.coverage_estimate = min(100.0, (stats.test_methods_count / stats.total_count) * 80)
         
         return stats
     
-    def calculate_scenario_test_statistics(self, result_data: Dict[str, Any]) -> ScenarioTestStatistics:
-        """计算场景测试统计信息"""
+    @staticmethod
+    def _build_scenario_test_statistics(bucket: Dict[str, Any]) -> ScenarioTestStatistics:
+        """根据累加器生成场景测试统计"""
         stats = ScenarioTestStatistics()
+        stats.total_count = bucket['count']
+        stats.modules_covered = bucket['modules']
+        stats.severity_counts = bucket['priority']
+        stats.business_scenarios = bucket['business']
+        stats.integration_tests = bucket['integration']
         
-        if not result_data or 'scenario_cases' not in result_data:
-            return stats
-        
-        scenario_cases = result_data['scenario_cases']
-        stats.total_count = len(scenario_cases)
+        return stats
+    
+    def calculate_overall_statistics(self, result_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        计算总体统计信息
         
-        modules = set()
-        priority_counter = Counter()
-        business_scenarios = 0
-        integration_tests = 0
+        相同内容的result_data直接返回缓存结果，调用方应将返回值视为只读
+        """
+        cache_key = _result_data_digest(result_data)
+        if cache_key is not None:
+            cached_stats = _overall_stats_cache.get(cache_key)
+            if cached_stats is not None:
+                return cached_stats
         
-        for case in scenario_cases:
-            if isinstance(case, dict):
-                # 收集模块信息
-                module = case.get('module', 'Unknown')
-                if module != 'Unknown':
-                    modules.add(module)
-                
-                # 统计优先级
-                priority = case.get('priority', 'Medium')
-                priority_counter[priority] += 1
-                
-                # 分析场景类型
-                title = case.get('title', '').lower()
-                steps_raw = case.get('steps', '')
-                # 处理steps可能是列表或字符串的情况
-                if isinstance(steps_raw, list):
-                    steps = ' '.join(str(step) for step in steps_raw).lower()
-                else:
-                    steps = str(steps_raw).lower()
-                
-                # 简单的业务场景检测
-                if any(keyword in title or keyword in steps for keyword in 
-                       ['用户', '业务', '流程', '操作', '交互', '场景']):
-                    business_scenarios += 1
-                
-                # 简单的集成测试检测
-                if any(keyword in title or keyword in steps for keyword in 
-                       ['集成', '接口', 'api', '服务', '系统', '数据库']):
-                    integration_tests += 1
+        overall_stats = self._compute_overall_statistics(result_data)
         
-        stats.modules_covered = list(modules)
-        stats.severity_counts = dict(priority_counter)
-        stats.business_scenarios = business_scenarios
-        stats.integration_tests = integration_tests
+        if cache_key is not None:
+            _overall_stats_cache.set(cache_key, overall_stats)
         
-        return stats
+        return overall_stats
     
-    def calculate_overall_statistics(self, result_data: Dict[str, Any]) -> Dict[str, Any]:
-        """计算总体统计信息"""
-        review_stats = self.calculate_review_statistics(result_data)
-        unit_stats = self.calculate_unit_test_statistics(result_data)
-        scenario_stats = self.calculate_scenario_test_statistics(result_data)
+    def _compute_overall_statistics(self, result_data: Dict[str, Any]) -> Dict[str, Any]:
+        """计算总体统计信息（不经过缓存）"""
+        # 三个分区共用一次遍历
+        section_stats = self._calculate_sections(result_data, _SECTIONS)
+        review_stats = section_stats['review_results']
+        unit_stats = section_stats['unit_cases']
+        scenario_stats = section_stats['scenario_cases']
         
         # 计算总体质量得分
         quality_score = self._calculate_quality_score(review_stats, unit_stats, scenario_stats)
@@ -310,55 +427,42 @@ class StatisticsCalculator:
                                 unit_stats: UnitTestStatistics, 
                                 scenario_stats: ScenarioTestStatistics) -> float:
         """计算代码质量得分 (0-100)"""
-        score = 100.0
-        
-        # 根据问题严重程度扣分
-        score -= review_stats.critical_issues * 15
-        score -= review_stats.high_issues * 8
-        score -= review_stats.medium_issues * 3
-        score -= review_stats.low_issues * 1
-        
-        # 根据测试覆盖度加分
-        if unit_stats.total_count > 0:
-            score += min(10, unit_stats.total_count * 2)
-        if scenario_stats.total_count > 0:
-            score += min(10, scenario_stats.total_count * 1.5)
-        
-        return max(0.0, min(100.0, score))
+        return _quality_score(
+            review_stats.critical_issues,
+            review_stats.high_issues,
+            review_stats.medium_issues,
+            review_stats.low_issues,
+            unit_stats.total_count,
+            scenario_stats.total_count
+        )
     
     def _calculate_completion_rate(self, result_data: Dict[str, Any]) -> float:
         """计算任务完成率"""
-        expected_sections = ['review_results', 'unit_cases', 'scenario_cases']
-        completed_sections = sum(1 for section in expected_sections 
+        completed_sections = sum(1 for section in _SECTIONS 
                                if section in result_data and result_data[section])
         
-        return (completed_sections / len(expected_sections)) * 100.0
+        return (completed_sections / len(_SECTIONS)) * 100.0
+
+def _display_value(value: Any) -> Any:
+    """集合转换为列表、Counter转换为普通字典，以便JSON/YAML序列化"""
+    if isinstance(value, set):
+        return list(value)
+    if isinstance(value, Counter):
+        return dict(value)
+    return value
+
+def _display_dict(items) -> Dict[str, Any]:
+    """构造用于显示的字典"""
+    return {key: _display_value(value) for key, value in items}
 
 def format_statistics_for_display(stats_data: Dict[str, Any]) -> Dict[str, Any]:
-    """格式化统计数据用于前端显示"""
-    def dataclass_to_dict(obj):
-        """将dataclass转换为字典"""
-        if hasattr(obj, '__dict__'):
-            result = {}
-            for key, value in obj.__dict__.items():
-                if isinstance(value, list):
-                    result[key] = value
-                elif isinstance(value, dict):
-                    result[key] = value
-                else:
-                    result[key] = value
-            return result
-        return obj
-    
-    formatted = {}
-    
-    for key, value in stats_data.items():
-        if hasattr(value, '__dict__'):
-            formatted[key] = dataclass_to_dict(value)
-        else:
-            formatted[key] = value
-    
-    return formatted
+    """格式化统计数据用于前端显示（集合、Counter在此处统一转换）"""
+    return {
+        key: _display_dict((f.name, getattr(value, f.name)) for f in fields(value)) if is_dataclass(value)
+        else _display_dict(value.items()) if isinstance(value, dict)
+        else value
+        for key, value in stats_data.items()
+    }
 
 # 示例使用
 if __name__ == "__main__":
@@ -4,24 +4,133 @@
 """
 
 import yaml
-from typing import List, Dict, Any, Optional
+import json
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from pathlib import Path
 import threading
 import time
 import asyncio
-import sys
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import chain
 
 from .models import (
     CodeIssue, ReviewReport, UnitTestCase, 
-    ScenarioTestCase, ProcessingResult
+    ScenarioTestCase, ProcessingResult, FileTask
 )
 from .utils.git_api import GitAPIClient
 from .utils.llm_api import DeepSeekAPI
-from .utils.async_llm_api import AsyncTaskProcessor
+from .utils.async_llm_api import AsyncTaskProcessor, TaskAbortedException as AsyncTaskAbortedException
 from .config_manager import config_manager
 from .statistics import StatisticsCalculator, format_statistics_for_display
 from .task_state import TaskStateManager
-from .logger import get_task_logger, info, error, warning, debug
+from .logger import get_task_logger, task_context, info, error, warning, debug, exception
+
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:  # PyYAML未编译libyaml时回退到纯Python实现
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+# 任务文件中止状态的缓存时间（秒）
+_ABORT_CHECK_TTL = 1.0
+
+# Git API错误分类：(匹配标记, 调试提示, 友好提示)，按顺序匹配
+_GIT_ERROR_RULES = (
+    (('SSL',), "网络连接错误 - 可能需要检查网络连接或使用代理",
+     "网络连接失败: SSL错误。请检查网络连接或配置代理。"),
+    (('Max retries exceeded',), "网络超时 - 请检查网络连接",
+     "网络连接超时: 请检查网络连接后重试。"),
+    (('Connection reset by peer', 'ConnectionResetError', 'Connection aborted'), "网络连接被重置 - 请检查网络连接",
+     "网络连接被重置: 请检查网络连接或稍后重试。"),
+    (('404',), "分支或仓库不存在 - 请检查分支名称",
+     "分支或仓库不存在: 请检查分支名称是否正确。"),
+)
+
+# 可退避重试的LLM临时错误：超时、网络错误、限流及服务端错误
+_TRANSIENT_LLM_ERROR_MARKERS = ('调用超时', '网络错误', 'API error: 429', 'API error: 5')
+
+# 线程内LLM调用的重试等待时间（秒），最多重试两次
+_LLM_RETRY_DELAYS = (1, 2)
+
+# 出现这些标记的项目错误会使整个任务失败
+_NETWORK_ERROR_MARKERS = ('网络连接失败', '网络连接超时', '网络连接被重置', '分支或仓库不存在', 'Git API调用失败')
+
+# 常见的模块分类，按顺序匹配路径中包含的目录
+_MODULE_RULES = (
+    (frozenset({'api', 'models'}), 'API模型层'),
+    (frozenset({'api', 'services'}), 'API服务层'),
+    (frozenset({'api', 'controllers'}), 'API控制器'),
+    (frozenset({'api', 'routes'}), 'API控制器'),
+    (frozenset({'api', 'extensions'}), 'API扩展'),
+    (frozenset({'api'}), 'API层'),
+    (frozenset({'models'}), '数据模型'),
+    (frozenset({'services'}), '业务服务'),
+    (frozenset({'utils'}), '工具函数'),
+    (frozenset({'helpers'}), '工具函数'),
+    (frozenset({'tests'}), '测试模块'),
+    (frozenset({'config'}), '配置模块'),
+)
+
+
+def _yaml_load(f) -> Any:
+    """读取YAML（优先使用libyaml加速）"""
+    return yaml.load(f, Loader=_YamlLoader)
+
+
+def _yaml_dump(data: Any, f) -> None:
+    """写入YAML（优先使用libyaml加速）"""
+    yaml.dump(data, f, Dumper=_YamlDumper, default_flow_style=False, allow_unicode=True)
+
+
+def _write_task_file(task_file: Path, data: Any) -> None:
+    """先写临时文件再原子替换，读取方不会看到写了一半的任务文件
+    
+    每次写入使用独立的临时文件名，跨进程的并发写入不会写进同一个临时文件
+    """
+    fd, tmp_file = tempfile.mkstemp(dir=task_file.parent, prefix=f'{task_file.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            _yaml_dump(data, f)
+        os.replace(tmp_file, task_file)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+        raise
+
+
+def _describe_result(result: Dict[str, Any]) -> str:
+    """结果数据的简要描述（各列表条数），避免为记录大小而把整个结果转成字符串"""
+    counts = [f"{key}: {len(value)}" for key, value in result.items() if isinstance(value, list)]
+    return ', '.join(counts) or ', '.join(map(str, result))
+
+
+# 任务文件的读改写锁，状态更新与调试日志合并共用，避免互相覆盖
+_task_file_locks: Dict[str, threading.RLock] = {}
+_task_file_locks_guard = threading.Lock()
+
+
+def _task_file_lock(task_id: str) -> threading.RLock:
+    """获取任务文件的读改写锁"""
+    with _task_file_locks_guard:
+        return _task_file_locks.setdefault(task_id, threading.RLock())
+
+
+# 调试日志时间戳缓存：(秒, ISO字符串)
+_iso_cache = (0, '')
+
+
+def _now_iso() -> str:
+    """当前时间的ISO字符串，同一秒内复用（调试日志只需秒级精度）"""
+    global _iso_cache
+    second = int(time.time())
+    if _iso_cache[0] != second:
+        _iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return _iso_cache[1]
 
 
 class TaskAbortedException(Exception):
@@ -38,6 +147,47 @@ class TaskProcessor:
         self.async_processor = None  # 延迟初始化，需要task_id
         self.stats_calculator = StatisticsCalculator()
         self.use_async = True  # 默认使用异步处理
+        self._debug_fp = None  # 调试日志JSONL文件，首次写入时打开
+        self._debug_lock = threading.Lock()  # 项目并发处理时保护调试日志
+        self._abort_cache = (float('-inf'), False)  # (检查时间, 是否中止)
+        self._loop = None  # 处理器复用的事件循环，首次使用时创建
+        self._task_dir = None  # 任务数据目录，首次使用时创建
+        self._io_executor = None  # 同步处理文件时并行调用LLM的线程池，首次使用时创建
+    
+    def _get_task_dir(self) -> Path:
+        """获取任务数据目录（只在首次调用时确保目录存在）"""
+        if self._task_dir is None:
+            self._task_dir = config_manager.ensure_task_data_dir()
+        return self._task_dir
+    
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        """获取处理器复用的事件循环"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+    
+    def _get_io_executor(self) -> ThreadPoolExecutor:
+        """获取处理器复用的LLM调用线程池"""
+        if self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(
+                max_workers=max(8, 2 * (os.cpu_count() or 1)),
+                thread_name_prefix='TaskFile'
+            )
+        return self._io_executor
+    
+    def close(self) -> None:
+        """关闭事件循环和线程池，任务结束时调用"""
+        if self._loop is not None and not self._loop.is_closed():
+            try:
+                self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+                self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            finally:
+                self._loop.close()
+        self._loop = None
+        
+        if self._io_executor is not None:
+            self._io_executor.shutdown(wait=False)
+            self._io_executor = None
     
     def _check_task_abort(self, task_id: str) -> None:
         """
@@ -50,20 +200,31 @@ class TaskProcessor:
             TaskAbortedException: 如果任务被中止
         """
         try:
-            task_dir = config_manager.ensure_task_data_dir()
-            task_file = task_dir / f'{task_id}.yaml'
+            task_dir = self._get_task_dir()
             
-            if task_file.exists():
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task_data = yaml.safe_load(f) or {}
-                
-                if task_data.get('status') == 'aborted':
-                    debug(task_id, "检测到任务已被中止，停止执行")
-                    raise TaskAbortedException(f"任务 {task_id} 已被用户中止")
+            # 中止接口会创建标记文件，检查它只需一次stat
+            aborted = (task_dir / f'{task_id}.aborted').exists()
+            
+            if not aborted:
+                # 回退读取任务文件，结果缓存一段时间避免反复解析YAML
+                checked_at, aborted = self._abort_cache
+                now = time.monotonic()
+                if now - checked_at >= _ABORT_CHECK_TTL:
+                    aborted = False
+                    task_file = task_dir / f'{task_id}.yaml'
+                    if task_file.exists():
+                        with open(task_file, 'r', encoding='utf-8') as f:
+                            task_data = _yaml_load(f) or {}
+                        aborted = task_data.get('status') == 'aborted'
+                    self._abort_cache = (now, aborted)
+            
+            if aborted:
+                debug("检测到任务已被中止，停止执行")
+                raise TaskAbortedException(f"任务 {task_id} 已被用户中止")
         except TaskAbortedException:
             raise
         except Exception as e:
-            debug(task_id, f"检查任务状态失败: {e}")
+            debug("检查任务状态失败: %s", e)
             # 检查失败时不阻止任务继续执行
     
     def process_task(self, system_name: str, branch_name: str, task_id: str) -> ProcessingResult:
@@ -78,6 +239,15 @@ class TaskProcessor:
         Returns:
             ProcessingResult: 处理结果
         """
+        with task_context(task_id):
+            try:
+                return self._run_task(system_name, branch_name, task_id)
+            finally:
+                # 任务结束时将调试日志合并到任务文件
+                self._flush_debug_log(task_id)
+    
+    def _run_task(self, system_name: str, branch_name: str, task_id: str) -> ProcessingResult:
+        """执行任务处理流程"""
         # 初始化任务专用日志器
         task_logger = get_task_logger(task_id)
         task_logger.task_start()
@@ -87,270 +257,262 @@ class TaskProcessor:
         state_manager = TaskStateManager(task_id)
         
         # 在文件中记录开始处理
+        self._log_debug(task_id, "开始处理任务")
+        self._flush_debug_log(task_id)
+        
+        # 检查任务是否被中止
+        self._check_task_abort(task_id)
+        
+        # 处理结果
+        all_reports = []
+        all_unit_cases = []
+        all_scenario_cases = []
+        
+        # 边获取Git diff边并发处理项目，结果按项目顺序合并
         try:
-            task_dir = config_manager.ensure_task_data_dir()
-            task_file = task_dir / f'{task_id}.yaml'
-            if task_file.exists():
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task_data = yaml.safe_load(f) or {}
-                if 'debug_log' not in task_data:
-                    task_data['debug_log'] = []
-                task_data['debug_log'].append(f"{datetime.now().isoformat()}: 开始处理任务")
-                task_data['updated_at'] = datetime.now().isoformat()
-                with open(task_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-        except Exception as e:
-            debug(task_id, f"记录调试信息失败: {e}")
+            project_results = self._get_event_loop().run_until_complete(
+                self._process_projects_async(system_name, branch_name, task_id, state_manager)
+            )
+        finally:
+            # 处理结束后将状态增量合并为快照
+            state_manager.compact()
+        for project_reports, project_unit_cases, project_scenario_cases in project_results:
+            all_reports.extend(project_reports)
+            all_unit_cases.extend(project_unit_cases)
+            all_scenario_cases.extend(project_scenario_cases)
+        
+        debug("任务处理完成，准备返回结果: %s", task_id)
+        debug("最终统计 - 报告: %s, 单元测试: %s, 场景测试: %s", len(all_reports), len(all_unit_cases), len(all_scenario_cases))
+        
+        # 检查是否所有项目都失败了，找到一个成功的报告即可停止扫描
+        has_success = any(
+            not r.issues or not any(issue.type == '系统错误' for issue in r.issues)
+            for r in all_reports
+        )
+        
+        if not has_success and project_results:
+            debug("所有项目都失败了，中止任务")
+            error_description = [r.issues[0].description for r in all_reports if r.issues and r.issues[0].type == '系统错误']
+            raise Exception("所有项目都处理失败，任务中止", ''.join(error_description))
+        
+        return ProcessingResult(
+            reports=all_reports,
+            unit_cases=all_unit_cases,
+            scenario_cases=all_scenario_cases
+        )
+    
+    async def _process_projects_async(self, system_name: str, branch_name: str, task_id: str,
+                                      state_manager: TaskStateManager) -> List[tuple]:
+        """
+        获取Git diff并并发处理项目，每个项目的diff到达后立即开始处理
+        
+        Args:
+            system_name: 系统名称
+            branch_name: 分支名称
+            task_id: 任务ID
+            state_manager: 共享的任务状态管理器
+            
+        Returns:
+            List[tuple]: 按项目顺序排列的 (reports, unit_cases, scenario_cases)
+        """
+        semaphore = asyncio.Semaphore(config_manager.get_project_concurrency())
+        
+        async def run_one(index: int, project_result: Dict[str, Any]) -> tuple:
+            async with semaphore:
+                return await self._process_project_entry(index, project_result, task_id, state_manager)
+        
+        debug("准备获取Git diff: %s/%s", system_name, branch_name)
+        diff_iter = self.git_client.iter_diff(system_name, branch_name)
+        project_tasks = {}
         
         # 获取Git diff
         try:
-            # 检查任务是否被中止
-            self._check_task_abort(task_id)
+            while True:
+                # 在线程池中等待下一个项目的diff，不阻塞已开始的项目
+                item = await asyncio.to_thread(next, diff_iter, None)
+                if item is None:
+                    break
+                index, project_result = item
+                debug("项目 %s diff获取完成，开始处理", project_result.get('project_name', 'unknown'))
+                project_tasks[index] = asyncio.ensure_future(run_one(index, project_result))
+                # 已有项目出现致命错误时不再等待剩余项目的diff
+                self._raise_first_project_error(project_tasks)
             
-            debug(task_id, f"准备获取Git diff: {system_name}/{branch_name}")
-            diff_results = self.git_client.get_diff(system_name, branch_name)
             config_manager.backup_branches_to_yaml(self.git_client.dynamic_branches_cache, source='dynamic')
             
             # Git API调用完成后立即检查是否被中止
             self._check_task_abort(task_id)
             
-            debug(task_id, f"获取到 {len(diff_results) if diff_results else 0} 个项目的代码变更")
+            debug("获取到 %s 个项目的代码变更", len(project_tasks))
             
             # 记录Git diff获取结果
-            try:
-                task_dir = config_manager.ensure_task_data_dir()
-                task_file = task_dir / f'{task_id}.yaml'
-                if task_file.exists():
-                    with open(task_file, 'r', encoding='utf-8') as f:
-                        task_data = yaml.safe_load(f) or {}
-                    if 'debug_log' not in task_data:
-                        task_data['debug_log'] = []
-                    task_data['debug_log'].append(f"{datetime.now().isoformat()}: Git diff获取完成，{len(diff_results) if diff_results else 0}个项目")
-                    task_data['updated_at'] = datetime.now().isoformat()
-                    with open(task_file, 'w', encoding='utf-8') as f:
-                        yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-            except Exception as e:
-                debug(task_id, f"记录Git diff结果失败: {e}")
-                
+            self._log_debug(task_id, f"Git diff获取完成，{len(project_tasks)}个项目")
+            
         except Exception as e:
-            debug(task_id, f"Git diff获取失败: {e}")
+            debug("Git diff获取失败: %s", e)
             # 记录Git错误
-            try:
-                task_dir = config_manager.ensure_task_data_dir()
-                task_file = task_dir / f'{task_id}.yaml'
-                if task_file.exists():
-                    with open(task_file, 'r', encoding='utf-8') as f:
-                        task_data = yaml.safe_load(f) or {}
-                    if 'debug_log' not in task_data:
-                        task_data['debug_log'] = []
-                    task_data['debug_log'].append(f"{datetime.now().isoformat()}: Git diff获取失败: {str(e)}")
-                    task_data['updated_at'] = datetime.now().isoformat()
-                    with open(task_file, 'w', encoding='utf-8') as f:
-                        yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-            except:
-                pass
+            self._log_debug(task_id, f"Git diff获取失败: {str(e)}")
+            for project_task in project_tasks.values():
+                project_task.cancel()
+            await asyncio.gather(*project_tasks.values(), return_exceptions=True)
+            await asyncio.to_thread(diff_iter.close)
             raise
         
-        # 处理结果
-        all_reports = []
-        all_unit_cases = []
-        all_scenario_cases = []
+        # 中止和网络错误会使整个任务失败，出现第一个时立即取消其余项目
+        pending = set(project_tasks.values())
+        try:
+            while pending:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                self._raise_first_project_error(project_tasks)
+        except BaseException:
+            for project_task in pending:
+                project_task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
         
-        # 处理每个项目
-        debug(task_id, f"准备处理 {len(diff_results)} 个项目")
+        return [project_tasks[index].result() for index in sorted(project_tasks)]
+    
+    @staticmethod
+    def _raise_first_project_error(project_tasks: Dict[int, asyncio.Future]) -> None:
+        """按项目顺序检查已完成的项目任务，抛出第一个致命错误"""
+        for index in sorted(project_tasks):
+            project_task = project_tasks[index]
+            if project_task.done() and not project_task.cancelled() and project_task.exception() is not None:
+                raise project_task.exception()
+    
+    async def _process_project_entry(self, index: int, project_result: Dict[str, Any], task_id: str,
+                                     state_manager: TaskStateManager) -> tuple:
+        """处理diff结果中的单个项目，非致命错误转换为错误报告"""
+        # 检查任务是否被中止
+        self._check_task_abort(task_id)
+        
+        project_name = project_result.get('project_name', 'unknown')
+        debug("处理项目 %s: %s", index+1, project_name)
+        
+        # 记录项目处理开始
+        self._log_debug(task_id, f"开始处理项目 {index+1}: {project_name}")
+        self._flush_debug_log(task_id)
+        
+        # 检查项目是否包含错误信息
+        if 'error' in project_result:
+            error_msg = project_result['error']
+            debug("项目 %s 包含错误，跳过处理: %s", project_name, error_msg)
+            
+            # 记录项目错误信息
+            self._log_debug(task_id, f"项目错误跳过: {project_name} - {error_msg}")
+            
+            # 生成错误报告但继续处理其他项目
+            error_report = ReviewReport(
+                project_name=project_name,
+                filename='N/A',
+                filestatus={},
+                summary='N/A',
+                business_logic='N/A',
+                language_detected='N/A',
+                issues=[CodeIssue(
+                    type='系统错误',
+                    description=f'项目处理失败: {error_msg}',
+                    suggestion='请检查系统配置和网络连接',
+                    severity='Critical'
+                )]
+            )
+            return [error_report], [], []
         
-        # 记录开始处理项目
         try:
-            task_dir = config_manager.ensure_task_data_dir()
-            task_file = task_dir / f'{task_id}.yaml'
-            if task_file.exists():
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task_data = yaml.safe_load(f) or {}
-                if 'debug_log' not in task_data:
-                    task_data['debug_log'] = []
-                task_data['debug_log'].append(f"{datetime.now().isoformat()}: 开始处理 {len(diff_results)} 个项目")
-                task_data['updated_at'] = datetime.now().isoformat()
-                with open(task_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+            debug("准备调用_process_project: %s", project_name)
+            
+            # 转换Git API格式为TaskProcessor期望的格式
+            processed_project = self._convert_git_result_to_project(project_result, task_id)
+            
+            # 记录转换后的文件数量
+            file_count = len(processed_project.get('files', []))
+            debug("项目 %s 转换后文件数: %s", project_name, file_count)
+            
+            # 记录准备调用_process_project
+            self._log_debug(task_id, f"转换后调用_process_project: {project_name}, {file_count}个文件")
+            
+            project_output = await self._process_project(processed_project, task_id, state_manager)
+            
+            debug("_process_project完成: %s", project_name)
+            return project_output
+            
+        except TaskAbortedException:
+            raise
         except Exception as e:
-            debug(task_id, f"记录项目处理开始失败: {e}")
-        
-        for i, project_result in enumerate(diff_results):
-            # 检查任务是否被中止
-            self._check_task_abort(task_id)
+            debug("项目处理失败: %s", e)
+            if config_manager.is_debug_tracebacks_enabled():
+                exception(f"项目处理失败: {project_name}")
             
-            project_name = project_result.get('project_name', 'unknown')
-            debug(task_id, f"处理项目 {i+1}: {project_name}")
+            # 记录项目处理错误
+            self._log_debug(task_id, f"项目处理错误: {project_name} - {str(e)}")
             
-            # 记录项目处理开始
-            try:
-                task_dir = config_manager.ensure_task_data_dir()
-                task_file = task_dir / f'{task_id}.yaml'
-                if task_file.exists():
-                    with open(task_file, 'r', encoding='utf-8') as f:
-                        task_data = yaml.safe_load(f) or {}
-                    if 'debug_log' not in task_data:
-                        task_data['debug_log'] = []
-                    task_data['debug_log'].append(f"{datetime.now().isoformat()}: 开始处理项目 {i+1}: {project_name}")
-                    task_data['updated_at'] = datetime.now().isoformat()
-                    with open(task_file, 'w', encoding='utf-8') as f:
-                        yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-            except Exception as e:
-                debug(task_id, f"记录项目处理失败: {e}")
+            # 检查是否是网络相关的错误，如果是则重新抛出异常使整个任务失败
+            error_str = str(e)
+            if any(marker in error_str for marker in _NETWORK_ERROR_MARKERS):
+                # 网络错误应该导致整个任务失败，而不是生成错误报告
+                raise e
             
-            # 检查项目是否包含错误信息
-            if 'error' in project_result:
-                error_msg = project_result['error']
-                debug(task_id, f"项目 {project_name} 包含错误，跳过处理: {error_msg}")
-                
-                # 记录项目错误信息
-                try:
-                    task_dir = config_manager.ensure_task_data_dir()
-                    task_file = task_dir / f'{task_id}.yaml'
-                    if task_file.exists():
-                        with open(task_file, 'r', encoding='utf-8') as f:
-                            task_data = yaml.safe_load(f) or {}
-                        if 'debug_log' not in task_data:
-                            task_data['debug_log'] = []
-                        task_data['debug_log'].append(f"{datetime.now().isoformat()}: 项目错误跳过: {project_name} - {error_msg}")
-                        task_data['updated_at'] = datetime.now().isoformat()
-                        with open(task_file, 'w', encoding='utf-8') as f:
-                            yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-                except Exception as debug_e:
-                    debug(task_id, f"记录项目错误跳过失败: {debug_e}")
-                
-                # 生成错误报告但继续处理其他项目
-                error_report = ReviewReport(
-                    project_name=project_name,
-                    filename='N/A',
-                    filestatus={},
-                    summary='N/A',
-                    business_logic='N/A',
-                    language_detected='N/A',
-                    issues=[CodeIssue(
-                        type='系统错误',
-                        description=f'项目处理失败: {error_msg}',
-                        suggestion='请检查系统配置和网络连接',
-                        severity='Critical'
-                    )]
-                )
-                all_reports.append(error_report)
-                continue
+            # 其他错误生成错误报告但继续处理
+            error_report = ReviewReport(
+                project_name=project_name,
+                filename='N/A',
+                filestatus={},
+                summary='N/A',
+                business_logic='N/A',
+                language_detected='N/A',
+                issues=[CodeIssue(
+                    type='系统错误',
+                    description=f'项目处理失败: {str(e)}',
+                    suggestion='请检查系统配置和网络连接',
+                    severity='Critical'
+                )]
+            )
+            return [error_report], [], []
+    
+    def _log_debug(self, task_id: str, message: str):
+        """追加调试信息到任务的JSONL调试日志"""
+        try:
+            line = json.dumps({'ts': _now_iso(), 'msg': message}, ensure_ascii=False) + '\n'
+            with self._debug_lock:
+                if self._debug_fp is None:
+                    task_dir = self._get_task_dir()
+                    self._debug_fp = open(task_dir / f'{task_id}.debug.jsonl', 'a', encoding='utf-8', buffering=1)
+                self._debug_fp.write(line)
+        except Exception as e:
+            debug("记录调试信息失败: %s", e)
+    
+    def _flush_debug_log(self, task_id: str):
+        """将JSONL调试日志合并到任务文件的debug_log，并更新updated_at"""
+        with self._debug_lock:
+            if self._debug_fp is not None:
+                self._debug_fp.close()
+                self._debug_fp = None
             
             try:
-                debug(task_id, f"准备调用_process_project: {project_name}")
-                
-                # 转换Git API格式为TaskProcessor期望的格式
-                processed_project = self._convert_git_result_to_project(project_result, task_id)
+                task_dir = self._get_task_dir()
+                task_file = task_dir / f'{task_id}.yaml'
+                debug_file = task_dir / f'{task_id}.debug.jsonl'
                 
-                # 记录转换后的文件数量
-                file_count = len(processed_project.get('files', []))
-                debug(task_id, f"项目 {project_name} 转换后文件数: {file_count}")
+                entries = []
+                if debug_file.exists():
+                    with open(debug_file, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            if line.strip():
+                                record = json.loads(line)
+                                entries.append(f"{record['ts']}: {record['msg']}")
                 
-                # 记录准备调用_process_project
-                try:
-                    task_dir = config_manager.ensure_task_dir()
-                    task_file = task_dir / f'{task_id}.yaml'
+                with _task_file_lock(task_id):
                     if task_file.exists():
                         with open(task_file, 'r', encoding='utf-8') as f:
-                            task_data = yaml.safe_load(f) or {}
-                        if 'debug_log' not in task_data:
-                            task_data['debug_log'] = []
-                        task_data['debug_log'].append(f"{datetime.now().isoformat()}: 转换后调用_process_project: {project_name}, {file_count}个文件")
-                        task_data['updated_at'] = datetime.now().isoformat()
-                        with open(task_file, 'w', encoding='utf-8') as f:
-                            yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-                except Exception as debug_e:
-                    debug(task_id, f"记录_process_project调用失败: {debug_e}")
-                
-                project_reports, project_unit_cases, project_scenario_cases = self._process_project(
-                    processed_project, task_id
-                )
-                
-                debug(task_id, f"_process_project完成: {project_name}")
-                all_reports.extend(project_reports)
-                all_unit_cases.extend(project_unit_cases)
-                all_scenario_cases.extend(project_scenario_cases)
+                            task_data = _yaml_load(f) or {}
+                        task_data.setdefault('debug_log', []).extend(entries)
+                        task_data['updated_at'] = _now_iso()
+                        _write_task_file(task_file, task_data)
                 
+                if debug_file.exists():
+                    debug_file.unlink()
             except Exception as e:
-                debug(task_id, f"项目处理失败: {e}")
-                import traceback
-                traceback.print_exc()
-                
-                # 记录项目处理错误
-                try:
-                    task_dir = config_manager.ensure_task_data_dir()
-                    task_file = task_dir / f'{task_id}.yaml'
-                    if task_file.exists():
-                        with open(task_file, 'r', encoding='utf-8') as f:
-                            task_data = yaml.safe_load(f) or {}
-                        if 'debug_log' not in task_data:
-                            task_data['debug_log'] = []
-                        task_data['debug_log'].append(f"{datetime.now().isoformat()}: 项目处理错误: {project_name} - {str(e)}")
-                        task_data['updated_at'] = datetime.now().isoformat()
-                        with open(task_file, 'w', encoding='utf-8') as f:
-                            yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-                except Exception as debug_e:
-                    debug(task_id, f"记录项目处理错误失败: {debug_e}")
-                
-                # 检查是否是网络相关的错误，如果是则重新抛出异常使整个任务失败
-                error_str = str(e)
-                if ('网络连接失败' in error_str or '网络连接超时' in error_str or 
-                    '网络连接被重置' in error_str or '分支或仓库不存在' in error_str or 'Git API调用失败' in error_str):
-                    # 网络错误应该导致整个任务失败，而不是生成错误报告
-                    raise e
-                
-                # 其他错误生成错误报告但继续处理
-                error_report = ReviewReport(
-                    project_name=project_name,
-                    filename='N/A',
-                    filestatus={},
-                    summary='N/A',
-                    business_logic='N/A',
-                    language_detected='N/A',
-                    issues=[CodeIssue(
-                        type='系统错误',
-                        description=f'项目处理失败: {str(e)}',
-                        suggestion='请检查系统配置和网络连接',
-                        severity='Critical'
-                    )]
-                )
-                all_reports.append(error_report)
-        
-        debug(task_id, f"任务处理完成，准备返回结果: {task_id}")
-        debug(task_id, f"最终统计 - 报告: {len(all_reports)}, 单元测试: {len(all_unit_cases)}, 场景测试: {len(all_scenario_cases)}")
-        
-        # 检查是否所有项目都失败了
-        successful_projects = len([r for r in all_reports if not r.issues or not any(issue.type == '系统错误' for issue in r.issues)])
-        error_description = [r.issues[0].description for r in all_reports if r.issues and r.issues[0].type == '系统错误']
-        total_projects = len(diff_results)
-        
-        if successful_projects == 0 and total_projects > 0:
-            debug(task_id, f"所有项目都失败了，中止任务")
-            raise Exception("所有项目都处理失败，任务中止", ''.join(error_description))
-        
-        return ProcessingResult(
-            reports=all_reports,
-            unit_cases=all_unit_cases,
-            scenario_cases=all_scenario_cases
-        )
-    
-    def _log_debug(self, task_id: str, message: str):
-        """记录调试信息到任务文件"""
-        try:
-            task_dir = config_manager.ensure_task_data_dir()
-            task_file = task_dir / f'{task_id}.yaml'
-            if task_file.exists():
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task_data = yaml.safe_load(f) or {}
-                if 'debug_log' not in task_data:
-                    task_data['debug_log'] = []
-                task_data['debug_log'].append(f"{datetime.now().isoformat()}: {message}")
-                task_data['updated_at'] = datetime.now().isoformat()
-                with open(task_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
-        except Exception as e:
-            debug(task_id, f"记录调试信息失败: {e}")
+                debug("合并调试日志失败: %s", e)
     
     def _convert_git_result_to_project(self, git_result: Dict[str, Any], task_id: str) -> Dict[str, Any]:
         """
@@ -364,58 +526,46 @@ class TaskProcessor:
             转换后的项目数据
         """
         project_name = git_result.get('project_name', 'unknown')
-        debug(task_id, f"转换Git结果: {project_name}")
+        debug("转换Git结果: %s", project_name)
         
         # 检查是否有错误
         if 'error' in git_result:
             error_msg = git_result['error']
-            debug(task_id, f"项目 {project_name} Git API错误: {error_msg}")
+            debug("项目 %s Git API错误: %s", project_name, error_msg)
             
-            # 根据错误类型提供友好提示并直接抛出异常
-            if 'SSLError' in error_msg or 'SSL' in error_msg:
-                debug(task_id, f"网络连接错误 - 可能需要检查网络连接或使用代理")
-                raise Exception(f"网络连接失败: SSL错误。请检查网络连接或配置代理。详细信息: {error_msg}")
-            elif 'Max retries exceeded' in error_msg:
-                debug(task_id, f"网络超时 - 请检查网络连接")
-                raise Exception(f"网络连接超时: 请检查网络连接后重试。详细信息: {error_msg}")
-            elif 'Connection reset by peer' in error_msg or 'ConnectionResetError' in error_msg or 'Connection aborted' in error_msg:
-                debug(task_id, f"网络连接被重置 - 请检查网络连接")
-                raise Exception(f"网络连接被重置: 请检查网络连接或稍后重试。详细信息: {error_msg}")
-            elif '404' in error_msg:
-                debug(task_id, f"分支或仓库不存在 - 请检查分支名称")
-                raise Exception(f"分支或仓库不存在: 请检查分支名称是否正确。详细信息: {error_msg}")
-            else:
-                raise Exception(f"Git API调用失败: {error_msg}")
+            # 根据错误类型提供友好提示并直接抛出异常，规则按优先级匹配
+            for markers, hint, message in _GIT_ERROR_RULES:
+                if any(marker in error_msg for marker in markers):
+                    debug(hint)
+                    raise Exception(f"{message}详细信息: {error_msg}")
+            raise Exception(f"Git API调用失败: {error_msg}")
         
         # 检查是否有diff_data
         diff_data = git_result.get('diff_data')
         if not diff_data or 'files' not in diff_data:
-            debug(task_id, f"项目 {project_name} 无diff数据")
+            debug("项目 %s 无diff数据", project_name)
             return {
                 'project_name': project_name,
                 'files': []
             }
         
-        # 转换文件格式
-        files = []
-        for file_info in diff_data['files']:
-            filename = file_info.get('filename', '')
-            patch = file_info.get('patch', '')
-            filestatus = {
-                'status': file_info.get('status', ''),
-                'additions': file_info.get('additions', 0),
-                'deletions': file_info.get('deletions', 0),
-                'changes': file_info.get('changes', 0)
+        # 转换文件格式，跳过缺少文件名或patch的条目
+        files = [
+            {
+                'filename': file_info['filename'],
+                'filestatus': {
+                    'status': file_info.get('status', ''),
+                    'additions': file_info.get('additions', 0),
+                    'deletions': file_info.get('deletions', 0),
+                    'changes': file_info.get('changes', 0)
+                },
+                'diff_content': file_info['patch']
             }
-            
-            if filename and patch:
-                files.append({
-                    'filename': filename,
-                    'filestatus': filestatus,
-                    'diff_content': patch
-                })
+            for file_info in diff_data['files']
+            if file_info.get('filename') and file_info.get('patch')
+        ]
         
-        debug(task_id, f"项目 {project_name} 转换得到 {len(files)} 个文件")
+        debug("项目 %s 转换得到 %s 个文件", project_name, len(files))
         
         return {
             'project_name': project_name,
@@ -424,190 +574,124 @@ class TaskProcessor:
     
     def _extract_module_name(self, filename: str) -> str:
         """从文件名提取模块名"""
-        # 移除文件扩展名
-        import os
-        base_name = os.path.splitext(os.path.basename(filename))[0]
-        
-        # 从路径中提取模块信息
-        path_parts = filename.split('/')
+        path_parts = set(filename.split('/'))
         
-        # 常见的模块分类
-        if 'api' in path_parts:
-            if 'models' in path_parts:
-                return 'API模型层'
-            elif 'services' in path_parts:
-                return 'API服务层'
-            elif 'controllers' in path_parts or 'routes' in path_parts:
-                return 'API控制器'
-            elif 'extensions' in path_parts:
-                return 'API扩展'
-            else:
-                return 'API层'
-        elif 'models' in path_parts:
-            return '数据模型'
-        elif 'services' in path_parts:
-            return '业务服务'
-        elif 'utils' in path_parts or 'helpers' in path_parts:
-            return '工具函数'
-        elif 'tests' in path_parts:
-            return '测试模块'
-        elif 'config' in path_parts:
-            return '配置模块'
-        else:
-            return '核心功能'
+        for required_parts, module_name in _MODULE_RULES:
+            if required_parts <= path_parts:
+                return module_name
+        return '核心功能'
     
-    def _process_project(self, project_result: Dict[str, Any], task_id: str) -> tuple:
+    async def _process_project(self, project_result: Dict[str, Any], task_id: str,
+                               state_manager: TaskStateManager) -> tuple:
         """
         处理单个项目
         
         Args:
             project_result: 项目结果数据
             task_id: 任务ID
+            state_manager: 任务状态管理器
             
         Returns:
             tuple: (reports, unit_cases, scenario_cases)
         """
         project_name = project_result.get('project_name', 'unknown')
-        debug(task_id, f"_process_project开始: {project_name}")
+        debug("_process_project开始: %s", project_name)
         
         # 记录进入_process_project
         self._log_debug(task_id, f"进入_process_project: {project_name}")
         
-        # 初始化状态管理器
-        state_manager = TaskStateManager(task_id)
-        
         # 初始化所有文件状态
-        for file_data in project_result.get('files', []):
-            filename = file_data.get('filename', '')
-            if filename:
-                state_manager.initialize_file(filename, project_name)
+        state_manager.initialize_files([
+            (file_data['filename'], project_name)
+            for file_data in project_result.get('files', [])
+            if file_data.get('filename')
+        ])
         
         # 选择处理方式：异步或同步
         if self.use_async and len(project_result.get('files', [])) > 1:
-            debug(task_id, f"使用异步处理模式，文件数量: {len(project_result.get('files', []))}")
+            debug("使用异步处理模式，文件数量: %s", len(project_result.get('files', [])))
             self._log_debug(task_id, f"使用异步处理模式，文件数量: {len(project_result.get('files', []))}")
-            return self._process_project_async(project_result, task_id, state_manager)
+            return await self._process_project_async(project_result, task_id, state_manager)
         else:
-            debug(task_id, f"使用同步处理模式")
+            debug("使用同步处理模式")
             self._log_debug(task_id, f"使用同步处理模式")
-            return self._process_project_sync(project_result, task_id, state_manager)
+            return await self._process_project_sync(project_result, task_id, state_manager)
     
-    def _process_project_async(self, project_result: Dict[str, Any], task_id: str, state_manager: TaskStateManager) -> tuple:
+    async def _process_project_async(self, project_result: Dict[str, Any], task_id: str, state_manager: TaskStateManager) -> tuple:
         """异步处理项目"""
         project_name = project_result.get('project_name', 'unknown')
         
-        # 初始化异步处理器（如果还没有）
+        # 初始化异步处理器（如果还没有），与项目共享状态管理器
         if self.async_processor is None:
-            self.async_processor = AsyncTaskProcessor(task_id)
+            self.async_processor = AsyncTaskProcessor(task_id, state_manager)
         
         try:
             # 准备文件数据
-            files_data = []
-            for file_data in project_result.get('files', []):
-                files_data.append({
-                    'filename': file_data.get('filename', ''),
-                    'filestatus': file_data.get('filestatus', {}),
-                    'diff_content': file_data.get('diff_content', ''),
-                    'project_name': project_name
-                })
+            files = [
+                FileTask(file_data.get('filename', ''), file_data.get('filestatus', {}), file_data.get('diff_content', ''))
+                for file_data in project_result.get('files', [])
+            ]
             
             # 运行异步处理
-            if sys.platform == 'win32':
-                # Windows需要特殊处理
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(
-                        self.async_processor.process_files_async(files_data, task_id)
-                    )
-                finally:
-                    loop.close()
-            else:
-                # Unix/Linux系统
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                result = loop.run_until_complete(
-                    self.async_processor.process_files_async(files_data, task_id)
-                )
-            
-            # 转换结果格式
-            reports = []
-            unit_cases = []
-            scenario_cases = []
+            result = await self.async_processor.process_files_async(files, project_name, task_id)
             
-            # 处理审查结果
-            for review_result in result.get('review_results', []):
-                if review_result.get('issues'):
-                    issues = []
-                    for issue_data in review_result['issues']:
-                        issue = CodeIssue(
-                            type=issue_data.get('type', ''),
-                            description=issue_data.get('description', ''),
-                            suggestion=issue_data.get('suggestion', ''),
-                            severity=issue_data.get('severity', 'Medium')
-                        )
-                        issues.append(issue)
-                    
-                    report = ReviewReport(
-                        project_name=review_result['project_name'],
-                        filename=review_result['filename'],
-                        summary=review_result['summary'],
-                        filestatus=review_result['filestatus'],
-                        business_logic=review_result['business_logic'],
-                        language_detected=review_result['language_detected'],
-                        diff_content=review_result['diff_content'],
-                        issues=issues
+            # 转换结果格式：review_result和unit_case由异步处理器按模型字段构造，可直接解包；
+            # 问题和场景用例来自LLM输出，字段可能缺失或多余，仍逐项取值
+            reports = [
+                ReviewReport(**{**review_result, 'issues': [
+                    CodeIssue(
+                        type=issue_data.get('type', ''),
+                        description=issue_data.get('description', ''),
+                        suggestion=issue_data.get('suggestion', ''),
+                        severity=issue_data.get('severity', 'Medium')
                     )
-                    reports.append(report)
+                    for issue_data in review_result['issues']
+                ]})
+                for review_result in result.get('review_results', [])
+                if review_result.get('issues')
+            ]
             
-            # 处理单元测试结果
-            for unit_case in result.get('unit_cases', []):
-                case = UnitTestCase(
-                    project_name=unit_case['project_name'],
-                    filename=unit_case['filename'],
-                    code=unit_case['code'],
-                    description=unit_case['description']
-                )
-                unit_cases.append(case)
+            unit_cases = [UnitTestCase(**unit_case) for unit_case in result.get('unit_cases', [])]
             
-            # 处理场景测试结果
-            for scenario_case in result.get('scenario_cases', []):
-                case = ScenarioTestCase(
-                    case_id=scenario_case.get('case_id', ''),
-                    title=scenario_case.get('title', ''),
-                    preconditions=scenario_case.get('preconditions', ''),
-                    steps=scenario_case.get('steps', ''),
-                    expected_result=scenario_case.get('expected_result', ''),
-                    project_name=scenario_case.get('project_name', ''),
-                    filename=scenario_case.get('filename', ''),
-                    module=scenario_case.get('module', '')
+            scenario_cases = [
+                # 按ScenarioTestCase字段顺序位置传参
+                ScenarioTestCase(
+                    scenario_case.get('case_id', ''), scenario_case.get('title', ''),
+                    scenario_case.get('preconditions', ''), scenario_case.get('steps', ''),
+                    scenario_case.get('expected_result', ''), scenario_case.get('project_name', ''),
+                    scenario_case.get('filename', ''), scenario_case.get('module', '')
                 )
-                scenario_cases.append(case)
+                for scenario_case in result.get('scenario_cases', [])
+            ]
             
             # 异步处理完成前检查是否被中止
             self._check_task_abort(task_id)
             
-            debug(task_id, f"异步处理完成 - 报告: {len(reports)}, 单元测试: {len(unit_cases)}, 场景测试: {len(scenario_cases)}")
+            debug("异步处理完成 - 报告: %s, 单元测试: %s, 场景测试: %s", len(reports), len(unit_cases), len(scenario_cases))
             self._log_debug(task_id, f"异步处理完成 - 报告: {len(reports)}, 单元测试: {len(unit_cases)}, 场景测试: {len(scenario_cases)}")
             
             return reports, unit_cases, scenario_cases
             
+        except AsyncTaskAbortedException as e:
+            # 中止无需回退同步处理
+            raise TaskAbortedException(str(e)) from e
+        except TaskAbortedException:
+            raise
         except Exception as e:
-            debug(task_id, f"异步处理失败，回退到同步模式: {e}")
+            # 网络错误回退同步处理也会失败，直接抛出避免重复调用LLM
+            if any(marker in str(e) for marker in _NETWORK_ERROR_MARKERS):
+                raise
+            debug("异步处理失败，回退到同步模式: %s", e)
             self._log_debug(task_id, f"异步处理失败，回退到同步模式: {str(e)}")
-            return self._process_project_sync(project_result, task_id, state_manager)
+            return await self._process_project_sync(project_result, task_id, state_manager)
     
-    def _process_project_sync(self, project_result: Dict[str, Any], task_id: str, state_manager: TaskStateManager) -> tuple:
-        """同步处理项目（原有逻辑）"""
+    async def _process_project_sync(self, project_result: Dict[str, Any], task_id: str, state_manager: TaskStateManager) -> tuple:
+        """使用同步LLM客户端处理项目（原有逻辑），各文件在线程中并发处理"""
         project_name = project_result.get('project_name', 'unknown')
         
         # 检查错误
         if 'error' in project_result:
-            debug(task_id, f"项目有错误: {project_result['error']}")
+            debug("项目有错误: %s", project_result['error'])
             self._log_debug(task_id, f"项目有错误: {project_result['error']}")
             error_report = ReviewReport(
                 project_name=project_name,
@@ -628,84 +712,98 @@ class TaskProcessor:
 
         # 检查diff数据
         diff_data = project_result.get('diff_data')
-        debug(task_id, f"检查diff数据: {bool(diff_data)}")
+        debug("检查diff数据: %s", bool(diff_data))
         self._log_debug(task_id, f"检查diff数据: {bool(diff_data)}")
         
         if not diff_data or not diff_data.get('files'):
-            debug(task_id, f"无代码变更或无files字段")
+            debug("无代码变更或无files字段")
             self._log_debug(task_id, "无代码变更或无files字段")
             return [], [], []
         
         files_count = len(diff_data['files'])
-        debug(task_id, f"发现 {files_count} 个文件变更")
+        debug("发现 %s 个文件变更", files_count)
         self._log_debug(task_id, f"发现 {files_count} 个文件变更")
         
-        reports = []
-        unit_cases = []
-        scenario_cases = []
-        
-        # 处理每个文件
+        # 处理每个文件：同步LLM调用放到线程中，所有文件并发执行
         self._log_debug(task_id, f"开始文件处理循环，共{files_count}个文件")
         
-        for i, file_diff in enumerate(diff_data['files'], 1):
-            filename = file_diff.get('filename', 'unknown')
-            patch = file_diff.get('patch', '')
-            
-            debug(task_id, f"文件 {i}/{files_count}: {filename}")
-            self._log_debug(task_id, f"开始处理文件 {i}/{files_count}: {filename}")
-            
-            if not patch:
-                debug(task_id, f"跳过文件: {filename} (无内容变更)")
-                self._log_debug(task_id, f"跳过文件: {filename} (无内容变更)")
-                continue
-            
-            debug(task_id, f"处理文件 {i}/{files_count}: {filename}")
-            
-            try:
-                # 处理单个文件
-                debug(task_id, f"准备调用_process_file: {filename}")
-                self._log_debug(task_id, f"准备调用_process_file: {filename}")
-                
-                file_reports, file_unit_cases, file_scenario_cases = self._process_file(
-                    project_name, filename, patch, task_id
-                )
-                
-                debug(task_id, f"_process_file完成: {filename}")
-                self._log_debug(task_id, f"_process_file完成: {filename} - 问题:{len(file_reports)}, 单元测试:{len(file_unit_cases)}, 场景测试:{len(file_scenario_cases)}")
-                
-                reports.extend(file_reports)
-                unit_cases.extend(file_unit_cases)
-                scenario_cases.extend(file_scenario_cases)
-                
-                debug(task_id, f"文件处理完成 - 问题:{len(file_reports)}, 单元测试:{len(file_unit_cases)}, 场景测试:{len(file_scenario_cases)}")
-                
-            except Exception as e:
-                debug(task_id, f"文件处理失败: {filename} - {str(e)}")
-                self._log_debug(task_id, f"文件处理失败: {filename} - {str(e)}")
-                import traceback
-                traceback.print_exc()
-                # 创建错误报告
-                error_report = ReviewReport(
-                    project_name=project_name,
-                    filename=filename,
-                    filestatus={},
-                    summary='N/A',
-                    business_logic='N/A',
-                    language_detected='N/A',
-                    issues=[CodeIssue(
-                        type='文件处理错误',
-                        description=f'文件处理异常: {str(e)}',
-                        suggestion='请检查文件内容或稍后重试',
-                        severity='Warning'
-                    )]
+        semaphore = asyncio.Semaphore(config_manager.get_file_concurrency())
+        
+        async def run_one(index: int, file_diff: Dict[str, Any]) -> Optional[tuple]:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self._process_file_entry, index, files_count, file_diff, project_name, task_id
                 )
-                reports.append(error_report)
-                continue
         
-        debug(task_id, f"_process_project即将返回: {project_name}")
+        # 每个文件的 (reports, unit_cases, scenario_cases)，按文件顺序合并
+        per_file = [
+            file_result for file_result in await asyncio.gather(
+                *(run_one(i, file_diff) for i, file_diff in enumerate(diff_data['files'], 1))
+            )
+            if file_result is not None
+        ]
+        
+        reports = list(chain.from_iterable(file_result[0] for file_result in per_file))
+        unit_cases = list(chain.from_iterable(file_result[1] for file_result in per_file))
+        scenario_cases = list(chain.from_iterable(file_result[2] for file_result in per_file))
+        
+        debug("_process_project即将返回: %s", project_name)
         self._log_debug(task_id, f"_process_project完成，准备返回: {project_name} - 总计报告:{len(reports)}, 单元测试:{len(unit_cases)}, 场景测试:{len(scenario_cases)}")
         return reports, unit_cases, scenario_cases
     
+    def _process_file_entry(self, index: int, files_count: int, file_diff: Dict[str, Any],
+                            project_name: str, task_id: str) -> Optional[tuple]:
+        """处理项目中的一个文件，无内容变更时返回None，失败时返回错误报告"""
+        filename = file_diff.get('filename', 'unknown')
+        patch = file_diff.get('patch', '')
+        
+        debug("文件 %s/%s: %s", index, files_count, filename)
+        self._log_debug(task_id, f"开始处理文件 {index}/{files_count}: {filename}")
+        
+        if not patch:
+            debug("跳过文件: %s (无内容变更)", filename)
+            self._log_debug(task_id, f"跳过文件: {filename} (无内容变更)")
+            return None
+        
+        debug("处理文件 %s/%s: %s", index, files_count, filename)
+        
+        try:
+            # 处理单个文件
+            debug("准备调用_process_file: %s", filename)
+            self._log_debug(task_id, f"准备调用_process_file: {filename}")
+            
+            file_reports, file_unit_cases, file_scenario_cases = self._process_file(
+                project_name, filename, patch, task_id
+            )
+            
+            debug("_process_file完成: %s", filename)
+            self._log_debug(task_id, f"_process_file完成: {filename} - 问题:{len(file_reports)}, 单元测试:{len(file_unit_cases)}, 场景测试:{len(file_scenario_cases)}")
+            
+            debug("文件处理完成 - 问题:%s, 单元测试:%s, 场景测试:%s", len(file_reports), len(file_unit_cases), len(file_scenario_cases))
+            return file_reports, file_unit_cases, file_scenario_cases
+            
+        except Exception as e:
+            debug("文件处理失败: %s - %s", filename, e)
+            self._log_debug(task_id, f"文件处理失败: {filename} - {str(e)}")
+            if config_manager.is_debug_tracebacks_enabled():
+                exception(f"文件处理失败: {filename}")
+            # 创建错误报告
+            error_report = ReviewReport(
+                project_name=project_name,
+                filename=filename,
+                filestatus={},
+                summary='N/A',
+                business_logic='N/A',
+                language_detected='N/A',
+                issues=[CodeIssue(
+                    type='文件处理错误',
+                    description=f'文件处理异常: {str(e)}',
+                    suggestion='请检查文件内容或稍后重试',
+                    severity='Warning'
+                )]
+            )
+            return [error_report], [], []
+    
     def _process_file(self, project_name: str, filename: str, patch: str, task_id: str) -> tuple:
         """
         处理单个文件
@@ -719,7 +817,7 @@ class TaskProcessor:
         Returns:
             tuple: (reports, unit_cases, scenario_cases)
         """
-        debug(task_id, f"进入_process_file: {filename}")
+        debug("进入_process_file: %s", filename)
         self._log_debug(task_id, f"进入_process_file: {filename}")
         
         reports = []
@@ -727,28 +825,23 @@ class TaskProcessor:
         scenario_cases = []
         
         # 设置文件处理超时（8分钟，给API更多时间）
-        timeout_occurred = threading.Event()
-        start_time = time.time()
-        
-        def timeout_handler():
-            time.sleep(480)  # 8分钟
-            timeout_occurred.set()
+        deadline = time.monotonic() + 480
         
-        timeout_thread = threading.Thread(target=timeout_handler, daemon=True)
-        timeout_thread.start()
+        def expired() -> bool:
+            return time.monotonic() > deadline
         
         try:
             # 代码审查
             try:
-                if timeout_occurred.is_set():
+                if expired():
                     raise TimeoutError(f"文件处理超时: {filename}")
                     
-                debug(task_id, f"准备调用LLM代码审查: {filename}")
+                debug("准备调用LLM代码审查: %s", filename)
                 self._log_debug(task_id, f"准备调用LLM代码审查: {filename}")
                 
                 review_result = self.llm_client.code_review(filename, patch)
                 
-                debug(task_id, f"LLM代码审查完成: {filename}")
+                debug("LLM代码审查完成: %s", filename)
                 self._log_debug(task_id, f"LLM代码审查完成: {filename}")
                 
                 if review_result.get('issues'):
@@ -766,10 +859,10 @@ class TaskProcessor:
                         diff_content=patch  # 添加diff内容
                     )
                     reports.append(report)
-                    debug(task_id, f"发现 {len(issues)} 个问题")
+                    debug("发现 %s 个问题", len(issues))
                     self._log_debug(task_id, f"代码审查发现 {len(issues)} 个问题: {filename}")
                 else:
-                    debug(task_id, f"未发现问题")
+                    debug("未发现问题")
                     self._log_debug(task_id, f"代码审查未发现问题: {filename}")
             
             except TimeoutError as e:
@@ -810,18 +903,18 @@ class TaskProcessor:
                 reports.append(error_report)
             
             # 并行生成单元测试和场景测试
-            debug(task_id, f"开始并行调用单元测试和场景测试生成: {filename}")
+            debug("开始并行调用单元测试和场景测试生成: %s", filename)
             self._log_debug(task_id, f"开始并行调用单元测试和场景测试生成: {filename}")
             
-            import concurrent.futures
-            
             def generate_unit_tests():
                 try:
-                    if timeout_occurred.is_set():
+                    if expired():
                         raise TimeoutError(f"文件处理超时: {filename}")
                     
-                    debug(task_id, f"并行调用单元测试生成: {filename}")
-                    unit_test_result = self.llm_client.generate_unit_tests(filename, patch)
+                    debug("并行调用单元测试生成: %s", filename)
+                    unit_test_result = self._call_llm_with_retry(
+                        deadline, self.llm_client.generate_unit_tests, filename, patch
+                    )
                     
                     if unit_test_result.get('unit_test_code'):
                         return UnitTestCase(
@@ -843,30 +936,28 @@ class TaskProcessor:
             
             def generate_scenario_tests():
                 try:
-                    if timeout_occurred.is_set():
+                    if expired():
                         raise TimeoutError(f"文件处理超时: {filename}")
                     
-                    debug(task_id, f"并行调用场景测试生成: {filename}")
-                    scenario_test_result = self.llm_client.generate_scenario_tests(filename, patch)
+                    debug("并行调用场景测试生成: %s", filename)
+                    scenario_test_result = self._call_llm_with_retry(
+                        deadline, self.llm_client.generate_scenario_tests, filename, patch
+                    )
+                    
+                    if not scenario_test_result.get('scenario_cases'):
+                        return []
                     
-                    generated_cases = []
-                    if scenario_test_result.get('scenario_cases'):
-                        for case in scenario_test_result['scenario_cases']:
-                            # 从文件名推断模块名
-                            module_name = self._extract_module_name(filename)
-                            
-                            scenario_case = ScenarioTestCase(
-                                case_id=case.get('case_id', ''),
-                                title=case.get('title', ''),
-                                preconditions=case.get('preconditions', ''),
-                                steps=case.get('steps', ''),
-                                expected_result=case.get('expected_result', ''),
-                                project_name=project_name,
-                                filename=filename,
-                                module=case.get('module', module_name)  # 优先使用LLM返回的模块名
-                            )
-                            generated_cases.append(scenario_case)
-                    return generated_cases
+                    # 从文件名推断模块名，同一文件的用例共用
+                    module_name = self._extract_module_name(filename)
+                    # 按ScenarioTestCase字段顺序位置传参，模块名优先使用LLM返回值
+                    return [
+                        ScenarioTestCase(
+                            case.get('case_id', ''), case.get('title', ''), case.get('preconditions', ''),
+                            case.get('steps', ''), case.get('expected_result', ''),
+                            project_name, filename, case.get('module', module_name)
+                        )
+                        for case in scenario_test_result['scenario_cases']
+                    ]
                     
                 except Exception as e:
                     warning(f"场景测试生成失败: {e}")
@@ -882,39 +973,40 @@ class TaskProcessor:
                         module=module_name
                     )]
             
-            # 使用线程池并行执行
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                # 提交两个任务
-                unit_future = executor.submit(generate_unit_tests)
-                scenario_future = executor.submit(generate_scenario_tests)
-                
-                # 等待结果
-                try:
-                    unit_result = unit_future.result(timeout=300)  # 5分钟超时
-                    if unit_result:
-                        unit_cases.append(unit_result)
-                        debug(task_id, f"单元测试生成完成: {filename}")
-                        self._log_debug(task_id, f"单元测试生成完成: {filename}")
-                except Exception as e:
-                    warning(f"单元测试生成异常: {e}")
-                    self._log_debug(task_id, f"单元测试生成异常: {filename} - {str(e)}")
-                
-                try:
-                    scenario_results = scenario_future.result(timeout=300)  # 5分钟超时
-                    if scenario_results:
-                        scenario_cases.extend(scenario_results)
-                        debug(task_id, f"场景测试生成完成: {filename} - {len(scenario_results)}个用例")
-                        self._log_debug(task_id, f"场景测试生成完成: {filename} - {len(scenario_results)}个用例")
-                except Exception as e:
-                    warning(f"场景测试生成异常: {e}")
-                    self._log_debug(task_id, f"场景测试生成异常: {filename} - {str(e)}")
+            # 使用处理器共享的线程池并行执行
+            executor = self._get_io_executor()
+            unit_future = executor.submit(generate_unit_tests)
+            scenario_future = executor.submit(generate_scenario_tests)
+            
+            # 同时等待两个结果，最多等待5分钟且不超过文件处理截止时间
+            wait([unit_future, scenario_future], timeout=min(300, max(0, deadline - time.monotonic())))
             
-            debug(task_id, f"并行调用完成: {filename}")
+            try:
+                unit_result = unit_future.result(timeout=0)
+                if unit_result:
+                    unit_cases.append(unit_result)
+                    debug("单元测试生成完成: %s", filename)
+                    self._log_debug(task_id, f"单元测试生成完成: {filename}")
+            except Exception as e:
+                warning(f"单元测试生成异常: {e}")
+                self._log_debug(task_id, f"单元测试生成异常: {filename} - {str(e)}")
+            
+            try:
+                scenario_results = scenario_future.result(timeout=0)
+                if scenario_results:
+                    scenario_cases.extend(scenario_results)
+                    debug("场景测试生成完成: %s - %s个用例", filename, len(scenario_results))
+                    self._log_debug(task_id, f"场景测试生成完成: {filename} - {len(scenario_results)}个用例")
+            except Exception as e:
+                warning(f"场景测试生成异常: {e}")
+                self._log_debug(task_id, f"场景测试生成异常: {filename} - {str(e)}")
+            
+            debug("并行调用完成: %s", filename)
             self._log_debug(task_id, f"并行调用完成: {filename}")
         
         finally:
             # 检查是否超时
-            if timeout_occurred.is_set():
+            if expired():
                 warning(f"文件处理超时: {filename}")
                 error_report = ReviewReport(
                     project_name=project_name,
@@ -934,6 +1026,20 @@ class TaskProcessor:
         
         return reports, unit_cases, scenario_cases
     
+    def _call_llm_with_retry(self, deadline: float, func, *args):
+        """调用LLM，遇到临时错误时带抖动退避重试，重试不超过文件处理截止时间"""
+        for delay in _LLM_RETRY_DELAYS:
+            try:
+                return func(*args)
+            except Exception as e:
+                wait_time = delay + random.uniform(0, delay / 2)
+                if (not any(marker in str(e) for marker in _TRANSIENT_LLM_ERROR_MARKERS)
+                        or time.monotonic() + wait_time >= deadline):
+                    raise
+                warning("LLM调用临时失败，%.1f秒后重试: %s", wait_time, e)
+                time.sleep(wait_time)
+        return func(*args)
+    
     def convert_result_to_dict(self, result: ProcessingResult) -> Dict[str, Any]:
         """将ProcessingResult转换为字典格式，包含统计信息"""
         result_dict = {
@@ -991,47 +1097,84 @@ class TaskProcessor:
 class TaskStatusManager:
     """任务状态管理器"""
     
+    @staticmethod
+    def clear_abort_marker(task_id: str) -> None:
+        """删除中止接口创建的标记文件，任务开始、恢复或结束时调用"""
+        try:
+            (config_manager.ensure_task_data_dir() / f'{task_id}.aborted').unlink(missing_ok=True)
+        except OSError as e:
+            warning(f"删除任务中止标记失败: {task_id} - {e}")
+    
     @staticmethod
     def update_task_status(task_id: str, status: str, result: Optional[Dict] = None):
         """更新任务状态"""
+        TaskStatusManager.bulk_update_task_status([(task_id, status, result)])
+    
+    @staticmethod
+    def bulk_update_task_status(rows: List[Tuple[str, str, Optional[Dict]]]):
+        """
+        批量更新任务状态，同一任务的多次更新按顺序合并为一次读写
+        
+        Args:
+            rows: (任务ID, 状态, 结果) 列表
+        """
+        updates: Dict[str, List[Tuple[str, Optional[Dict]]]] = {}
+        for task_id, status, result in rows:
+            updates.setdefault(task_id, []).append((status, result))
+        
+        for task_id, task_updates in updates.items():
+            TaskStatusManager._write_task_updates(task_id, task_updates)
+    
+    @staticmethod
+    def _write_task_updates(task_id: str, task_updates: List[Tuple[str, Optional[Dict]]]):
+        """在一次读改写中依次应用同一任务的状态更新"""
+        status = task_updates[-1][0]
         try:
             # 确保目录存在
             task_dir = config_manager.ensure_task_data_dir()
             task_file = task_dir / f'{task_id}.yaml'
             
-            # 读取现有数据
-            existing_data = {}
-            if task_file.exists():
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    existing_data = yaml.safe_load(f) or {}
-            
-            # 更新任务数据
-            task_data = {
-                'id': task_id,
-                'status': status,
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # 保留原有数据
-            task_data.update(existing_data)
-            
-            # 更新状态和时间
-            task_data['status'] = status
-            task_data['updated_at'] = datetime.now().isoformat()
-            
-            # 添加调试信息
-            if 'debug_log' not in task_data:
-                task_data['debug_log'] = []
-            task_data['debug_log'].append(f"{datetime.now().isoformat()}: 状态更新为 {status}")
-            
-            # 如果有结果，更新结果
-            if result:
-                task_data['result'] = result
-                task_data['debug_log'].append(f"{datetime.now().isoformat()}: 结果数据已设置 (大小: {len(str(result))} 字符)")
-            
-            # 写入更新后的数据
-            with open(task_file, 'w', encoding='utf-8') as f:
-                yaml.dump(task_data, f, default_flow_style=False, allow_unicode=True)
+            # 读改写期间持有任务文件锁，避免与调试日志合并互相覆盖
+            with _task_file_lock(task_id):
+                # 读取现有数据
+                existing_data = {}
+                if task_file.exists():
+                    with open(task_file, 'r', encoding='utf-8') as f:
+                        existing_data = _yaml_load(f) or {}
+                
+                # 更新任务数据
+                task_data = {
+                    'id': task_id,
+                    'status': status,
+                    'updated_at': datetime.now().isoformat()
+                }
+                
+                # 保留原有数据
+                task_data.update(existing_data)
+                
+                # 添加调试信息
+                if 'debug_log' not in task_data:
+                    task_data['debug_log'] = []
+                
+                for status, result in task_updates:
+                    # 延迟写入期间用户已中止时，不用进行中或已完成覆盖中止状态
+                    if task_data['status'] == 'aborted' and status in ('processing', 'completed'):
+                        task_data['debug_log'].append(f"{datetime.now().isoformat()}: 任务已中止，忽略状态更新 {status}")
+                        status = 'aborted'
+                        continue
+                    
+                    # 更新状态和时间
+                    task_data['status'] = status
+                    task_data['updated_at'] = datetime.now().isoformat()
+                    task_data['debug_log'].append(f"{datetime.now().isoformat()}: 状态更新为 {status}")
+                    
+                    # 如果有结果，更新结果
+                    if result:
+                        task_data['result'] = result
+                        task_data['debug_log'].append(f"{datetime.now().isoformat()}: 结果数据已设置 ({_describe_result(result)})")
+                
+                # 写入更新后的数据
+                _write_task_file(task_file, task_data)
             
             info(f"任务状态已更新: {task_id} -> {status}")
             
@@ -1041,14 +1184,14 @@ class TaskStatusManager:
             try:
                 task_dir = config_manager.ensure_task_data_dir()
                 task_file = task_dir / f'{task_id}.yaml'
-                if task_file.exists():
-                    with open(task_file, 'r', encoding='utf-8') as f:
-                        existing_data = yaml.safe_load(f) or {}
-                    if 'debug_log' not in existing_data:
-                        existing_data['debug_log'] = []
-                    existing_data['debug_log'].append(f"{datetime.now().isoformat()}: 状态更新失败: {str(e)}")
-                    with open(task_file, 'w', encoding='utf-8') as f:
-                        yaml.dump(existing_data, f, default_flow_style=False, allow_unicode=True)
+                with _task_file_lock(task_id):
+                    if task_file.exists():
+                        with open(task_file, 'r', encoding='utf-8') as f:
+                            existing_data = _yaml_load(f) or {}
+                        if 'debug_log' not in existing_data:
+                            existing_data['debug_log'] = []
+                        existing_data['debug_log'].append(f"{datetime.now().isoformat()}: 状态更新失败: {str(e)}")
+                        _write_task_file(task_file, existing_data)
             except:
                 pass
 
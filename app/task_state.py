@@ -2,14 +2,42 @@
 任务状态跟踪模块 - 记录任务中每个文件的处理状态
 """
 import yaml
+import json
 import os
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass, asdict
+from itertools import chain
 from .config_manager import config_manager
 from .logger import info, error, warning, debug
+from .utils.cache_manager import LRUCache
 
-@dataclass
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:  # PyYAML未编译libyaml时回退到纯Python实现
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+# 增量日志累计达到该条数时合并为快照
+_COMPACT_EVERY = 100
+
+# 已解析的状态快照：路径 -> (st_mtime_ns, st_size, files数据)，文件未变化时复用
+_snapshot_cache = LRUCache(capacity=32)
+
+
+def _json_line(data: Dict[str, Any]) -> bytes:
+    """序列化为一行JSON"""
+    if orjson is not None:
+        return orjson.dumps(data) + b'\n'
+    return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+@dataclass(slots=True)
 class FileProcessState:
     """文件处理状态"""
     filename: str
@@ -30,110 +58,280 @@ class TaskStateManager:
         self.task_id = task_id
         self.task_dir = config_manager.ensure_task_data_dir()
         self.state_file = self.task_dir / f'{task_id}_state.yaml'
+        # 状态变更以增量形式追加到该文件，定期合并到state_file快照
+        self.delta_file = self.task_dir / f'{task_id}_state.jsonl'
         self.file_states: Dict[str, FileProcessState] = {}
+        self._lock = threading.RLock()  # 多个项目并发更新时保护状态文件
+        self._pending_deltas = 0
+        # 增量日志以未写完的行结尾时，下次追加需先补换行
+        self._needs_newline = False
+        # 各项任务已完成的文件数，随状态变更增量维护
+        self._completed_counts = {'review': 0, 'unit_test': 0, 'scenario_test': 0}
+        # 已完成结果索引（按文件名），供get_completed_results直接返回
+        self._completed_reviews: Dict[str, Dict[str, Any]] = {}
+        self._completed_units: Dict[str, Dict[str, Any]] = {}
+        self._completed_scenarios: Dict[str, List[Dict[str, Any]]] = {}
         self._load_state()
     
     def _load_state(self):
-        """加载任务状态"""
+        """加载任务状态：读取快照后重放增量日志"""
         try:
-            if self.state_file.exists():
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f) or {}
-                
-                files_data = data.get('files', {})
-                for filename, file_data in files_data.items():
-                    self.file_states[filename] = FileProcessState(
-                        filename=file_data['filename'],
-                        project_name=file_data['project_name'],
-                        review_status=file_data.get('review_status', 'pending'),
-                        unit_test_status=file_data.get('unit_test_status', 'pending'),
-                        scenario_test_status=file_data.get('scenario_test_status', 'pending'),
-                        review_result=file_data.get('review_result'),
-                        unit_test_result=file_data.get('unit_test_result'),
-                        scenario_test_result=file_data.get('scenario_test_result'),
-                        last_updated=file_data.get('last_updated'),
-                        error_message=file_data.get('error_message')
-                    )
-                    
-                debug(self.task_id, f"加载了 {len(self.file_states)} 个文件的状态")
+            for filename, file_data in self._load_snapshot().items():
+                self.file_states[filename] = FileProcessState(
+                    filename=file_data['filename'],
+                    project_name=file_data['project_name'],
+                    review_status=file_data.get('review_status', 'pending'),
+                    unit_test_status=file_data.get('unit_test_status', 'pending'),
+                    scenario_test_status=file_data.get('scenario_test_status', 'pending'),
+                    review_result=file_data.get('review_result'),
+                    unit_test_result=file_data.get('unit_test_result'),
+                    scenario_test_result=file_data.get('scenario_test_result'),
+                    last_updated=file_data.get('last_updated'),
+                    error_message=file_data.get('error_message')
+                )
+                self._index_state(self.file_states[filename], 1)
+            
+            if self.delta_file.exists():
+                self._replay_deltas()
+            
+            if self.file_states:
+                debug(f"加载了 {len(self.file_states)} 个文件的状态")
             
         except Exception as e:
             warning(f"TaskState加载状态失败: {e}")
             self.file_states = {}
+            self._completed_counts = dict.fromkeys(self._completed_counts, 0)
+            self._completed_reviews = {}
+            self._completed_units = {}
+            self._completed_scenarios = {}
     
-    def _save_state(self):
-        """保存任务状态"""
+    def _replay_deltas(self):
+        """逐行重放增量日志，跳过未写完或无法解析的行，保留其余已解析的增量"""
+        with open(self.delta_file, 'rb') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                if not line.endswith(b'\n'):
+                    # 崩溃时追加到一半，或处理器正在追加；后续追加前先补换行，避免与新增量粘连
+                    warning(f"TaskState跳过未写完的增量: {self.delta_file.name} 第{line_no}行")
+                    self._needs_newline = True
+                    break
+                try:
+                    delta = orjson.loads(line) if orjson is not None else json.loads(line)
+                except ValueError as e:
+                    warning(f"TaskState跳过无法解析的增量: {self.delta_file.name} 第{line_no}行 - {e}")
+                    continue
+                self._apply_delta(delta)
+                self._pending_deltas += 1
+    
+    def _load_snapshot(self) -> Dict[str, Any]:
+        """读取状态快照中的files数据，文件大小和修改时间未变时复用上次的解析结果"""
         try:
-            state_data = {
-                'task_id': self.task_id,
-                'updated_at': datetime.now().isoformat(),
-                'files': {}
+            st = self.state_file.stat()
+        except FileNotFoundError:
+            return {}
+        
+        cached = _snapshot_cache.get(str(self.state_file))
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            data = yaml.load(f, Loader=_YamlLoader) or {}
+        files_data = data.get('files', {})
+        _snapshot_cache.set(str(self.state_file), (st.st_mtime_ns, st.st_size, files_data))
+        return files_data
+    
+    def _index_state(self, file_state: FileProcessState, step: int):
+        """按文件当前状态增减已完成计数，并同步已完成结果索引（step为1加入，-1移除）"""
+        for kind in self._completed_counts:
+            if getattr(file_state, f'{kind}_status') == 'completed':
+                self._completed_counts[kind] += step
+        
+        filename = file_state.filename
+        if step < 0:
+            self._completed_reviews.pop(filename, None)
+            self._completed_units.pop(filename, None)
+            self._completed_scenarios.pop(filename, None)
+            return
+        
+        if file_state.review_status == 'completed' and file_state.review_result:
+            self._completed_reviews[filename] = {
+                'project_name': file_state.project_name,
+                'filename': filename,
+                'issues': file_state.review_result.get('issues', [])
             }
-            
-            for filename, file_state in self.file_states.items():
-                state_data['files'][filename] = asdict(file_state)
-            
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                yaml.dump(state_data, f, default_flow_style=False, allow_unicode=True)
+        
+        if file_state.unit_test_status == 'completed' and file_state.unit_test_result:
+            self._completed_units[filename] = {
+                'project_name': file_state.project_name,
+                'filename': filename,
+                'code': file_state.unit_test_result.get('unit_test_code', ''),
+                'description': file_state.unit_test_result.get('test_description', '')
+            }
+        
+        if file_state.scenario_test_status == 'completed' and file_state.scenario_test_result:
+            cases = file_state.scenario_test_result
+            # 异步处理记录的是包含scenario_cases的完整响应
+            if isinstance(cases, dict):
+                cases = cases.get('scenario_cases', [])
+            self._completed_scenarios[filename] = [
+                {**case, 'project_name': file_state.project_name, 'filename': filename}
+                for case in cases if isinstance(case, dict)
+            ]
+    
+    def _apply_delta(self, delta: Dict[str, Any]):
+        """将一条增量应用到内存状态，首条增量包含文件的完整状态"""
+        file_state = self.file_states.get(delta['filename'])
+        if file_state is None:
+            file_state = self.file_states[delta['filename']] = FileProcessState(**delta)
+        else:
+            self._index_state(file_state, -1)
+            for key, value in delta.items():
+                setattr(file_state, key, value)
+        self._index_state(file_state, 1)
+    
+    def _append_deltas(self, deltas: List[Dict[str, Any]]):
+        """追加状态增量，累计到一定数量时合并为快照"""
+        try:
+            with self._lock:
+                with open(self.delta_file, 'ab') as f:
+                    if self._needs_newline:
+                        f.write(b'\n')
+                        self._needs_newline = False
+                    f.write(b''.join(_json_line(delta) for delta in deltas))
+                
+                self._pending_deltas += len(deltas)
+                if self._pending_deltas >= _COMPACT_EVERY:
+                    self.compact()
+                
+        except Exception as e:
+            warning(f"TaskState保存状态失败: {e}")
+    
+    def _save_state(self):
+        """保存任务状态快照"""
+        try:
+            with self._lock:
+                state_data = {
+                    'task_id': self.task_id,
+                    'updated_at': datetime.now().isoformat(),
+                    'files': {}
+                }
+                
+                for filename, file_state in list(self.file_states.items()):
+                    state_data['files'][filename] = asdict(file_state)
+                
+                tmp_file = self.state_file.with_suffix('.yaml.tmp')
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    yaml.dump(state_data, f, Dumper=_YamlDumper, default_flow_style=False, allow_unicode=True)
+                os.replace(tmp_file, self.state_file)
+                
+                # 刚写入的快照无需再次解析
+                st = self.state_file.stat()
+                _snapshot_cache.set(str(self.state_file), (st.st_mtime_ns, st.st_size, state_data['files']))
                 
         except Exception as e:
             warning(f"TaskState保存状态失败: {e}")
     
+    def compact(self):
+        """将增量日志合并为快照"""
+        with self._lock:
+            if not self._pending_deltas:
+                return
+            self._save_state()
+            self.delta_file.unlink(missing_ok=True)
+            self._pending_deltas = 0
+            self._needs_newline = False
+    
+    def get_file_states(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有文件状态的字典形式"""
+        with self._lock:
+            return {filename: asdict(file_state) for filename, file_state in self.file_states.items()}
+    
     def initialize_file(self, filename: str, project_name: str):
         """初始化文件状态"""
-        if filename not in self.file_states:
-            self.file_states[filename] = FileProcessState(
-                filename=filename,
-                project_name=project_name,
-                last_updated=datetime.now().isoformat()
-            )
-            self._save_state()
-            debug(self.task_id, f"初始化文件状态: {filename}")
+        with self._lock:
+            if filename not in self.file_states:
+                file_state = FileProcessState(
+                    filename=filename,
+                    project_name=project_name,
+                    last_updated=datetime.now().isoformat()
+                )
+                self.file_states[filename] = file_state
+                self._append_deltas([asdict(file_state)])
+                debug(f"初始化文件状态: {filename}")
+    
+    def initialize_files(self, files: List[Tuple[str, str]]):
+        """批量初始化文件状态，只保存一次"""
+        with self._lock:
+            now = datetime.now().isoformat()
+            deltas = []
+            for filename, project_name in files:
+                if filename not in self.file_states:
+                    file_state = FileProcessState(
+                        filename=filename,
+                        project_name=project_name,
+                        last_updated=now
+                    )
+                    self.file_states[filename] = file_state
+                    deltas.append(asdict(file_state))
+            
+            if deltas:
+                self._append_deltas(deltas)
+                debug(f"批量初始化文件状态: {len(deltas)} 个文件")
     
     def update_review_status(self, filename: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
         """更新代码审查状态"""
-        if filename in self.file_states:
-            file_state = self.file_states[filename]
-            file_state.review_status = status
-            file_state.last_updated = datetime.now().isoformat()
-            
-            if result:
-                file_state.review_result = result
-            if error:
-                file_state.error_message = error
+        with self._lock:
+            if filename in self.file_states:
+                delta = {
+                    'filename': filename,
+                    'review_status': status,
+                    'last_updated': datetime.now().isoformat()
+                }
+                if result:
+                    delta['review_result'] = result
+                if error:
+                    delta['error_message'] = error
                 
-            self._save_state()
-            debug(self.task_id, f"更新审查状态: {filename} -> {status}")
+                self._apply_delta(delta)
+                self._append_deltas([delta])
+                debug(f"更新审查状态: {filename} -> {status}")
     
     def update_unit_test_status(self, filename: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
         """更新单元测试状态"""
-        if filename in self.file_states:
-            file_state = self.file_states[filename]
-            file_state.unit_test_status = status
-            file_state.last_updated = datetime.now().isoformat()
-            
-            if result:
-                file_state.unit_test_result = result
-            if error:
-                file_state.error_message = error
+        with self._lock:
+            if filename in self.file_states:
+                delta = {
+                    'filename': filename,
+                    'unit_test_status': status,
+                    'last_updated': datetime.now().isoformat()
+                }
+                if result:
+                    delta['unit_test_result'] = result
+                if error:
+                    delta['error_message'] = error
                 
-            self._save_state()
-            debug(self.task_id, f"更新单元测试状态: {filename} -> {status}")
+                self._apply_delta(delta)
+                self._append_deltas([delta])
+                debug(f"更新单元测试状态: {filename} -> {status}")
     
     def update_scenario_test_status(self, filename: str, status: str, result: Optional[List[Dict[str, Any]]] = None, error: Optional[str] = None):
         """更新场景测试状态"""
-        if filename in self.file_states:
-            file_state = self.file_states[filename]
-            file_state.scenario_test_status = status
-            file_state.last_updated = datetime.now().isoformat()
-            
-            if result:
-                file_state.scenario_test_result = result
-            if error:
-                file_state.error_message = error
+        with self._lock:
+            if filename in self.file_states:
+                delta = {
+                    'filename': filename,
+                    'scenario_test_status': status,
+                    'last_updated': datetime.now().isoformat()
+                }
+                if result:
+                    delta['scenario_test_result'] = result
+                if error:
+                    delta['error_message'] = error
                 
-            self._save_state()
-            debug(self.task_id, f"更新场景测试状态: {filename} -> {status}")
+                self._apply_delta(delta)
+                self._append_deltas([delta])
+                debug(f"更新场景测试状态: {filename} -> {status}")
     
     def is_file_review_completed(self, filename: str) -> bool:
         """检查文件的代码审查是否已完成"""
@@ -190,41 +388,12 @@ class TaskStateManager:
     
     def get_completed_results(self) -> Dict[str, Any]:
         """获取所有已完成的结果"""
-        review_results = []
-        unit_cases = []
-        scenario_cases = []
-        
-        for filename, file_state in self.file_states.items():
-            # 收集审查结果
-            if file_state.review_status == 'completed' and file_state.review_result:
-                review_results.append({
-                    'project_name': file_state.project_name,
-                    'filename': filename,
-                    'issues': file_state.review_result.get('issues', [])
-                })
-            
-            # 收集单元测试结果
-            if file_state.unit_test_status == 'completed' and file_state.unit_test_result:
-                unit_cases.append({
-                    'project_name': file_state.project_name,
-                    'filename': filename,
-                    'code': file_state.unit_test_result.get('unit_test_code', ''),
-                    'description': file_state.unit_test_result.get('test_description', '')
-                })
-            
-            # 收集场景测试结果
-            if file_state.scenario_test_status == 'completed' and file_state.scenario_test_result:
-                for case in file_state.scenario_test_result:
-                    case_data = case.copy()
-                    case_data['project_name'] = file_state.project_name
-                    case_data['filename'] = filename
-                    scenario_cases.append(case_data)
-        
-        return {
-            'review_results': review_results,
-            'unit_cases': unit_cases,
-            'scenario_cases': scenario_cases
-        }
+        with self._lock:
+            return {
+                'review_results': list(self._completed_reviews.values()),
+                'unit_cases': list(self._completed_units.values()),
+                'scenario_cases': list(chain.from_iterable(self._completed_scenarios.values()))
+            }
     
     def get_progress_summary(self) -> Dict[str, Any]:
         """获取进度摘要"""
@@ -238,12 +407,9 @@ class TaskStateManager:
                 'overall_progress': 0.0
             }
         
-        review_completed = sum(1 for state in self.file_states.values() 
-                              if state.review_status == 'completed')
-        unit_test_completed = sum(1 for state in self.file_states.values() 
-                                 if state.unit_test_status == 'completed')
-        scenario_test_completed = sum(1 for state in self.file_states.values() 
-                                    if state.scenario_test_status == 'completed')
+        review_completed = self._completed_counts['review']
+        unit_test_completed = self._completed_counts['unit_test']
+        scenario_test_completed = self._completed_counts['scenario_test']
         
         total_tasks = total_files * 3  # 每个文件3个任务
         completed_tasks = review_completed + unit_test_completed + scenario_test_completed
@@ -260,6 +426,11 @@ class TaskStateManager:
     def cleanup_state_file(self):
         """清理状态文件"""
         try:
+            with self._lock:
+                self.delta_file.unlink(missing_ok=True)
+                self._pending_deltas = 0
+                self._needs_newline = False
+            _snapshot_cache.delete(str(self.state_file))
             if self.state_file.exists():
                 os.remove(self.state_file)
                 info(f"清理状态文件: {self.state_file}")
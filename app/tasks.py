@@ -4,27 +4,43 @@ Celery任务定义 - 重构后的版本
 """
 
 import os
+import atexit
+import hashlib
+import signal
 import threading
-from typing import Dict, Any, List
+import weakref
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Callable, Tuple
 from celery import Celery
 
-from .task_processor import TaskProcessor, TaskAbortedException
-from .config_manager import ConfigManager
+from .task_processor import TaskProcessor, TaskAbortedException, TaskStatusManager
+from .config_manager import config_manager
+from .utils.notification_manager import NotificationMessage, NotificationLevel
+from .utils.notification_batcher import notification_batcher
+from .utils.status_writer import schedule_status
 from .logger import get_task_logger, info, error, warning, debug
 
 # 使用模拟的Celery应用
 import uuid
 import os
-from collections import defaultdict
+
+# 任务结果表的分片数量（2的幂），降低并发提交和查询时的锁竞争
+_TASK_SHARDS = 16
 
 class MockTaskResult:
     """模拟Celery任务结果"""
+    # 任务结果表以弱引用保存实例，需要保留__weakref__
+    __slots__ = ('id', 'task_id', '_status', '_result', '_traceback', '_future', '__weakref__')
+
     def __init__(self, task_id: str):
         self.id = task_id
         self.task_id = task_id
         self._status = 'PENDING'
         self._result = None
         self._traceback = None
+        # 线程池返回的Future，用于等待任务结束
+        self._future = None
 
     @property
     def status(self):
@@ -39,6 +55,8 @@ class MockTaskResult:
         return self._result
 
     def ready(self):
+        if self._future is not None:
+            return self._future.done()
         return self._status in ['SUCCESS', 'FAILURE', 'REVOKED']
 
     def successful(self):
@@ -48,6 +66,8 @@ class MockTaskResult:
         return self._status == 'FAILURE'
 
     def get(self, timeout=None):
+        if self._future is not None:
+            wait([self._future], timeout=timeout)
         if self._status == 'SUCCESS':
             return self._result
         elif self._status == 'FAILURE':
@@ -59,8 +79,30 @@ class MockCelery:
     """模拟Celery应用"""
 
     def __init__(self):
-        self._tasks = {}
-        self._task_registry = defaultdict(dict)
+        # 只弱引用任务结果，排队和执行中的任务由线程池持有，结束且无人引用后自动释放
+        # 按任务ID分片，每个分片有独立的锁
+        self._shards = [(weakref.WeakValueDictionary(), threading.Lock()) for _ in range(_TASK_SHARDS)]
+        # 参数相同且尚未结束的任务，重复提交时直接复用
+        self._inflight = weakref.WeakValueDictionary()
+        self._inflight_lock = threading.Lock()
+        self._task_registry: Dict[str, Callable] = {}
+        # 复用有界线程池执行后台任务，避免每个任务新建线程
+        max_workers = config_manager.get_mock_celery_workers()
+        info(f"MockCelery后台任务并发数: {max_workers}")
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='MockCelery'
+        )
+        # 执行中和排队中的任务总数上限，超出时由提交方直接执行以形成背压
+        self._slots = threading.BoundedSemaphore(max_workers + config_manager.get_mock_celery_queue_size())
+
+    def _shard(self, task_id: str):
+        """获取任务ID所在的分片 (任务结果表, 锁)"""
+        try:
+            index = int(task_id[:8], 16)
+        except ValueError:
+            index = hash(task_id)
+        return self._shards[index & (_TASK_SHARDS - 1)]
 
     def task(self, func):
         """装饰器：模拟Celery任务"""
@@ -73,35 +115,56 @@ class MockCelery:
 
         # 添加delay方法以模拟Celery任务（在后台线程中执行）
         def delay(*args, **kwargs):
-            task_id = str(uuid.uuid4())
-            task_result = MockTaskResult(task_id)
-            self._tasks[task_id] = task_result
+            inflight_key = hashlib.blake2b(
+                repr((task_name, args, sorted(kwargs.items()))).encode('utf-8')
+            ).hexdigest()
+            with self._inflight_lock:
+                running = self._inflight.get(inflight_key)
+                if running is not None and not running.ready():
+                    info(f"MockCelery复用执行中的相同任务: {func.__name__} (ID: {running.task_id})")
+                    return running
+                task_id = uuid.uuid4().hex
+                task_result = MockTaskResult(task_id)
+                self._inflight[inflight_key] = task_result
+            tasks, tasks_lock = self._shard(task_id)
+            with tasks_lock:
+                tasks[task_id] = task_result
 
             def run_task():
                 try:
                     info(f"MockCelery开始执行后台任务: {func.__name__} (ID: {task_id})")
-                    task_result._status = 'STARTED'
+                    with tasks_lock:
+                        task_result._status = 'STARTED'
 
                     # 执行实际任务
                     result = func(*args, **kwargs)
 
-                    task_result._status = 'SUCCESS'
-                    task_result._result = result
+                    with tasks_lock:
+                        task_result._status = 'SUCCESS'
+                        task_result._result = result
                     info(f"MockCelery后台任务执行完成: {func.__name__} (ID: {task_id})")
 
                 except Exception as e:
-                    task_result._status = 'FAILURE'
-                    task_result._result = str(e)
-                    task_result._traceback = e
-                    error(f"MockCelery后台任务执行失败: {func.__name__} (ID: {task_id}) - {e}")
-                    import traceback
-                    traceback.print_exc()
-
-            # 在后台线程中执行任务
-            thread = threading.Thread(target=run_task, name=f"MockCelery-{func.__name__}-{task_id[:8]}")
-            thread.daemon = True
-            thread.start()
-            info(f"MockCelery已启动后台线程: {thread.name}")
+                    with tasks_lock:
+                        task_result._status = 'FAILURE'
+                        task_result._result = str(e)
+                        task_result._traceback = e
+                    error("MockCelery后台任务执行失败: %s (ID: %s) - %s", func.__name__, task_id, e, exc_info=True)
+                finally:
+                    with self._inflight_lock:
+                        if self._inflight.get(inflight_key) is task_result:
+                            del self._inflight[inflight_key]
+
+            # 排队已满时在当前线程直接执行，避免待执行任务无限堆积
+            if not self._slots.acquire(blocking=False):
+                warning(f"MockCelery任务队列已满，在当前线程执行: {func.__name__} (ID: {task_id})")
+                run_task()
+                return task_result
+
+            # 提交到后台线程池执行任务
+            task_result._future = self._executor.submit(run_task)
+            task_result._future.add_done_callback(lambda _: self._slots.release())
+            info(f"MockCelery已提交后台任务: {func.__name__} (ID: {task_id})")
 
             return task_result
 
@@ -118,9 +181,63 @@ class MockCelery:
 
     def AsyncResult(self, task_id):
         """获取任务结果"""
-        return self._tasks.get(task_id, MockTaskResult(task_id))
+        tasks, tasks_lock = self._shard(task_id)
+        with tasks_lock:
+            return tasks.get(task_id) or MockTaskResult(task_id)
     
-celery_app = MockCelery()
+    def shutdown(self):
+        """关闭后台线程池，不等待正在执行的任务"""
+        self._executor.shutdown(wait=False)
+    
+# 配置了CELERY_BROKER_URL（如Redis）时使用真实的Celery，否则使用进程内的MockCelery
+_broker_url = config_manager.get_env_var('CELERY_BROKER_URL')
+if _broker_url:
+    celery_app = Celery('tasks', broker=_broker_url, backend=config_manager.get_env_var('CELERY_RESULT_BACKEND') or None)
+    celery_app.conf.worker_concurrency = config_manager.get_worker_concurrency()
+else:
+    celery_app = MockCelery()
+    atexit.register(celery_app.shutdown)
+
+
+@lru_cache(maxsize=1)
+def _cached_server() -> str:
+    """获取网页域名端口号，进程内只计算一次"""
+    return config_manager.get_server()
+
+
+@lru_cache(maxsize=1)
+def _cached_notification_config() -> Dict[str, Any]:
+    """获取通知配置，进程内只读取一次，配置更新后需调用clear_config_cache"""
+    return config_manager.get_notification_config()
+
+
+@lru_cache(maxsize=1)
+def _notification_targets() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """获取启用的通知提供者和收件人，随通知配置缓存一起失效"""
+    notification_config = _cached_notification_config()
+    enabled_providers = tuple(
+        provider for provider, config in notification_config.items()
+        if config.get('enabled', False)
+    )
+    # 获取收件人列表（这里可以从配置中获取，或者根据系统/项目配置）
+    # recipients = _get_notification_recipients(system_name, notification_config)
+    recipients = tuple(notification_config.get('email', {}).get('recipients', []))
+    return enabled_providers, recipients
+
+
+def clear_config_cache(*_) -> None:
+    """清除任务使用的配置缓存，可作为SIGHUP信号处理函数"""
+    _cached_server.cache_clear()
+    _cached_notification_config.cache_clear()
+    _notification_targets.cache_clear()
+
+
+# 收到SIGHUP时重新加载配置；非主线程导入或平台不支持时跳过
+if hasattr(signal, 'SIGHUP'):
+    try:
+        signal.signal(signal.SIGHUP, clear_config_cache)
+    except ValueError:
+        pass
 
 
 @celery_app.task
@@ -133,30 +250,31 @@ def review_code_task(system_name: str, branch_name: str, task_id: str):
         branch_name: 分支名称
         task_id: 任务ID
     """
-    from .task_processor import TaskStatusManager
-    
     processor = TaskProcessor()
-    status_manager = TaskStatusManager()
     # 获取网页域名端口号
-    web_domain_port = ConfigManager().get_server()
+    web_domain_port = _cached_server()
     try:
+        # 排队期间已被中止的任务直接结束，不覆盖aborted状态
+        processor._check_task_abort(task_id)
+        
         # 更新任务状态为进行中
         task_logger = get_task_logger(task_id)
-        task_logger.task_progress(task_id, "开始更新任务状态为processing")
-        status_manager.update_task_status(task_id, 'processing')
-        task_logger.task_progress(task_id, "任务状态已更新为processing")
+        schedule_status(task_id, 'processing')
+        # 各阶段只在DEBUG级别记录一条结构化事件，参数延迟格式化
+        task_logger.debug('phase=%s status=%s', 'status_update', 'processing')
         
         # 处理任务
-        task_logger.task_progress(task_id, "开始处理任务")
         result = processor.process_task(system_name, branch_name, task_id)
-        task_logger.task_progress(task_id, "任务处理完成，开始转换结果")
+        task_logger.debug('phase=%s status=%s', 'process', 'done')
         
         # 转换结果格式
         result_dict = processor.convert_result_to_dict(result)
-        task_logger.task_progress(task_id, "结果转换完成")
-        
-        # 打印统计信息
-        task_logger.task_complete(task_id, f"报告: {len(result.reports)}, 单元测试: {len(result.unit_cases)}, 场景测试: {len(result.scenario_cases)}")
+        # 后续只使用字典结果，提前释放数据类对象，降低写入任务文件时的内存峰值
+        del result
+        reports_count = len(result_dict['review_results'])
+        unit_tests_count = len(result_dict['unit_cases'])
+        scenario_tests_count = len(result_dict['scenario_cases'])
+        task_logger.debug('phase=%s status=%s', 'convert', 'done')
 
         # 更新任务状态为完成前，最后检查一次是否被中止
         try:
@@ -167,10 +285,9 @@ def review_code_task(system_name: str, branch_name: str, task_id: str):
             info(f"任务 {task_id} 在完成前被发现已中止")
             return  # 不设置为completed，保持aborted状态
         
-        # 更新任务状态为完成
-        task_logger.task_progress(task_id, "开始更新任务状态为completed")
-        status_manager.update_task_status(task_id, 'completed', result_dict)
-        task_logger.task_complete(task_id, "任务状态已更新为completed")
+        # 更新任务状态为完成，并打印统计信息
+        schedule_status(task_id, 'completed', result_dict)
+        task_logger.task_complete(task_id, f"报告: {reports_count}, 单元测试: {unit_tests_count}, 场景测试: {scenario_tests_count}")
 
         # 发送任务完成通知
         _send_task_notification(task_id, 'completed', {
@@ -178,9 +295,9 @@ def review_code_task(system_name: str, branch_name: str, task_id: str):
             'branch_name': branch_name,
             'task_id': task_id,
             'report_url': f"{web_domain_port}/report/{task_id}",
-            'reports_count': len(result.reports),
-            'unit_tests_count': len(result.unit_cases),
-            'scenario_tests_count': len(result.scenario_cases),
+            'reports_count': reports_count,
+            'unit_tests_count': unit_tests_count,
+            'scenario_tests_count': scenario_tests_count,
             'summary': result_dict['statistics']
         })
         
@@ -192,12 +309,19 @@ def review_code_task(system_name: str, branch_name: str, task_id: str):
         # 注意：任务状态已经在中止API中更新为aborted，这里不需要再次更新
         
     except Exception as e:
+        # 已被用户中止的任务保持aborted状态，不覆盖为failed
+        try:
+            processor._check_task_abort(task_id)
+        except TaskAbortedException:
+            info(f"任务 {task_id} 已被用户中止，忽略中止后的异常: {e}")
+            return
+        
         # 更新任务状态为失败
         task_logger = get_task_logger(task_id)
         task_logger.task_failed(task_id, str(e))
-        import traceback
-        traceback.print_exc()
-        status_manager.update_task_status(task_id, 'failed', {'error': str(e)})
+        task_logger.exception("任务执行失败")
+        # 失败状态立即落盘，确保进程随后退出也不会丢失
+        schedule_status(task_id, 'failed', {'error': str(e)}, flush=True)
         
         # 发送任务失败通知
         _send_task_notification(task_id, 'failed', {
@@ -206,47 +330,17 @@ def review_code_task(system_name: str, branch_name: str, task_id: str):
             'task_id': task_id,
             'error': str(e)
         })
+    
+    finally:
+        # 释放处理器的事件循环
+        processor.close()
+        # 任务已结束，中止标记不再需要，避免影响之后恢复的同ID任务
+        TaskStatusManager.clear_abort_marker(task_id)
 
 
-def _send_task_notification(task_id: str, status: str, task_data: Dict[str, Any]) -> None:
-    """
-    发送任务状态通知
-    
-    Args:
-        task_id: 任务ID
-        status: 任务状态 (completed, failed, aborted)
-        task_data: 任务相关数据
-    """
-    try:
-        from .utils.notification_manager import notification_manager, NotificationMessage, NotificationLevel
-        from .config_manager import config_manager
-        
-        # 获取通知配置
-        notification_config = config_manager.get_notification_config()
-        
-        # 检查是否有启用的通知提供者
-        enabled_providers = []
-        for provider, config in notification_config.items():
-            if config.get('enabled', False):
-                enabled_providers.append(provider)
-        
-        if not enabled_providers:
-            info("没有启用的通知提供者，跳过发送通知")
-            return
-        
-        # 确定通知级别和内容
-        system_name = task_data.get('system_name', 'Unknown')
-        branch_name = task_data.get('branch_name', 'Unknown')
-        
-        if status == 'completed':
-            level = NotificationLevel.SUCCESS
-            title = f" 代码审查任务完成 - {system_name}/{branch_name}"
-            
-            reports_count = task_data.get('reports_count', 0)
-            unit_tests_count = task_data.get('unit_tests_count', 0)
-            scenario_tests_count = task_data.get('scenario_tests_count', 0)
-            
-            content = f"""代码审查任务已成功完成！
+# 各任务状态对应的通知级别、标题模板和内容模板
+_NOTIFICATION_TEMPLATES = {
+    'completed': ('SUCCESS', " 代码审查任务完成 - {system_name}/{branch_name}", """代码审查任务已成功完成！
 
 📋 任务详情：
 • 任务ID: {task_id}
@@ -259,15 +353,8 @@ def _send_task_notification(task_id: str, status: str, task_data: Dict[str, Any]
 • 场景测试: {scenario_tests_count} 个
 
 🔗 查看详情: /task/{task_id}
-"""
-        
-        elif status == 'failed':
-            level = NotificationLevel.ERROR
-            title = f" 代码审查任务失败 - {system_name}/{branch_name}"
-            
-            error = task_data.get('error', 'Unknown error')
-            
-            content = f"""代码审查任务执行失败！
+"""),
+    'failed': ('ERROR', " 代码审查任务失败 - {system_name}/{branch_name}", """代码审查任务执行失败！
 
 📋 任务详情：
 • 任务ID: {task_id}
@@ -278,13 +365,8 @@ def _send_task_notification(task_id: str, status: str, task_data: Dict[str, Any]
 {error}
 
 🔗 查看详情: /task/{task_id}
-"""
-        
-        elif status == 'aborted':
-            level = NotificationLevel.WARNING
-            title = f" 代码审查任务已中止 - {system_name}/{branch_name}"
-            
-            content = f"""代码审查任务已被用户中止。
+"""),
+    'aborted': ('WARNING', " 代码审查任务已中止 - {system_name}/{branch_name}", """代码审查任务已被用户中止。
 
 📋 任务详情：
 • 任务ID: {task_id}
@@ -292,12 +374,53 @@ def _send_task_notification(task_id: str, status: str, task_data: Dict[str, Any]
 • 分支名称: {branch_name}
 
 🔗 查看详情: /task/{task_id}
-"""
+"""),
+}
+
+
+def _send_task_notification(task_id: str, status: str, task_data: Dict[str, Any]) -> None:
+    """
+    发送任务状态通知
+    
+    Args:
+        task_id: 任务ID
+        status: 任务状态 (completed, failed, aborted)
+        task_data: 任务相关数据
+    """
+    try:
+        # 先检查启用的通知提供者和收件人，未配置时不生成通知内容
+        enabled_providers, recipients = _notification_targets()
         
-        else:
+        if not enabled_providers:
+            info("没有启用的通知提供者，跳过发送通知")
+            return
+        
+        if not recipients:
+            info("没有配置收件人，跳过发送通知")
+            return
+        
+        # 确定通知级别和内容
+        system_name = task_data.get('system_name', 'Unknown')
+        branch_name = task_data.get('branch_name', 'Unknown')
+        
+        template = _NOTIFICATION_TEMPLATES.get(status)
+        if template is None:
             info(f"未知的任务状态: {status}")
             return
         
+        level_name, title_template, content_template = template
+        level = NotificationLevel[level_name]
+        title = title_template.format(system_name=system_name, branch_name=branch_name)
+        content = content_template.format(
+            task_id=task_id,
+            system_name=system_name,
+            branch_name=branch_name,
+            reports_count=task_data.get('reports_count', 0),
+            unit_tests_count=task_data.get('unit_tests_count', 0),
+            scenario_tests_count=task_data.get('scenario_tests_count', 0),
+            error=task_data.get('error', 'Unknown error')
+        )
+        
         # 创建通知消息
         message = NotificationMessage(
             title=title,
@@ -305,34 +428,9 @@ def _send_task_notification(task_id: str, status: str, task_data: Dict[str, Any]
             level=level,
             extra_data=task_data
         )
-        # 获取收件人列表（这里可以从配置中获取，或者根据系统/项目配置）
-        # recipients = _get_notification_recipients(system_name, notification_config)
-        recipients = notification_config.get('email', {}).get('recipients', [])
         
-        if recipients:
-            # 异步发送通知（在后台线程中）
-            def send_notification_background():
-                try:
-                    results = notification_manager.send_notification_sync(
-                        enabled_providers, 
-                        recipients, 
-                        message
-                    )
-                    
-                    success_count = sum(1 for result in results if result.success)
-                    if success_count > 0:
-                        info(f"任务 {task_id} 通知发送成功: {success_count}/{len(results)}")
-                    else:
-                        warning(f"任务 {task_id} 通知发送失败")
-                        
-                except Exception as e:
-                    error(f"发送任务通知异常: {e}")
-            
-            import threading
-            thread = threading.Thread(target=send_notification_background, daemon=True)
-            thread.start()
-        else:
-            info("没有配置收件人，跳过发送通知")
+        # 交给后台合并发送，短时间内的多条通知合并为一次发送
+        notification_batcher.submit(enabled_providers, recipients, message)
             
     except Exception as e:
         error(f"准备任务通知失败: {e}")
@@ -5,17 +5,135 @@
 
 import time
 import threading
-import heapq
 import pickle
 import gzip
+import hashlib
+import struct
 import sys
-from typing import Any, Dict, Optional, Callable, List, Tuple
+from typing import Any, Dict, Optional, Callable, List, Set, Tuple
 from functools import wraps
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, deque
 from ..logger import debug, info, warning
 
-class AdvancedCacheManager:
-    """高级缓存管理器 - 支持多级缓存和智能优化"""
+try:
+    import lz4.frame as _lz4
+except ImportError:  # lz4为可选依赖
+    _lz4 = None
+
+try:
+    import zstandard as _zstd
+except ImportError:  # zstandard为可选依赖
+    _zstd = None
+
+_LZ4_MAGIC = b'\x04\x22\x4d\x18'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_GZIP_MAGIC = b'\x1f\x8b'
+# 使用带外缓冲区的pickle协议5数据：魔数 + 各段(4字节长度 + 内容)，第一段为pickle头
+_P5B_MAGIC = b'P5B\x00'
+_FRAME_LEN = struct.Struct('<I')
+
+# 分片共用的L1无锁命中记录上限
+_ACCESS_LOG_SIZE = 1024
+# 命中记录达到该数量时尝试加锁回放；接近上限时阻塞等待锁，避免记录被丢弃
+_ACCESS_LOG_DRAIN_AT = _ACCESS_LOG_SIZE // 2
+_ACCESS_LOG_FORCE_AT = _ACCESS_LOG_SIZE - 64
+
+
+def _compress_bytes(data: bytes) -> bytes:
+    """按 lz4 > zstd > gzip 的优先级选择可用的快速压缩算法"""
+    if _lz4 is not None:
+        return _lz4.compress(data)
+    if _zstd is not None:
+        # 压缩器实例不是线程安全的，每次调用单独创建
+        return _zstd.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=1)
+
+
+def _dumps(data: Any) -> bytes:
+    """序列化数据，大块缓冲区（如NumPy数组）以带外方式追加，避免pickle内部再复制一次"""
+    buffers: List[pickle.PickleBuffer] = []
+    header = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+    if not buffers:
+        return header
+    
+    parts: List[Any] = [_P5B_MAGIC, _FRAME_LEN.pack(len(header)), header]
+    for buf in buffers:
+        raw = buf.raw()
+        parts.append(_FRAME_LEN.pack(raw.nbytes))
+        parts.append(raw)
+    return b''.join(parts)
+
+
+def _loads(data: bytes) -> Any:
+    """反序列化_dumps()生成的数据"""
+    if not data.startswith(_P5B_MAGIC):
+        return pickle.loads(data)
+    
+    view = memoryview(data)
+    offset = len(_P5B_MAGIC)
+    frames = []
+    while offset < len(view):
+        (length,) = _FRAME_LEN.unpack_from(view, offset)
+        offset += _FRAME_LEN.size
+        frames.append(view[offset:offset + length])
+        offset += length
+    # 缓冲区复制为bytearray，还原出的数组保持可写
+    return pickle.loads(frames[0], buffers=[bytearray(frame) for frame in frames[1:]])
+
+
+# 按数据头部魔数选择解压方式，未压缩的pickle数据以b'\x80'开头不会冲突
+_DECOMPRESSORS: List[Tuple[bytes, Callable[[bytes], bytes]]] = [(_GZIP_MAGIC, gzip.decompress)]
+if _lz4 is not None:
+    _DECOMPRESSORS.append((_LZ4_MAGIC, _lz4.decompress))
+if _zstd is not None:
+    _DECOMPRESSORS.append((_ZSTD_MAGIC, lambda data: _zstd.ZstdDecompressor().decompress(data)))
+
+# 估算大小时递归进入容器的最大深度，更深的容器只计算自身大小
+_SIZEOF_MAX_DEPTH = 3
+_SCALAR_TYPES = (str, bytes, bytearray, int, float, bool, type(None))
+
+
+def _fast_sizeof(obj: Any, depth: int = 0) -> int:
+    """估算对象内存大小，常见内置类型用sys.getsizeof递归累加，其他类型按序列化长度估算"""
+    obj_type = type(obj)
+    if obj_type in _SCALAR_TYPES:
+        return sys.getsizeof(obj)
+    if obj_type is dict:
+        size = sys.getsizeof(obj)
+        if depth < _SIZEOF_MAX_DEPTH:
+            for k, v in obj.items():
+                size += _fast_sizeof(k, depth + 1) + _fast_sizeof(v, depth + 1)
+        return size
+    if obj_type in (list, tuple, set, frozenset):
+        size = sys.getsizeof(obj)
+        if depth < _SIZEOF_MAX_DEPTH:
+            for item in obj:
+                size += _fast_sizeof(item, depth + 1)
+        return size
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(obj)
+
+
+# 每个分片保留的空闲条目对象数量上限
+_ENTRY_POOL_SIZE = 4096
+# 每次set()顺带检查的过期条目数量上限
+_LAZY_EXPIRE_BATCH = 16
+# L1和L2之间每批提升或降级的条目数量上限
+_MOVE_BATCH = 16
+# 时间轮的槽数（2的幂），每秒一个槽，更长的TTL绕圈后再到期
+_WHEEL_SIZE = 4096
+
+
+class _Entry:
+    """缓存条目，L2中的条目value保存压缩后的数据"""
+    
+    __slots__ = ('key', 'value', 'expires', 'compressed', 'size')
+
+
+class _CacheShard:
+    """缓存分片 - 拥有独立的锁、多级存储和过期堆"""
     
     def __init__(self, 
                  default_ttl: int = 300,
@@ -23,11 +141,11 @@ class AdvancedCacheManager:
                  compression_threshold: int = 1024,  # 1KB
                  enable_statistics: bool = True):
         """
-        初始化高级缓存管理器
+        初始化缓存分片
         
         Args:
             default_ttl: 默认TTL（秒）
-            max_memory_size: 最大内存使用量（字节）
+            max_memory_size: 本分片最大内存使用量（字节）
             compression_threshold: 压缩阈值（字节）
             enable_statistics: 是否启用统计
         """
@@ -37,19 +155,35 @@ class AdvancedCacheManager:
         self.enable_statistics = enable_statistics
         
         # 多级缓存存储
-        self.l1_cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()  # 热数据
-        self.l2_cache: Dict[str, Dict[str, Any]] = {}  # 压缩数据
+        self.l1_cache: OrderedDict[str, _Entry] = OrderedDict()  # 热数据
+        # L1的无锁读取视图，随l1_cache逐项同步增删；单次字典操作在GIL下是原子的，读取时无需加锁
+        self._l1_snapshot: Dict[str, _Entry] = {}
+        self.l2_cache: Dict[str, _Entry] = {}  # 压缩数据
+        # 回收的条目对象，避免频繁创建和释放
+        self._entry_pool: List[_Entry] = []
+        # 已降级到L2但尚未压缩的条目
+        self._demote_queue: deque = deque()
+        # 已在锁外解压、等待提升到L1的L2条目 (key, entry, 压缩数据, 值, 大小)
+        self._promote_queue: deque = deque()
         
         # 访问统计
         self.access_freq: Dict[str, int] = defaultdict(int)
         self.access_time: Dict[str, float] = {}
         self.size_tracker: Dict[str, int] = {}
+        # L1中所有条目大小之和，随size_tracker同步维护
+        self._l1_bytes = 0
         
-        # 过期队列 (time, key)
-        self.expiry_heap: List[Tuple[float, str]] = []
+        # 过期时间轮：槽号 -> 该秒内到期的键，空槽不保留；_wheel_tick之前的秒已清理完毕
+        self._wheel: Dict[int, Set[str]] = {}
+        self._wheel_tick = int(time.time())
+        # 当前槽中尚未检查的键及其所属的秒
+        self._wheel_pending: List[str] = []
+        self._wheel_pending_tick: Optional[int] = None
         
         # 锁和统计
         self.lock = threading.RLock()
+        # 所有线程共用的无锁命中记录 (key, time)，加锁后统一回放到LRU顺序和统计中，积累过多时由命中线程顺带回放
+        self._access_log: deque = deque(maxlen=_ACCESS_LOG_SIZE)
         self.stats = {
             'l1_hits': 0, 'l1_misses': 0,
             'l2_hits': 0, 'l2_misses': 0,
@@ -57,261 +191,349 @@ class AdvancedCacheManager:
             'compressions': 0, 'decompressions': 0,
             'memory_usage': 0, 'l1_size': 0, 'l2_size': 0
         }
-        
-        # 启动后台清理线程
-        self._start_cleanup_thread()
+    
+    def _new_entry(self, key: str, value: Any, expires: float, compressed: bool, size: int) -> _Entry:
+        """从空闲列表取出或新建条目，调用方需持有锁"""
+        entry = self._entry_pool.pop() if self._entry_pool else _Entry()
+        # 先写key再写value，无锁读取先读value再校验key，不会拿到其他键的值
+        entry.key = key
+        entry.expires = expires
+        entry.compressed = compressed
+        entry.size = size
+        entry.value = value
+        return entry
+    
+    def _recycle(self, entry: _Entry) -> None:
+        """清空条目并放回空闲列表，调用方需持有锁"""
+        entry.key = None
+        entry.value = None
+        if len(self._entry_pool) < _ENTRY_POOL_SIZE:
+            self._entry_pool.append(entry)
     
     def _estimate_size(self, obj: Any) -> int:
         """估算对象内存大小"""
-        try:
-            return len(pickle.dumps(obj))
-        except:
-            return sys.getsizeof(obj)
+        return _fast_sizeof(obj)
+    
+    def _compress_pickled(self, pickled: bytes) -> Tuple[bytes, bool]:
+        """压缩已序列化的数据，未超过压缩阈值时原样返回，同时返回是否经过压缩"""
+        if len(pickled) > self.compression_threshold:
+            return _compress_bytes(pickled), True
+        return pickled, False
     
-    def _compress_data(self, data: Any) -> bytes:
-        """压缩数据"""
+    def _compress_data(self, data: Any) -> Tuple[bytes, bool]:
+        """压缩数据，不修改共享状态，可在锁外调用"""
+        pickled = _dumps(data)
         try:
-            pickled = pickle.dumps(data)
-            if len(pickled) > self.compression_threshold:
-                compressed = gzip.compress(pickled)
-                self.stats['compressions'] += 1
-                return compressed
-            return pickled
+            return self._compress_pickled(pickled)
         except Exception as e:
             warning(f"数据压缩失败: {e}")
-            return pickle.dumps(data)
+            return pickled, False
+    
+    def _decompress_bytes(self, data: bytes) -> bytes:
+        """解压缩为序列化数据"""
+        # 根据魔数选择解压方式
+        for magic, decompress in _DECOMPRESSORS:
+            if data.startswith(magic):
+                return decompress(data)
+        return data
     
     def _decompress_data(self, data: bytes) -> Any:
         """解压缩数据"""
         try:
-            # 尝试解压缩
-            if data[:2] == b'\x1f\x8b':  # gzip magic number
-                decompressed = gzip.decompress(data)
-                self.stats['decompressions'] += 1
-                return pickle.loads(decompressed)
-            else:
-                return pickle.loads(data)
+            return _loads(self._decompress_bytes(data))
         except Exception as e:
             warning(f"数据解压缩失败: {e}")
             raise
     
-    def _promote_to_l1(self, key: str) -> bool:
-        """将数据从L2提升到L1"""
-        if key in self.l2_cache and key not in self.l1_cache:
-            l2_entry = self.l2_cache[key]
-            
-            # 检查是否过期
-            if time.time() > l2_entry['expires']:
-                del self.l2_cache[key]
-                return False
+    def _apply_promotions(self) -> None:
+        """批量将L2命中时已在锁外解压的条目提升到L1，调用方需持有锁"""
+        promoted = False
+        for _ in range(min(len(self._promote_queue), _MOVE_BATCH)):
+            key, l2_entry, data, value, size = self._promote_queue.popleft()
+            # 排队期间条目可能已被删除、覆盖或回收复用
+            if self.l2_cache.get(key) is not l2_entry or l2_entry.value is not data or key in self.l1_cache:
+                continue
+            if time.time() > l2_entry.expires or not self._can_fit_in_l1(size):
+                continue
             
-            # 解压缩数据
-            try:
-                value = self._decompress_data(l2_entry['compressed_value'])
-                l1_entry = {
-                    'value': value,
-                    'expires': l2_entry['expires'],
-                    'compressed': False,
-                    'size': self._estimate_size(value)
-                }
-                
-                # 检查L1空间
-                if self._can_fit_in_l1(l1_entry['size']):
-                    self.l1_cache[key] = l1_entry
-                    self.size_tracker[key] = l1_entry['size']
-                    del self.l2_cache[key]
-                    self._update_stats()
-                    return True
-                    
-            except Exception as e:
-                warning(f"L2到L1提升失败: {e}")
-                del self.l2_cache[key]
+            self._l1_put(key, self._new_entry(key, value, l2_entry.expires, False, size))
+            self._track_size(key, size)
+            self._recycle(self.l2_cache.pop(key))
+            promoted = True
         
-        return False
+        if promoted:
+            self._update_stats()
     
     def _demote_to_l2(self, key: str) -> bool:
-        """将数据从L1降级到L2"""
-        if key in self.l1_cache:
-            l1_entry = self.l1_cache[key]
+        """将数据从L1降级到L2，先以未压缩形式放入，压缩在释放锁后由_compress_demoted()批量完成，调用方需持有锁"""
+        l1_entry = self._l1_remove(key)
+        if l1_entry is None:
+            return False
+        
+        self._untrack_size(key)
+        self.l2_cache[key] = l1_entry
+        self._demote_queue.append(l1_entry)
+        self._update_stats()
+        return True
+    
+    def _compress_demoted(self) -> None:
+        """每批取出若干降级条目在锁外压缩，再加锁一次性替换仍未变化的条目"""
+        while self._demote_queue:
+            with self.lock:
+                batch = []
+                while self._demote_queue and len(batch) < _MOVE_BATCH:
+                    entry = self._demote_queue.popleft()
+                    # 条目可能已被回收复用，只处理仍在L2中等待压缩的
+                    if not entry.compressed and self.l2_cache.get(entry.key) is entry:
+                        batch.append((entry, entry.key, entry.value, entry.expires))
             
-            # 压缩并存储到L2
+            results = []
+            for entry, key, value, expires in batch:
+                try:
+                    results.append(self._compress_data(value))
+                except Exception as e:
+                    warning(f"L1到L2降级失败: {e}")
+                    results.append((None, False))
+            
+            with self.lock:
+                for (entry, key, value, expires), (data, compressed) in zip(batch, results):
+                    # 压缩期间条目可能已被删除、提升或覆盖
+                    if self.l2_cache.get(key) is not entry or entry.value is not value:
+                        continue
+                    if data is None:
+                        self._recycle(self.l2_cache.pop(key))
+                        continue
+                    if compressed:
+                        self.stats['compressions'] += 1
+                    # 换用新条目而不是原地修改，正在无锁读取该条目的读者不会读到压缩数据
+                    self.l2_cache[key] = self._new_entry(key, data, expires, True, len(data))
+                    self._recycle(entry)
+    
+    def _l1_put(self, key: str, entry: _Entry) -> None:
+        """放入L1并同步无锁读取视图，调用方需持有锁"""
+        self.l1_cache[key] = entry
+        self._l1_snapshot[key] = entry
+    
+    def _l1_remove(self, key: str) -> Optional[_Entry]:
+        """从L1移除并同步无锁读取视图，调用方需持有锁"""
+        self._l1_snapshot.pop(key, None)
+        return self.l1_cache.pop(key, None)
+    
+    def _drain_access_logs(self) -> None:
+        """回放无锁命中记录，调用方需持有锁"""
+        log = self._access_log
+        while True:
             try:
-                compressed_value = self._compress_data(l1_entry['value'])
-                l2_entry = {
-                    'compressed_value': compressed_value,
-                    'expires': l1_entry['expires'],
-                    'compressed': True,
-                    'size': len(compressed_value)
-                }
-                
-                self.l2_cache[key] = l2_entry
-                del self.l1_cache[key]
-                if key in self.size_tracker:
-                    del self.size_tracker[key]
-                self._update_stats()
-                return True
-                
-            except Exception as e:
-                warning(f"L1到L2降级失败: {e}")
-        
-        return False
+                key, access_time = log.popleft()
+            except IndexError:
+                break
+            self.stats['l1_hits'] += 1
+            if key in self.l1_cache:
+                self.l1_cache.move_to_end(key)
+                if self.enable_statistics:
+                    self.access_freq[key] += 1
+                    self.access_time[key] = access_time
+    
+    def _drain_on_hit(self, force: bool) -> None:
+        """读多写少时命中记录不会因驱逐而回放，由命中线程在锁空闲时回放；接近上限时等待锁"""
+        if self.lock.acquire(force):
+            try:
+                self._drain_access_logs()
+            finally:
+                self.lock.release()
+    
+    def _track_size(self, key: str, size: int) -> None:
+        """记录L1条目大小"""
+        self._l1_bytes += size - self.size_tracker.get(key, 0)
+        self.size_tracker[key] = size
+    
+    def _untrack_size(self, key: str) -> None:
+        """移除L1条目大小记录"""
+        self._l1_bytes -= self.size_tracker.pop(key, 0)
     
     def _can_fit_in_l1(self, size: int) -> bool:
         """检查是否可以放入L1缓存"""
-        current_l1_size = sum(self.size_tracker.values())
-        return current_l1_size + size <= self.max_memory_size * 0.7  # L1使用70%内存
+        return self._l1_bytes + size <= self.max_memory_size * 0.7  # L1使用70%内存
     
     def _evict_lru_from_l1(self) -> bool:
         """从L1中驱逐最少使用的项"""
         if not self.l1_cache:
             return False
         
-        # 找到最少访问的项
-        lru_key = None
-        min_score = float('inf')
-        current_time = time.time()
+        # 先回放无锁命中记录，使LRU顺序反映最近的访问
+        self._drain_access_logs()
         
-        for key in self.l1_cache:
-            freq = self.access_freq.get(key, 1)
-            last_access = self.access_time.get(key, 0)
-            # 综合考虑频率和时间的评分
-            score = freq / (current_time - last_access + 1)
-            
-            if score < min_score:
-                min_score = score
-                lru_key = key
+        # get()命中时会移动到末尾，头部即最久未使用的项
+        lru_key = next(iter(self.l1_cache), None)
         
-        if lru_key:
+        if lru_key is not None:
             if self._demote_to_l2(lru_key):
                 self.stats['evictions'] += 1
                 return True
             else:
-                del self.l1_cache[lru_key]
-                if lru_key in self.size_tracker:
-                    del self.size_tracker[lru_key]
+                self._recycle(self._l1_remove(lru_key))
+                self._untrack_size(lru_key)
                 self.stats['evictions'] += 1
                 return True
         
         return False
     
+    def _record_access(self, key: str, access_time: float) -> None:
+        """记录命中的访问统计，未命中的键不记录，调用方需持有锁"""
+        if self.enable_statistics:
+            self.access_freq[key] += 1
+            self.access_time[key] = access_time
+    
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         current_time = time.time()
         
+        # 无锁读取L1快照，命中时只记录到当前线程的命中记录
+        # 条目可能已被回收复用，先取value再校验key
+        entry = self._l1_snapshot.get(key)
+        if entry is not None:
+            value = entry.value
+            if value is not None and entry.key == key and current_time <= entry.expires:
+                log = self._access_log
+                log.append((key, current_time))
+                if len(log) >= _ACCESS_LOG_DRAIN_AT:
+                    self._drain_on_hit(len(log) >= _ACCESS_LOG_FORCE_AT)
+                return value
+        
+        # 驻留键字符串，各统计字典共用同一个键对象
+        if type(key) is str:
+            key = sys.intern(key)
+        
         with self.lock:
-            # 更新访问统计
-            if self.enable_statistics:
-                self.access_freq[key] += 1
-                self.access_time[key] = current_time
+            # 顺带提升之前L2命中的条目
+            if self._promote_queue:
+                self._apply_promotions()
             
             # 首先检查L1缓存
-            if key in self.l1_cache:
-                entry = self.l1_cache[key]
-                if current_time <= entry['expires']:
+            entry = self.l1_cache.get(key)
+            if entry is not None:
+                if current_time <= entry.expires:
                     # 移动到最新位置（LRU）
                     self.l1_cache.move_to_end(key)
                     self.stats['l1_hits'] += 1
-                    return entry['value']
+                    self._record_access(key, current_time)
+                    return entry.value
                 else:
                     # 过期，删除
-                    del self.l1_cache[key]
-                    if key in self.size_tracker:
-                        del self.size_tracker[key]
+                    self._recycle(self._l1_remove(key))
+                    self._untrack_size(key)
             
             self.stats['l1_misses'] += 1
             
             # 检查L2缓存
-            if key in self.l2_cache:
-                entry = self.l2_cache[key]
-                if current_time <= entry['expires']:
-                    # 提升到L1
-                    if self._promote_to_l1(key):
-                        self.stats['l2_hits'] += 1
-                        return self.l1_cache[key]['value']
-                    else:
-                        # 直接从L2返回
-                        value = self._decompress_data(entry['compressed_value'])
-                        self.stats['l2_hits'] += 1
-                        return value
-                else:
+            entry = self.l2_cache.get(key)
+            if entry is None or current_time > entry.expires:
+                if entry is not None:
                     # 过期，删除
-                    del self.l2_cache[key]
+                    self._recycle(self.l2_cache.pop(key))
+                self.stats['l2_misses'] += 1
+                return None
             
-            self.stats['l2_misses'] += 1
-            return None
+            self.stats['l2_hits'] += 1
+            self._record_access(key, current_time)
+            # 条目释放锁后可能被回收复用，先取出数据
+            data, compressed = entry.value, entry.compressed
+            if compressed:
+                self.stats['decompressions'] += 1
+        
+        # 在锁外解压，提升到L1由下次加锁时批量完成
+        if not compressed:
+            value = data
+        else:
+            try:
+                value = self._decompress_data(data)
+            except Exception:
+                with self.lock:
+                    if self.l2_cache.get(key) is entry and entry.value is data:
+                        self._recycle(self.l2_cache.pop(key))
+                return None
+        self._promote_queue.append((key, entry, data, value, self._estimate_size(value)))
+        return value
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """设置缓存值"""
         ttl = ttl or self.default_ttl
         expires = time.time() + ttl
+        if type(key) is str:
+            key = sys.intern(key)
+        # 放入L1的值无需序列化，只有放入L2时才序列化并压缩
         size = self._estimate_size(value)
         
+        # 直接放入L2的值在加锁前完成压缩，避免压缩期间阻塞其他操作
+        compressed_value = None
+        if size > self.max_memory_size * 0.7:
+            try:
+                compressed_value, compressed = self._compress_data(value)
+            except Exception:
+                compressed_value = None
+        
         with self.lock:
+            # 顺带清理少量到期条目，代替常驻的后台清理线程
+            self._expire_due(time.time(), _LAZY_EXPIRE_BATCH)
+            if self._promote_queue:
+                self._apply_promotions()
+            
             # 删除旧值
             self.delete(key)
             
-            # 创建条目
-            entry = {
-                'value': value,
-                'expires': expires,
-                'compressed': False,
-                'size': size
-            }
-            
-            # 尝试放入L1
-            if self._can_fit_in_l1(size):
+            # 尝试放入L1，单个条目不超过L1容量时通过驱逐腾出空间
+            if size <= self.max_memory_size * 0.7:
                 # 确保有足够空间
                 while not self._can_fit_in_l1(size) and self.l1_cache:
                     if not self._evict_lru_from_l1():
                         break
                 
-                self.l1_cache[key] = entry
-                self.size_tracker[key] = size
-            else:
+                self._l1_put(key, self._new_entry(key, value, expires, False, size))
+                self._track_size(key, size)
+            elif compressed_value is not None:
                 # 直接放入L2
-                try:
-                    compressed_value = self._compress_data(value)
-                    l2_entry = {
-                        'compressed_value': compressed_value,
-                        'expires': expires,
-                        'compressed': True,
-                        'size': len(compressed_value)
-                    }
-                    self.l2_cache[key] = l2_entry
-                except Exception:
-                    # 压缩失败，尝试放入L1
-                    while not self._can_fit_in_l1(size) and self.l1_cache:
-                        if not self._evict_lru_from_l1():
-                            break
-                    if self._can_fit_in_l1(size):
-                        self.l1_cache[key] = entry
-                        self.size_tracker[key] = size
+                self.l2_cache[key] = self._new_entry(key, compressed_value, expires, True, len(compressed_value))
+                if compressed:
+                    self.stats['compressions'] += 1
+            else:
+                # 压缩失败，尝试放入L1
+                while not self._can_fit_in_l1(size) and self.l1_cache:
+                    if not self._evict_lru_from_l1():
+                        break
+                if self._can_fit_in_l1(size):
+                    self._l1_put(key, self._new_entry(key, value, expires, False, size))
+                    self._track_size(key, size)
             
-            # 添加到过期堆
-            heapq.heappush(self.expiry_heap, (expires, key))
+            # 添加到过期时间轮
+            self._wheel.setdefault(int(expires) & (_WHEEL_SIZE - 1), set()).add(key)
             
             self.stats['sets'] += 1
             self._update_stats()
+        
+        # 释放锁后再压缩本次驱逐降级的条目
+        if self._demote_queue:
+            self._compress_demoted()
     
     def delete(self, key: str) -> bool:
         """删除缓存项"""
         with self.lock:
             deleted = False
             
-            if key in self.l1_cache:
-                del self.l1_cache[key]
-                if key in self.size_tracker:
-                    del self.size_tracker[key]
+            entry = self._l1_remove(key)
+            if entry is not None:
+                self._unschedule(key, entry.expires)
+                self._recycle(entry)
+                self._untrack_size(key)
                 deleted = True
             
-            if key in self.l2_cache:
-                del self.l2_cache[key]
+            entry = self.l2_cache.pop(key, None)
+            if entry is not None:
+                self._unschedule(key, entry.expires)
+                self._recycle(entry)
                 deleted = True
             
-            if key in self.access_freq:
-                del self.access_freq[key]
-            if key in self.access_time:
-                del self.access_time[key]
+            self.access_freq.pop(key, None)
+            self.access_time.pop(key, None)
             
             if deleted:
                 self.stats['deletes'] += 1
@@ -322,12 +544,23 @@ class AdvancedCacheManager:
     def clear(self) -> None:
         """清空所有缓存"""
         with self.lock:
+            for entry in self.l1_cache.values():
+                self._recycle(entry)
+            for entry in self.l2_cache.values():
+                self._recycle(entry)
             self.l1_cache.clear()
+            self._l1_snapshot.clear()
+            self._access_log.clear()
             self.l2_cache.clear()
+            self._demote_queue.clear()
+            self._promote_queue.clear()
             self.access_freq.clear()
             self.access_time.clear()
             self.size_tracker.clear()
-            self.expiry_heap.clear()
+            self._l1_bytes = 0
+            self._wheel.clear()
+            self._wheel_pending = []
+            self._wheel_pending_tick = None
             self._update_stats()
     
     def _update_stats(self) -> None:
@@ -335,65 +568,200 @@ class AdvancedCacheManager:
         if self.enable_statistics:
             self.stats['l1_size'] = len(self.l1_cache)
             self.stats['l2_size'] = len(self.l2_cache)
-            self.stats['memory_usage'] = sum(self.size_tracker.values())
+            self.stats['memory_usage'] = self._l1_bytes
     
-    def get_stats(self) -> Dict[str, Any]:
-        """获取缓存统计信息"""
-        with self.lock:
-            self._update_stats()
-            total_requests = (self.stats['l1_hits'] + self.stats['l1_misses'] + 
-                            self.stats['l2_hits'] + self.stats['l2_misses'])
-            hit_rate = 0
-            if total_requests > 0:
-                hit_rate = ((self.stats['l1_hits'] + self.stats['l2_hits']) / total_requests) * 100
+    def collect_stats(self) -> Dict[str, int]:
+        """获取本分片的统计计数，只读取计数不加锁，监控轮询不会阻塞缓存读写"""
+        stats = dict(self.stats)
+        # 尚未回放的无锁命中同样计入
+        stats['l1_hits'] += len(self._access_log)
+        if self.enable_statistics:
+            stats['l1_size'] = len(self.l1_cache)
+            stats['l2_size'] = len(self.l2_cache)
+            stats['memory_usage'] = self._l1_bytes
+        return stats
+    
+    def _unschedule(self, key: str, expires: float) -> None:
+        """从过期时间轮中移除键，调用方需持有锁"""
+        slot = int(expires) & (_WHEEL_SIZE - 1)
+        bucket = self._wheel.get(slot)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._wheel[slot]
+    
+    def _expire_due(self, current_time: float, limit: Optional[int] = None) -> int:
+        """推进时间轮并清理已经过去的秒内到期的条目，limit为None时不限检查数量，调用方需持有锁"""
+        cleaned = 0
+        checked = 0
+        now_tick = int(current_time)
+        # 落后超过一圈时每个槽只需检查一次
+        if now_tick - self._wheel_tick > _WHEEL_SIZE:
+            self._wheel_tick = now_tick - _WHEEL_SIZE
+        
+        while self._wheel_tick < now_tick:
+            slot = self._wheel_tick & (_WHEEL_SIZE - 1)
+            # 记录当前槽尚未检查的键，检查数量用完时下次从断点继续，不会反复检查同一批绕圈的键
+            if self._wheel_pending_tick != self._wheel_tick:
+                self._wheel_pending = list(self._wheel.get(slot, ()))
+                self._wheel_pending_tick = self._wheel_tick
+            pending = self._wheel_pending
+            
+            while pending:
+                if limit is not None and checked >= limit:
+                    break
+                key = pending.pop()
+                checked += 1
+                
+                # 以条目中的过期时间为准，未到期的是绕圈后才到期的键
+                cache = self.l1_cache
+                entry = cache.get(key)
+                if entry is None:
+                    cache = self.l2_cache
+                    entry = cache.get(key)
+                if entry is None:
+                    self._wheel.get(slot, set()).discard(key)
+                elif entry.expires <= current_time:
+                    # 已拿到条目和所在层级，直接移除，不再经过delete()重复查找
+                    del cache[key]
+                    self._wheel.get(slot, set()).discard(key)
+                    self._recycle(entry)
+                    if cache is self.l1_cache:
+                        self._l1_snapshot.pop(key, None)
+                        self._untrack_size(key)
+                    self.access_freq.pop(key, None)
+                    self.access_time.pop(key, None)
+                    self.stats['deletes'] += 1
+                    cleaned += 1
             
-            return {
-                **self.stats,
-                'hit_rate': f"{hit_rate:.1f}%",
-                'total_items': self.stats['l1_size'] + self.stats['l2_size'],
-                'memory_usage_mb': self.stats['memory_usage'] / (1024 * 1024),
-                'compression_ratio': (self.stats['compressions'] / max(self.stats['sets'], 1)) * 100
-            }
+            if pending:
+                break
+            if not self._wheel.get(slot, True):
+                del self._wheel[slot]
+            self._wheel_tick += 1
+        
+        if cleaned:
+            self._update_stats()
+        return cleaned
     
     def _cleanup_expired(self) -> int:
         """清理过期缓存"""
-        current_time = time.time()
-        cleaned = 0
-        
         with self.lock:
-            # 从过期堆中清理
-            while self.expiry_heap and self.expiry_heap[0][0] <= current_time:
-                expires, key = heapq.heappop(self.expiry_heap)
-                
-                # 检查是否真的过期（可能已经被更新）
-                if ((key in self.l1_cache and self.l1_cache[key]['expires'] <= current_time) or
-                    (key in self.l2_cache and self.l2_cache[key]['expires'] <= current_time)):
-                    
-                    if self.delete(key):
-                        cleaned += 1
+            self._drain_access_logs()
+            cleaned = self._expire_due(time.time())
             
+            # 清理已不在缓存中的键的访问统计
+            for key in [k for k in self.access_time if k not in self.l1_cache and k not in self.l2_cache]:
+                self.access_freq.pop(key, None)
+                del self.access_time[key]
             self._update_stats()
         
         return cleaned
+
+
+class AdvancedCacheManager:
+    """高级缓存管理器 - 支持多级缓存和智能优化，按键分片降低锁竞争"""
     
-    def _start_cleanup_thread(self) -> None:
-        """启动后台清理线程"""
+    def __init__(self, 
+                 default_ttl: int = 300,
+                 max_memory_size: int = 100 * 1024 * 1024,  # 100MB
+                 compression_threshold: int = 1024,  # 1KB
+                 enable_statistics: bool = True,
+                 shards: int = 8):
+        """
+        初始化高级缓存管理器
+        
+        Args:
+            default_ttl: 默认TTL（秒）
+            max_memory_size: 最大内存使用量（字节），由各分片平分
+            compression_threshold: 压缩阈值（字节）
+            enable_statistics: 是否启用统计
+            shards: 分片数量，向上取整为2的幂
+        """
+        shard_count = 1 << max(0, shards - 1).bit_length()
+        self._mask = shard_count - 1
+        self._shards = [
+            _CacheShard(default_ttl, max_memory_size // shard_count, compression_threshold, enable_statistics)
+            for _ in range(shard_count)
+        ]
+        # 过期条目默认在set()时顺带清理，需要定期全量清理时调用start_background_cleanup()
+        self._cleanup_thread: Optional[threading.Thread] = None
+    
+    def _shard(self, key: str) -> _CacheShard:
+        """获取键所在的分片"""
+        return self._shards[hash(key) & self._mask]
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        return self._shard(key).get(key)
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """设置缓存值"""
+        self._shard(key).set(key, value, ttl)
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存项"""
+        return self._shard(key).delete(key)
+    
+    def clear(self) -> None:
+        """清空所有缓存"""
+        for shard in self._shards:
+            shard.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息，汇总各分片的计数"""
+        stats: Dict[str, Any] = defaultdict(int)
+        for shard in self._shards:
+            for name, count in shard.collect_stats().items():
+                stats[name] += count
+        
+        hits = stats['l1_hits'] + stats['l2_hits']
+        total_requests = hits + stats['l1_misses'] + stats['l2_misses']
+        hit_rate = hits / total_requests * 100 if total_requests > 0 else 0
+        
+        stats['hit_rate'] = f"{hit_rate:.1f}%"
+        stats['total_items'] = stats['l1_size'] + stats['l2_size']
+        stats['memory_usage_mb'] = stats['memory_usage'] / (1024 * 1024)
+        stats['compression_ratio'] = (stats['compressions'] / max(stats['sets'], 1)) * 100
+        return dict(stats)
+    
+    def _cleanup_expired(self) -> int:
+        """清理所有分片中的过期缓存"""
+        return sum(shard._cleanup_expired() for shard in self._shards)
+    
+    def start_background_cleanup(self, interval: float = 60) -> None:
+        """
+        启动后台清理线程，重复调用不会启动多个线程
+        
+        Args:
+            interval: 清理间隔（秒）
+        """
         def cleanup_worker():
             while True:
                 try:
-                    time.sleep(60)  # 每分钟清理一次
+                    time.sleep(interval)
                     cleaned = self._cleanup_expired()
                     if cleaned > 0:
                         debug(f"清理了 {cleaned} 个过期缓存项")
                 except Exception as e:
                     warning(f"缓存清理线程异常: {e}")
         
-        cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        cleanup_thread.start()
+        if self._cleanup_thread is None:
+            self._cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
+            self._cleanup_thread.start()
 
 # 全局高级缓存实例
 advanced_cache = AdvancedCacheManager()
 
+
+def _make_cache_key(func: Callable, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """根据函数和参数的字符串表示生成缓存键"""
+    # 不序列化参数：绑定方法的self会带上可变的内部状态，使同一调用的键前后不一致
+    h = hashlib.blake2b(digest_size=16)
+    h.update(func.__qualname__.encode())
+    h.update((str(args) + str(sorted(kwargs.items()))).encode())
+    return f"{func.__qualname__}:{h.hexdigest()}"
+
 def cache_with_fallback(ttl: int = 300, fallback_ttl: int = 3600):
     """
     带降级的缓存装饰器
@@ -406,38 +774,29 @@ def cache_with_fallback(ttl: int = 300, fallback_ttl: int = 3600):
         @wraps(func)
         def wrapper(*args, **kwargs):
             # 生成缓存键
-            cache_key = f"{func.__name__}:{hash(str(args) + str(sorted(kwargs.items())))}"
+            cache_key = _make_cache_key(func, args, kwargs)
             
             # 尝试获取缓存
             cached_result = advanced_cache.get(cache_key)
             if cached_result is not None:
                 return cached_result
             
+            fallback_key = f"{cache_key}:fallback"
             try:
-                # 执行函数
+                # 执行函数，成功结果同时保存为降级缓存
                 result = func(*args, **kwargs)
                 advanced_cache.set(cache_key, result, ttl)
+                advanced_cache.set(fallback_key, result, fallback_ttl)
                 return result
-            except Exception as e:
-                # 尝试获取降级缓存
-                fallback_key = f"{cache_key}:fallback"
+            except Exception:
+                # 尝试获取降级缓存，不再重复执行刚刚失败的函数
                 fallback_result = advanced_cache.get(fallback_key)
                 
                 if fallback_result is not None:
                     warning(f"使用降级缓存: {func.__name__}")
                     return fallback_result
                 
-                # 如果有之前的成功结果，保存为降级缓存
-                if cached_result is None:
-                    try:
-                        result = func(*args, **kwargs)
-                        advanced_cache.set(fallback_key, result, fallback_ttl)
-                        advanced_cache.set(cache_key, result, ttl)
-                        return result
-                    except:
-                        pass
-                
-                raise e
+                raise
         
         return wrapper
     return decorator
\ No newline at end of file
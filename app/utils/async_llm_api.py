@@ -3,12 +3,15 @@
 """
 import aiohttp
 import asyncio
+import hashlib
 import json
 import time
 from typing import Dict, Any, Optional, List
 from ..config_manager import config_manager
 from ..logger import info, error, warning, debug
 from ..task_state import TaskStateManager
+from ..models import FileTask
+from .llm_cache import get_cached_result, set_cached_result
 
 # 需要在这里定义TaskAbortedException或者从task_processor导入
 # 但为了避免循环导入，我们在这里直接定义一个
@@ -16,6 +19,21 @@ class TaskAbortedException(Exception):
     """任务被中止异常"""
     pass
 
+# 合并请求时追加到提示词末尾的说明，要求模型按文件名分别返回结果
+_BATCH_PROMPT_SUFFIX = """
+
+## 批量处理说明：
+本次代码变更包含多个文件，每个文件以 ===FILE: 文件路径=== 开头。请对每个文件分别按上述格式生成结果，并按以下格式合并返回：
+```json
+{"results": [{"filename": "文件路径", "...": "上述单个文件结果的全部字段"}]}
+```
+"""
+
+# 合并请求中每个文件的输出token预算，以及单次请求的输出token上限
+# 单元测试和场景测试输出较长，只有代码审查合并请求，批次文件数受上限约束
+_BATCH_TOKENS_PER_FILE = 2000
+_BATCH_MAX_TOKENS = 8000
+
 class AsyncDeepSeekAPI:
     """异步DeepSeek API客户端"""
     
@@ -23,6 +41,7 @@ class AsyncDeepSeekAPI:
         self.config = config_manager.get_llm_config()
         self.api_key = self.config.get('deepseek_api_key')
         self.base_url = self.config.get('base_url', 'https://api.deepseek.com/v1/chat/completions')
+        self.model = 'deepseek-chat'
         self.timeout = aiohttp.ClientTimeout(total=180, connect=30)  # 优化超时配置
         self.semaphore = asyncio.Semaphore(10)  # 增加并发数到10
         self.connector = aiohttp.TCPConnector(
@@ -49,13 +68,14 @@ class AsyncDeepSeekAPI:
         if hasattr(self, 'connector'):
             await self.connector.close()
     
-    async def call_api_async(self, prompt: str, max_retries: int = 3) -> Dict[str, Any]:
+    async def call_api_async(self, prompt: str, max_retries: int = 3, max_tokens: int = 4000) -> Dict[str, Any]:
         """
         异步调用DeepSeek API
         
         Args:
             prompt: 提示词
             max_retries: 最大重试次数
+            max_tokens: 最大输出token数
             
         Returns:
             API响应结果
@@ -69,12 +89,12 @@ class AsyncDeepSeekAPI:
         }
         
         data = {
-            "model": "deepseek-chat",
+            "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.1,
-            "max_tokens": 4000,
+            "max_tokens": max_tokens,
             "stream": False
         }
         
@@ -129,10 +149,12 @@ class AsyncDeepSeekAPI:
 class AsyncTaskProcessor:
     """异步任务处理器"""
     
-    def __init__(self, task_id: str = None):
+    def __init__(self, task_id: str = None, state_manager: Optional[TaskStateManager] = None):
         self.prompts_config = config_manager.get_prompts_config()
         self.task_id = task_id
-        self.state_manager = TaskStateManager(task_id) if task_id else None
+        if state_manager is None and task_id:
+            state_manager = TaskStateManager(task_id)
+        self.state_manager = state_manager
     
     async def _check_task_abort(self, task_id: str) -> None:
         """
@@ -149,6 +171,12 @@ class AsyncTaskProcessor:
             from pathlib import Path
             
             task_dir = config_manager.ensure_task_data_dir()
+            
+            # 中止接口会创建标记文件，优先检查
+            if (task_dir / f'{task_id}.aborted').exists():
+                debug(f"AsyncProcessor 检测到任务已被中止: {task_id}")
+                raise TaskAbortedException(f"任务 {task_id} 已被用户中止")
+            
             task_file = task_dir / f'{task_id}.yaml'
             
             if task_file.exists():
@@ -164,12 +192,13 @@ class AsyncTaskProcessor:
             debug(f"AsyncProcessor 检查任务状态失败: {e}")
             # 检查失败时不阻止任务继续执行
     
-    async def process_files_async(self, files_data: List[Dict[str, Any]], task_id: str) -> Dict[str, Any]:
+    async def process_files_async(self, files: List[FileTask], project_name: str, task_id: str) -> Dict[str, Any]:
         """
         异步并发处理多个文件
         
         Args:
-            files_data: 文件数据列表
+            files: 文件列表
+            project_name: 文件所属项目名称
             task_id: 任务ID
             
         Returns:
@@ -185,23 +214,63 @@ class AsyncTaskProcessor:
             # 检查任务是否被中止
             await self._check_task_abort(task_id)
             
-            # 创建所有文件的处理任务
-            tasks = []
-            for file_data in files_data:
-                task = self._process_single_file_async(api_client, file_data, task_id)
-                tasks.append(task)
+            # 补丁相同的文件（如移动、复制或生成的文件）只请求一次代码审查，审查结果复制给其余文件
+            unique_files = []
+            source_indexes = []  # 每个文件对应的unique_files下标
+            seen = {}
+            for file_task in files:
+                patch_hash = hashlib.blake2b((file_task.diff_content or '').encode('utf-8'), digest_size=16).digest()
+                if patch_hash not in seen:
+                    seen[patch_hash] = len(unique_files)
+                    unique_files.append(file_task)
+                source_indexes.append(seen[patch_hash])
+            
+            if len(unique_files) < len(files):
+                info(f"AsyncProcessor {len(files) - len(unique_files)} 个文件与其他文件补丁相同，复用代码审查结果")
             
-            info(f"AsyncProcessor 开始并发处理 {len(tasks)} 个文件")
+            # 小文件合并为一批共用一次请求，其余文件单独处理
+            batches = self._split_batches(unique_files)
+            tasks = [
+                self._process_single_file_async(api_client, batch[0], project_name, task_id)
+                if len(batch) == 1 else
+                self._process_file_batch_async(api_client, batch, project_name, task_id)
+                for batch in batches
+            ]
             
-            # 并发执行所有任务
-            file_results = await asyncio.gather(*tasks, return_exceptions=True)
+            info(f"AsyncProcessor 开始并发处理 {len(unique_files)} 个文件，共 {len(tasks)} 批")
+            
+            # 并发执行所有任务，按文件顺序展开批量结果
+            unique_results = []
+            for batch, batch_result in zip(batches, await asyncio.gather(*tasks, return_exceptions=True)):
+                if len(batch) == 1:
+                    unique_results.append(batch_result)
+                elif isinstance(batch_result, Exception):
+                    unique_results.extend([batch_result] * len(batch))
+                else:
+                    unique_results.extend(batch_result)
+            
+            file_results = [unique_results[index] for index in source_indexes]
+            
+            # 单元测试和场景测试会引用文件名和路径，补丁相同的文件仍需各自生成
+            duplicates = [
+                (i, file_task, unique_results[index])
+                for i, (file_task, index) in enumerate(zip(files, source_indexes))
+                if unique_files[index] is not file_task
+            ]
+            if duplicates:
+                duplicate_results = await asyncio.gather(*(
+                    self._process_duplicate_file_async(api_client, file_task, source_result, project_name, task_id)
+                    for _, file_task, source_result in duplicates
+                ), return_exceptions=True)
+                for (i, _, _), result in zip(duplicates, duplicate_results):
+                    file_results[i] = result
             
             # 处理结果前再次检查是否被中止
             await self._check_task_abort(task_id)
             
             # 汇总结果
             for i, result in enumerate(file_results):
-                filename = files_data[i].get('filename', f'file_{i}') if i < len(files_data) else f'file_{i}'
+                filename = files[i].filename if i < len(files) else f'file_{i}'
                 
                 if isinstance(result, Exception):
                     error(f"AsyncProcessor 文件处理失败: {filename} - {result}")
@@ -229,21 +298,22 @@ class AsyncTaskProcessor:
         return results
     
     async def _process_single_file_async(self, api_client: AsyncDeepSeekAPI, 
-                                       file_data: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+                                       file_task: FileTask, project_name: str, task_id: str) -> Dict[str, Any]:
         """
         异步处理单个文件
         
         Args:
             api_client: 异步API客户端
-            file_data: 文件数据
+            file_task: 文件数据
+            project_name: 文件所属项目名称
             task_id: 任务ID
             
         Returns:
             文件处理结果
         """
-        filename = file_data.get('filename', '')
-        diff_content = file_data.get('diff_content', '')
-        filestatus = file_data.get('filestatus', {})
+        filename = file_task.filename
+        diff_content = file_task.diff_content
+        filestatus = file_task.filestatus
         
         if not diff_content:
             return {}
@@ -255,7 +325,7 @@ class AsyncTaskProcessor:
         
         # 初始化文件状态
         if self.state_manager:
-            self.state_manager.initialize_file(filename, file_data.get('project_name', ''))
+            self.state_manager.initialize_file(filename, project_name)
         
         # 创建三个异步任务：代码审查、单元测试、场景测试
         review_task = self._generate_code_review_async(api_client, filename, diff_content, filestatus)
@@ -271,73 +341,240 @@ class AsyncTaskProcessor:
             )
             debug(f"AsyncProcessor 三个任务执行完成: {filename}")
             
-            result = {}
-            
-            # 处理审查结果
-            if not isinstance(review_result, Exception) and review_result:
-                result['review_result'] = {
-                    'project_name': file_data.get('project_name', ''),
-                    'filename': filename,
-                    'filestatus': review_result.get('filestatus', ''),
-                    'diff_content': diff_content,
-                    "summary": review_result.get('summary', ''),
-                    "business_logic": review_result.get('business_logic', ''),
-                    "language_detected": review_result.get('language_detected', ''),
-                    'issues': review_result.get('issues', [])
-                }
-                # 更新审查状态
-                if self.state_manager:
-                    self.state_manager.update_review_status(filename, 'completed', review_result)
-            else:
-                # 审查失败
-                if self.state_manager:
-                    error_msg = str(review_result) if isinstance(review_result, Exception) else "审查失败"
-                    self.state_manager.update_review_status(filename, 'failed', error=error_msg)
-            
-            # 处理单元测试结果
-            if not isinstance(unit_result, Exception) and unit_result:
-                result['unit_case'] = {
-                    'project_name': file_data.get('project_name', ''),
-                    'filename': filename,
-                    'code': unit_result.get('unit_test_code', ''),
-                    'description': unit_result.get('test_description', '')
-                }
-                # 更新单元测试状态
-                if self.state_manager:
-                    self.state_manager.update_unit_test_status(filename, 'completed', unit_result)
+            return self._build_file_result(file_task, project_name, review_result, unit_result, scenario_results)
+            
+        except Exception as e:
+            error(f"AsyncProcessor 文件处理异常: {filename} - {e}")
+            return {}
+    
+    async def _process_duplicate_file_async(self, api_client: AsyncDeepSeekAPI, file_task: FileTask,
+                                            source_result: Any, project_name: str, task_id: str) -> Any:
+        """
+        处理与其他文件补丁相同的文件：复用代码审查结果，单元测试和场景测试按本文件名单独生成
+        
+        Args:
+            api_client: 异步API客户端
+            file_task: 文件数据
+            source_result: 补丁相同的文件的处理结果
+            project_name: 文件所属项目名称
+            task_id: 任务ID
+            
+        Returns:
+            文件处理结果
+        """
+        if isinstance(source_result, Exception) or not source_result:
+            return source_result
+        
+        # 检查任务是否被中止
+        await self._check_task_abort(task_id)
+        
+        filename = file_task.filename
+        if self.state_manager:
+            self.state_manager.initialize_file(filename, project_name)
+        
+        review_result = source_result.get('review_result')
+        if review_result is not None:
+            review_result = {**review_result, 'filestatus': file_task.filestatus}
+        
+        unit_result, scenario_results = await asyncio.gather(
+            self._generate_unit_test_async(api_client, filename, file_task.diff_content),
+            self._generate_scenario_tests_async(api_client, filename, file_task.diff_content),
+            return_exceptions=True
+        )
+        return self._build_file_result(file_task, project_name, review_result, unit_result, scenario_results)
+    
+    def _split_batches(self, files: List[FileTask]) -> List[List[FileTask]]:
+        """
+        按顺序将相邻的小文件分批，每批文件数和补丁总字符数不超过配置上限
+        
+        Args:
+            files: 文件列表
+            
+        Returns:
+            批次列表，单个文件的批次按原方式处理
+        """
+        # 每个文件都要有足够的输出token，批次文件数不超过输出上限能容纳的数量
+        batch_size = min(config_manager.get_llm_batch_size(), _BATCH_MAX_TOKENS // _BATCH_TOKENS_PER_FILE)
+        max_chars = config_manager.get_llm_batch_max_chars()
+        
+        batches = []
+        current = []
+        current_chars = 0
+        for file_task in files:
+            size = len(file_task.diff_content or '')
+            if current and (len(current) >= batch_size or current_chars + size > max_chars):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(file_task)
+            current_chars += size
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _process_file_batch_async(self, api_client: AsyncDeepSeekAPI,
+                                        batch: List[FileTask], project_name: str, task_id: str) -> List[Dict[str, Any]]:
+        """
+        合并请求为一批文件生成代码审查，单元测试、场景测试和模型未返回审查的文件单独调用
+        
+        Args:
+            api_client: 异步API客户端
+            batch: 同一批次的文件
+            project_name: 文件所属项目名称
+            task_id: 任务ID
+            
+        Returns:
+            与batch顺序一致的文件处理结果
+        """
+        # 检查任务是否被中止
+        await self._check_task_abort(task_id)
+        
+        info(f"AsyncProcessor 开始批量处理 {len(batch)} 个文件: {', '.join(t.filename for t in batch)}")
+        
+        # 初始化文件状态
+        if self.state_manager:
+            for file_task in batch:
+                self.state_manager.initialize_file(file_task.filename, project_name)
+        
+        reviews = await self._generate_batch_async(api_client, 'code_review_prompt', batch)
+        
+        async def finish_one(file_task: FileTask) -> Dict[str, Any]:
+            filename = file_task.filename
+            diff_content = file_task.diff_content
+            
+            review_result = reviews.get(filename)
+            if review_result is None:
+                review_task = self._generate_code_review_async(api_client, filename, diff_content, file_task.filestatus)
             else:
-                # 单元测试失败
-                if self.state_manager:
-                    error_msg = str(unit_result) if isinstance(unit_result, Exception) else "单元测试失败"
-                    self.state_manager.update_unit_test_status(filename, 'failed', error=error_msg)
-            
-            # 处理场景测试结果
-            if not isinstance(scenario_results, Exception) and scenario_results:
-                scenario_cases = scenario_results.get('scenario_cases', [])
-                for case in scenario_cases:
-                    case['project_name'] = file_data.get('project_name', '')
-                    case['filename'] = filename
-                    # 添加模块信息
-                    if 'module' not in case:
-                        case['module'] = self._extract_module_name(filename)
+                review_result['filestatus'] = file_task.filestatus
+                review_task = asyncio.sleep(0, review_result)
+            
+            unit_test_task = self._generate_unit_test_async(api_client, filename, diff_content)
+            scenario_test_task = self._generate_scenario_tests_async(api_client, filename, diff_content)
+            
+            try:
+                review_result, unit_result, scenario_results = await asyncio.gather(
+                    review_task, unit_test_task, scenario_test_task,
+                    return_exceptions=True
+                )
+                return self._build_file_result(file_task, project_name, review_result, unit_result, scenario_results)
+            except Exception as e:
+                error(f"AsyncProcessor 文件处理异常: {filename} - {e}")
+                return {}
+        
+        return list(await asyncio.gather(*(finish_one(file_task) for file_task in batch)))
+    
+    async def _generate_batch_async(self, api_client: AsyncDeepSeekAPI, prompt_name: str,
+                                    batch: List[FileTask]) -> Dict[str, Dict[str, Any]]:
+        """一次请求为一批文件生成结果，按文件名拆分返回，失败时返回空字典"""
+        # 检查任务是否被中止
+        if self.task_id:
+            await self._check_task_abort(self.task_id)
+        
+        filenames = {file_task.filename for file_task in batch}
+        prompt_template = self.prompts_config.get(prompt_name, '')
+        prompt = prompt_template.format(
+            filename=', '.join(file_task.filename for file_task in batch),
+            diff_content='\n'.join(f'===FILE: {file_task.filename}===\n{file_task.diff_content}' for file_task in batch)
+        ) + _BATCH_PROMPT_SUFFIX
+        
+        try:
+            # 相同提示词已有结果时直接复用
+            result = get_cached_result(api_client.model, prompt)
+            if result is None:
+                max_tokens = min(_BATCH_TOKENS_PER_FILE * len(batch), _BATCH_MAX_TOKENS)
+                response = await api_client.call_api_async(prompt, max_tokens=max_tokens)
+                content = response.get('content', '')
                 
-                result['scenario_cases'] = scenario_cases
-                # 更新场景测试状态
-                if self.state_manager:
-                    self.state_manager.update_scenario_test_status(filename, 'completed', scenario_results)
+                # 解析JSON响应
+                import re
+                json_match = re.search(r'```json\s*(\{.*\})\s*```', content, re.DOTALL)
+                result = json.loads(json_match.group(1) if json_match else content)
+                set_cached_result(api_client.model, prompt, result)
             else:
-                # 场景测试失败
-                if self.state_manager:
-                    error_msg = str(scenario_results) if isinstance(scenario_results, Exception) else "场景测试失败"
-                    self.state_manager.update_scenario_test_status(filename, 'failed', error=error_msg)
-            
-            info(f"AsyncProcessor 文件处理完成: {filename}")
-            return result
+                debug(f"AsyncProcessor 命中LLM结果缓存: {prompt_name} - {len(batch)}个文件")
             
+            return {
+                item['filename']: item for item in result.get('results', [])
+                if isinstance(item, dict) and item.get('filename') in filenames
+            }
+        
+        except TaskAbortedException:
+            raise
         except Exception as e:
-            error(f"AsyncProcessor 文件处理异常: {filename} - {e}")
+            warning(f"AsyncProcessor 批量请求失败，改为逐个文件处理: {prompt_name} - {e}")
             return {}
     
+    def _build_file_result(self, file_task: FileTask, project_name: str, review_result: Any,
+                           unit_result: Any, scenario_results: Any) -> Dict[str, Any]:
+        """汇总单个文件三项生成结果并更新文件状态"""
+        filename = file_task.filename
+        diff_content = file_task.diff_content
+        
+        result = {}
+        
+        # 处理审查结果
+        if not isinstance(review_result, Exception) and review_result:
+            result['review_result'] = {
+                'project_name': project_name,
+                'filename': filename,
+                'filestatus': review_result.get('filestatus', ''),
+                'diff_content': diff_content,
+                "summary": review_result.get('summary', ''),
+                "business_logic": review_result.get('business_logic', ''),
+                "language_detected": review_result.get('language_detected', ''),
+                'issues': review_result.get('issues', [])
+            }
+            # 更新审查状态
+            if self.state_manager:
+                self.state_manager.update_review_status(filename, 'completed', review_result)
+        else:
+            # 审查失败
+            if self.state_manager:
+                error_msg = str(review_result) if isinstance(review_result, Exception) else "审查失败"
+                self.state_manager.update_review_status(filename, 'failed', error=error_msg)
+        
+        # 处理单元测试结果
+        if not isinstance(unit_result, Exception) and unit_result:
+            result['unit_case'] = {
+                'project_name': project_name,
+                'filename': filename,
+                'code': unit_result.get('unit_test_code', ''),
+                'description': unit_result.get('test_description', '')
+            }
+            # 更新单元测试状态
+            if self.state_manager:
+                self.state_manager.update_unit_test_status(filename, 'completed', unit_result)
+        else:
+            # 单元测试失败
+            if self.state_manager:
+                error_msg = str(unit_result) if isinstance(unit_result, Exception) else "单元测试失败"
+                self.state_manager.update_unit_test_status(filename, 'failed', error=error_msg)
+        
+        # 处理场景测试结果
+        if not isinstance(scenario_results, Exception) and scenario_results:
+            scenario_cases = scenario_results.get('scenario_cases', [])
+            module_name = self._extract_module_name(filename) if scenario_cases else None
+            for case in scenario_cases:
+                case['project_name'] = project_name
+                case['filename'] = filename
+                # 添加模块信息
+                if 'module' not in case:
+                    case['module'] = module_name
+            
+            result['scenario_cases'] = scenario_cases
+            # 更新场景测试状态
+            if self.state_manager:
+                self.state_manager.update_scenario_test_status(filename, 'completed', scenario_results)
+        else:
+            # 场景测试失败
+            if self.state_manager:
+                error_msg = str(scenario_results) if isinstance(scenario_results, Exception) else "场景测试失败"
+                self.state_manager.update_scenario_test_status(filename, 'failed', error=error_msg)
+        
+        info(f"AsyncProcessor 文件处理完成: {filename}")
+        return result
+    
     async def _generate_code_review_async(self, api_client: AsyncDeepSeekAPI, 
                                          filename: str, diff_content: str, filestatus: Dict[str, Any]) -> Dict[str, Any]:
         """异步生成代码审查"""
@@ -348,6 +585,13 @@ class AsyncTaskProcessor:
         prompt_template = self.prompts_config.get('code_review_prompt', '')
         prompt = prompt_template.format(filename=filename, diff_content=diff_content)
         
+        # 相同提示词已有结果时直接复用
+        result = get_cached_result(api_client.model, prompt)
+        if result is not None:
+            debug(f"AsyncProcessor 命中LLM结果缓存: 代码审查 {filename}")
+            result['filestatus'] = filestatus
+            return result
+        
         try:
             response = await api_client.call_api_async(prompt)
             content = response.get('content', '')
@@ -360,6 +604,7 @@ class AsyncTaskProcessor:
             else:
                 # 尝试直接解析
                 result = json.loads(content)
+            set_cached_result(api_client.model, prompt, result)
 
             # 补充项目名
             result['filestatus'] = filestatus
@@ -379,6 +624,12 @@ class AsyncTaskProcessor:
         prompt_template = self.prompts_config.get('unit_test_prompt', '')
         prompt = prompt_template.format(filename=filename, diff_content=diff_content)
         
+        # 相同提示词已有结果时直接复用
+        result = get_cached_result(api_client.model, prompt)
+        if result is not None:
+            debug(f"AsyncProcessor 命中LLM结果缓存: 单元测试 {filename}")
+            return result
+        
         try:
             response = await api_client.call_api_async(prompt)
             content = response.get('content', '')
@@ -388,9 +639,10 @@ class AsyncTaskProcessor:
             json_match = re.search(r'```json\s*(\{.*?\})\s*```', content, re.DOTALL)
             if json_match:
                 result = json.loads(json_match.group(1))
-                return result
             else:
-                return json.loads(content)
+                result = json.loads(content)
+            set_cached_result(api_client.model, prompt, result)
+            return result
                 
         except json.JSONDecodeError as e:
             error(f"AsyncProcessor 单元测试JSON解析失败: {filename} - {e}")
@@ -418,6 +670,12 @@ class AsyncTaskProcessor:
         prompt_template = self.prompts_config.get('scenario_test_prompt', '')
         prompt = prompt_template.format(filename=filename, diff_content=diff_content)
         
+        # 相同提示词已有结果时直接复用
+        result = get_cached_result(api_client.model, prompt)
+        if result is not None:
+            debug(f"AsyncProcessor 命中LLM结果缓存: 场景测试 {filename}")
+            return result
+        
         try:
             response = await api_client.call_api_async(prompt)
             content = response.get('content', '')
@@ -427,9 +685,10 @@ class AsyncTaskProcessor:
             json_match = re.search(r'```json\s*(\{.*?\})\s*```', content, re.DOTALL)
             if json_match:
                 result = json.loads(json_match.group(1))
-                return result
             else:
-                return json.loads(content)
+                result = json.loads(content)
+            set_cached_result(api_client.model, prompt, result)
+            return result
                 
         except json.JSONDecodeError as e:
             error(f"AsyncProcessor 场景测试JSON解析失败: {filename} - {e}")
@@ -491,17 +750,13 @@ async def example_usage():
     """异步处理示例"""
     processor = AsyncTaskProcessor()
     
-    files_data = [
-        {
-            'filename': 'app/models.py',
-            'diff_content': 'some diff content',
-            'project_name': 'TestProject'
-        },
+    files = [
+        FileTask(filename='app/models.py', filestatus={}, diff_content='some diff content'),
         # ... 更多文件
     ]
     
     try:
-        results = await processor.process_files_async(files_data, 'task-123')
+        results = await processor.process_files_async(files, 'TestProject', 'task-123')
         # 处理结果: {results}
         pass
     except Exception as e:
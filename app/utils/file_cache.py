@@ -7,6 +7,8 @@ import asyncio
 import aiofiles
 import hashlib
 import json
+import queue
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
@@ -16,12 +18,24 @@ import time
 class FileCache:
     """文件缓存管理器"""
     
-    def __init__(self, cache_dir: str = "cache", ttl: int = 3600):
+    def __init__(self, cache_dir: str = "cache", ttl: int = 3600, max_memory_items: Optional[int] = None):
+        """
+        初始化文件缓存管理器
+        
+        Args:
+            cache_dir: 缓存文件目录
+            ttl: 默认TTL（秒）
+            max_memory_items: 内存缓存最多保留的条目数，超出时淘汰最久未使用的，None表示不限制
+        """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.ttl = ttl
-        self._memory_cache = {}
+        self.max_memory_items = max_memory_items
+        self._memory_cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
         self._lock = threading.RLock()
+        # 缓存文件由单个后台线程依次写入
+        self._write_queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
         self._stats = {
             'hits': 0,
             'misses': 0,
@@ -49,6 +63,7 @@ class FileCache:
             if key in self._memory_cache:
                 cache_data = self._memory_cache[key]
                 if not self._is_expired(cache_data):
+                    self._memory_cache.move_to_end(key)
                     self._stats['hits'] += 1
                     return cache_data['data']
                 else:
@@ -67,7 +82,7 @@ class FileCache:
                     
                     if not self._is_expired(cache_data):
                         # 加载到内存缓存
-                        self._memory_cache[key] = cache_data
+                        self._remember(key, cache_data)
                         self._stats['hits'] += 1
                         return cache_data['data']
                     else:
@@ -91,18 +106,33 @@ class FileCache:
             }
             
             # 保存到内存缓存
-            self._memory_cache[key] = cache_data
+            self._remember(key, cache_data)
             
             # 异步保存到文件
             cache_key = self._get_cache_key(key)
             cache_path = self._get_cache_path(cache_key)
-            
-            # 使用线程池异步写入文件，避免阻塞
-            threading.Thread(
-                target=self._write_cache_file,
-                args=(cache_path, cache_data),
-                daemon=True
-            ).start()
+            self._ensure_writer()
+            self._write_queue.put((cache_path, cache_data))
+    
+    def _remember(self, key: str, cache_data: Dict[str, Any]) -> None:
+        """放入内存缓存，超出条目上限时淘汰最久未使用的，调用方需持有锁"""
+        self._memory_cache[key] = cache_data
+        self._memory_cache.move_to_end(key)
+        if self.max_memory_items is not None:
+            while len(self._memory_cache) > self.max_memory_items:
+                self._memory_cache.popitem(last=False)
+    
+    def _ensure_writer(self) -> None:
+        """首次写入时启动后台写文件线程，调用方需持有锁"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_worker, name='FileCacheWriter', daemon=True)
+            self._writer.start()
+    
+    def _write_worker(self) -> None:
+        """后台线程：依次写入排队的缓存文件"""
+        while True:
+            cache_path, cache_data = self._write_queue.get()
+            self._write_cache_file(cache_path, cache_data)
     
     def _write_cache_file(self, cache_path: Path, cache_data: Dict[str, Any]) -> None:
         """异步写入缓存文件"""
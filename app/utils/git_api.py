@@ -2,7 +2,8 @@ import requests
 import yaml
 import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
@@ -253,6 +254,23 @@ class GitAPIClient:
     
     def get_diff(self, system_name: str, branch_name: str, master_branch: str = 'main') -> List[Dict]:
         """获取指定系统和分支的diff信息"""
+        results = sorted(self.iter_diff(system_name, branch_name, master_branch), key=lambda item: item[0])
+        return [project_result for _, project_result in results]
+    
+    def iter_diff(self, system_name: str, branch_name: str, master_branch: str = 'main',
+                  max_workers: int = 4) -> Iterator[Tuple[int, Dict]]:
+        """
+        并发获取系统下各项目的diff，每个项目获取完成后立即产出
+        
+        Args:
+            system_name: 系统名称
+            branch_name: 分支名称
+            master_branch: 对比的主分支
+            max_workers: 并发获取的项目数量
+            
+        Returns:
+            Iterator[Tuple[int, Dict]]: (项目在系统配置中的序号, 项目diff结果)，按完成顺序产出
+        """
         info(f"开始获取系统 '{system_name}' 的diff信息")
         debug(f"请求参数: branch_name={branch_name}, master_branch={master_branch}")
         
@@ -267,54 +285,73 @@ class GitAPIClient:
         if not system_config:
             error(f"系统 '{system_name}' 未找到")
             # 返回包含错误信息的结果，而不是抛出异常
-            return [{
+            yield 0, {
                 'project_name': 'unknown',
                 'repo_url': '',
                 'error': f"System '{system_name}' not found"
-            }]
+            }
+            return
         
         info(f"找到系统配置: {system_config.get('name', 'unknown')}, 项目数量: {len(system_config.get('projects', []))},找到系统配置: {system_config}")
         debug(f"系统 '{system_name}' 包含项目: {[p.get('name', 'unknown') for p in system_config.get('projects', [])]}")
         auth_headers = self._get_auth_headers(system_config)
-        results = []
+        projects = system_config.get('projects', [system_config])
+        success_count = 0
         
-        for project in system_config.get('projects', [system_config]):
-            project_name = project.get('name', 'unknown')
-            info(f"处理系统 '{system_name}' 下的项目: {project_name}")
-            debug(f"项目详情: owner={project.get('owner', 'unknown')}, repo={project.get('repo', 'unknown')}")
-            
-            try:
-                diff_data = self._get_project_diff(
-                    system_config, project, branch_name, master_branch, auth_headers
-                )
-                if diff_data:
-                    info(f"系统 '{system_name}' 的项目 {project_name} 获取diff成功")
-                    results.append({
-                        'project_name': project['name'],
-                        'repo_url': project['repo_url'],
-                        'diff_data': diff_data
-                    })
-                else:
-                    info(f"系统 '{system_name}' 的项目 {project_name} 无代码变更")
-                    # 无差异也返回占位，便于前端呈现"无变更"
-                    results.append({
-                        'project_name': project['name'],
-                        'repo_url': project['repo_url'],
-                        'diff_data': None
-                    })
-                self.set_dynamic_branches(system_config, project_name, project['repo_url'], branch_name)
-            except Exception as e:
-                error(f"系统 '{system_name}' 的项目 {project_name} 获取diff失败: {str(e)}")
-                # 不抛出整体异常，返回到结果中
-                results.append({
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(projects))),
+                                thread_name_prefix='GitDiff') as executor:
+            futures = {
+                executor.submit(
+                    self._get_project_result, system_name, system_config, project,
+                    branch_name, master_branch, auth_headers
+                ): index
+                for index, project in enumerate(projects)
+            }
+            for future in as_completed(futures):
+                project_result = future.result()
+                if 'error' not in project_result:
+                    success_count += 1
+                yield futures[future], project_result
+        
+        self._get_rate_limit(system_config)
+        info(f"系统 '{system_name}' diff获取完成，成功项目数: {success_count}, 失败项目数: {len(projects) - success_count}")
+    
+    def _get_project_result(self, system_name: str, system_config: Dict, project: Dict,
+                            branch_name: str, master_branch: str, auth_headers: Dict) -> Dict:
+        """获取单个项目的diff结果，失败时返回包含错误信息的结果"""
+        project_name = project.get('name', 'unknown')
+        info(f"处理系统 '{system_name}' 下的项目: {project_name}")
+        debug(f"项目详情: owner={project.get('owner', 'unknown')}, repo={project.get('repo', 'unknown')}")
+        
+        try:
+            diff_data = self._get_project_diff(
+                system_config, project, branch_name, master_branch, auth_headers
+            )
+            if diff_data:
+                info(f"系统 '{system_name}' 的项目 {project_name} 获取diff成功")
+                result = {
                     'project_name': project['name'],
                     'repo_url': project['repo_url'],
-                    'error': str(e)
-                })
-
-        self._get_rate_limit(system_config)
-        info(f"系统 '{system_name}' diff获取完成，成功项目数: {len([r for r in results if 'error' not in r])}, 失败项目数: {len([r for r in results if 'error' in r])}")
-        return results
+                    'diff_data': diff_data
+                }
+            else:
+                info(f"系统 '{system_name}' 的项目 {project_name} 无代码变更")
+                # 无差异也返回占位，便于前端呈现"无变更"
+                result = {
+                    'project_name': project['name'],
+                    'repo_url': project['repo_url'],
+                    'diff_data': None
+                }
+            self.set_dynamic_branches(system_config, project_name, project['repo_url'], branch_name)
+            return result
+        except Exception as e:
+            error(f"系统 '{system_name}' 的项目 {project_name} 获取diff失败: {str(e)}")
+            # 不抛出整体异常，返回到结果中
+            return {
+                'project_name': project['name'],
+                'repo_url': project['repo_url'],
+                'error': str(e)
+            }
     
     def _get_project_diff(self, system_config: Dict, project: Dict, branch_name: str, 
                          master_branch: str, auth_headers: Dict) -> Optional[Dict]:
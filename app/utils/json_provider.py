@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Flask JSON序列化 - 安装了orjson时使用orjson加速jsonify
+"""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """基于orjson的JSON提供者，orjson无法处理的数据回退到标准json"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """序列化为JSON字符串"""
+        # datetime交给default处理，与Flask默认输出格式保持一致
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            # 例如超出64位的整数
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        """解析JSON字符串"""
+        return orjson.loads(s)
+
+
+def init_json_provider(app) -> None:
+    """如果安装了orjson，则替换应用的JSON提供者"""
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
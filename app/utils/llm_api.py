@@ -190,11 +190,11 @@ class DeepSeekAPI:
         ]
         
         response = self.chat_completion(messages, max_retries=1)
-        debug(filename, f"单元测试原始响应: {response[:500]}...")
+        debug("%s 单元测试原始响应: %s...", filename, response[:500])
         
         try:
             result = self._extract_json(response)
-            debug(filename, f"单元测试JSON解析成功，键: {list(result.keys()) if isinstance(result, dict) else type(result)}")
+            debug("%s 单元测试JSON解析成功，键: %s", filename, list(result) if isinstance(result, dict) else type(result))
             return result
         except json.JSONDecodeError as e:
             error_msg = f"单元测试JSON解析失败: {str(e)}"
@@ -223,11 +223,11 @@ class DeepSeekAPI:
         ]
         
         response = self.chat_completion(messages, max_retries=1)
-        debug(filename, f"场景测试原始响应: {response[:500]}...")
+        debug("%s 场景测试原始响应: %s...", filename, response[:500])
         
         try:
             result = self._extract_json(response)
-            debug(filename, f"场景测试JSON解析成功，键: {list(result.keys()) if isinstance(result, dict) else type(result)}")
+            debug("%s 场景测试JSON解析成功，键: %s", filename, list(result) if isinstance(result, dict) else type(result))
             return result
         except json.JSONDecodeError as e:
             error_msg = f"场景测试JSON解析失败: {str(e)}"
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+LLM结果缓存 - 相同模型和提示词的解析结果持久化复用，避免重复调用
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from ..config_manager import config_manager
+from .file_cache import FileCache
+
+# 提示词外的结果格式或解析逻辑变化时递增，使旧缓存失效
+LLM_CACHE_VERSION = '2'
+# 内存中最多保留的结果数量，其余命中从磁盘读取
+LLM_CACHE_MEMORY_ITEMS = 256
+
+_llm_cache: Optional[FileCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def _get_llm_cache() -> Optional[FileCache]:
+    """获取LLM结果缓存实例，LLM_CACHE_TTL为0时禁用缓存返回None"""
+    global _llm_cache
+
+    ttl = config_manager.get_llm_cache_ttl()
+    if ttl <= 0:
+        return None
+
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = FileCache(
+                    cache_dir=str(config_manager.ensure_task_data_dir() / 'llm_cache'),
+                    ttl=ttl,
+                    max_memory_items=LLM_CACHE_MEMORY_ITEMS
+                )
+    return _llm_cache
+
+
+def llm_cache_key(model: str, prompt: str) -> str:
+    """根据缓存版本、模型和完整提示词（包含任务模板、文件名和补丁）生成缓存键"""
+    content = f'{LLM_CACHE_VERSION}\0{model}\0{prompt}'
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=32).hexdigest()
+
+
+def get_cached_result(model: str, prompt: str) -> Optional[Dict[str, Any]]:
+    """获取缓存的解析结果，未命中时返回None"""
+    cache = _get_llm_cache()
+    if cache is None:
+        return None
+
+    cached = cache.get(llm_cache_key(model, prompt))
+    # 缓存中保存的是JSON文本，每次解析出新对象，调用方修改结果不会污染缓存
+    return json.loads(cached) if isinstance(cached, str) else None
+
+
+def set_cached_result(model: str, prompt: str, result: Dict[str, Any]) -> None:
+    """缓存成功解析的结果，失败时的兜底结果不应写入"""
+    cache = _get_llm_cache()
+    if cache is not None:
+        cache.set(llm_cache_key(model, prompt), json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+通知合并发送 - 短时间内的多条任务通知收集后在同一轮中并发发送，减少逐条发送的等待
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .notification_manager import notification_manager, NotificationMessage, NotificationLevel
+from ..logger import info, warning, error
+
+# 单轮并发发送的最大通知数量
+BATCH_MAX = 32
+# 收到第一条通知后等待合并的时间窗口（毫秒）
+BATCH_MS = 500
+
+
+class NotificationBatcher:
+    """通知合并发送器，ERROR级别的通知不等待合并窗口，立即发送"""
+    
+    def __init__(self, batch_max: int = BATCH_MAX, batch_ms: int = BATCH_MS):
+        """
+        初始化通知合并发送器
+        
+        Args:
+            batch_max: 单轮并发发送的最大通知数量
+            batch_ms: 等待合并的时间窗口（毫秒）
+        """
+        self.batch_max = batch_max
+        self.batch_window = batch_ms / 1000
+        self._queue: 'queue.Queue[Tuple[Tuple[str, ...], Tuple[str, ...], NotificationMessage]]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        # 后台线程持有的事件循环，各提供者通过asyncio.gather并发发送
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def submit(self, providers: List[str], recipients: List[str], message: NotificationMessage) -> None:
+        """提交通知，由后台线程收集后批量发送"""
+        self._ensure_worker()
+        self._queue.put((tuple(providers), tuple(recipients), message))
+    
+    def _ensure_worker(self) -> None:
+        """首次提交时启动后台发送线程"""
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='NotificationBatcher', daemon=True)
+                    self._worker.start()
+    
+    def _run(self) -> None:
+        """后台线程：收集一个时间窗口内的通知，按提供者和收件人分组并发发送"""
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        while True:
+            batch = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                if item[2].level == NotificationLevel.ERROR:
+                    self._send(item[0], item[1], [item[2]])
+                else:
+                    batch.append(item)
+                
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_max or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            groups = {}
+            for providers, recipients, message in batch:
+                groups.setdefault((providers, recipients), []).append(message)
+            for (providers, recipients), messages in groups.items():
+                self._send(providers, recipients, messages)
+    
+    def _send(self, providers: Tuple[str, ...], recipients: Tuple[str, ...], messages: List[NotificationMessage]) -> None:
+        """在一轮中并发发送一组通知，每条通知保持原样（邮件依赖extra_data渲染报告链接和汇总）"""
+        try:
+            all_results = self._loop.run_until_complete(asyncio.gather(
+                *(notification_manager.send_notification_async(list(providers), list(recipients), message)
+                  for message in messages),
+                return_exceptions=True
+            ))
+        except Exception as e:
+            error(f"发送任务通知异常: {e}")
+            return
+        
+        for message, results in zip(messages, all_results):
+            if isinstance(results, BaseException):
+                error(f"发送任务通知异常: {results}")
+                continue
+            success_count = sum(1 for result in results if result.success)
+            if success_count > 0:
+                info(f"通知发送成功: {message.title} ({success_count}/{len(results)})")
+            else:
+                warning(f"通知发送失败: {message.title}")
+
+
+# 全局通知合并发送器实例
+notification_batcher = NotificationBatcher()
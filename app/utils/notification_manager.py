@@ -4,11 +4,15 @@
 """
 
 import time
+import uuid
+import threading
 import smtplib
 import json
 import asyncio
 import aiohttp
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -496,9 +500,22 @@ class WeChatWorkProvider(NotificationProvider):
 class NotificationManager:
     """通知管理器"""
     
-    def __init__(self):
-        """初始化通知管理器"""
+    def __init__(self, max_workers: int = 4):
+        """
+        初始化通知管理器
+        
+        Args:
+            max_workers: 并发发送通知的线程数
+        """
         self.providers: Dict[str, NotificationProvider] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='Notification')
+        
+        # 后台发送使用独立线程池，避免与提供者发送线程池互相等待
+        self._dispatch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='NotificationDispatch')
+        self._tickets: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._tickets_lock = threading.Lock()
+        self._max_tickets = 1000
+        
         self._load_providers()
     
     def _load_providers(self):
@@ -591,7 +608,7 @@ class NotificationManager:
         message: NotificationMessage
     ) -> List[NotificationResult]:
         """
-        同步发送通知
+        同步发送通知（各提供者并发执行，等待全部完成）
         
         Args:
             providers: 通知提供者名称或列表
@@ -604,32 +621,104 @@ class NotificationManager:
         if isinstance(providers, str):
             providers = [providers]
         
-        results = []
+        # 各提供者并发发送，结果按providers的顺序返回
+        pending = []
         for provider_name in providers:
             print(f"开始发送通知: {provider_name}，收件人: {recipients}")
             provider = self.providers.get(provider_name)
             if provider:
-                try:
-                    result = provider.send_sync(recipients, message)
-                    results.append(result)
-                except Exception as e:
-                    error(f"通知发送异常: {e}")
-                    results.append(NotificationResult(
-                        success=False,
-                        message=f"发送异常: {str(e)}",
-                        provider=provider_name,
-                        timestamp=str(time.time())
-                    ))
+                pending.append((provider_name, self._executor.submit(provider.send_sync, recipients, message)))
             else:
                 warning(f"通知提供者不存在: {provider_name}")
+                pending.append((provider_name, None))
+        
+        results = []
+        for provider_name, future in pending:
+            if future is None:
                 results.append(NotificationResult(
                     success=False,
                     message=f"通知提供者不存在: {provider_name}",
                     provider=provider_name,
                     timestamp=str(time.time())
                 ))
+                continue
+            
+            try:
+                results.append(future.result())
+            except Exception as e:
+                error(f"通知发送异常: {e}")
+                results.append(NotificationResult(
+                    success=False,
+                    message=f"发送异常: {str(e)}",
+                    provider=provider_name,
+                    timestamp=str(time.time())
+                ))
         
         return results
+    
+    def submit_notification(
+        self,
+        providers: Union[str, List[str]],
+        recipients: List[str],
+        message: NotificationMessage
+    ) -> str:
+        """
+        提交后台发送通知，立即返回发送编号
+        
+        Args:
+            providers: 通知提供者名称或列表
+            recipients: 收件人列表
+            message: 通知消息
+            
+        Returns:
+            发送编号，可通过 get_ticket 查询发送结果
+        """
+        ticket_id = uuid.uuid4().hex
+        with self._tickets_lock:
+            self._tickets[ticket_id] = {
+                'status': 'pending',
+                'results': [],
+                'created_at': str(time.time())
+            }
+            # 只保留最近的发送记录
+            while len(self._tickets) > self._max_tickets:
+                self._tickets.popitem(last=False)
+        
+        self._dispatch_executor.submit(self._dispatch_ticket, ticket_id, providers, recipients, message)
+        return ticket_id
+    
+    def get_ticket(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """获取后台发送记录，不存在时返回None"""
+        with self._tickets_lock:
+            ticket = self._tickets.get(ticket_id)
+            return dict(ticket) if ticket else None
+    
+    def _dispatch_ticket(
+        self,
+        ticket_id: str,
+        providers: Union[str, List[str]],
+        recipients: List[str],
+        message: NotificationMessage
+    ) -> None:
+        """在后台线程中执行发送并记录结果"""
+        try:
+            results = self.send_notification_sync(providers, recipients, message)
+            status = 'completed'
+        except Exception as e:
+            error(f"后台发送通知异常: {e}")
+            results = [NotificationResult(
+                success=False,
+                message=f"发送异常: {str(e)}",
+                provider="unknown",
+                timestamp=str(time.time())
+            )]
+            status = 'failed'
+        
+        with self._tickets_lock:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is not None:
+                ticket['status'] = status
+                ticket['results'] = results
 
 
 # 全局通知管理器实例
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+任务状态延迟写入 - 状态更新先入队，由后台线程合并后批量写入任务文件
+"""
+
+import atexit
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+from ..task_processor import TaskStatusManager
+from ..logger import error
+
+# 单次批量写入的最大更新数量
+BATCH = 64
+# 收到第一条更新后等待合并的时间（毫秒）
+FLUSH_MS = 100
+# 进程退出时等待剩余更新写完的最长时间（秒）
+_EXIT_FLUSH_TIMEOUT = 10
+
+
+class StatusWriter:
+    """任务状态延迟写入器，flush=True的更新会等待写入完成后再返回"""
+    
+    def __init__(self, batch: int = BATCH, flush_ms: int = FLUSH_MS):
+        """
+        初始化任务状态延迟写入器
+        
+        Args:
+            batch: 单次批量写入的最大更新数量
+            flush_ms: 等待合并的时间（毫秒）
+        """
+        self.batch = batch
+        self.flush_window = flush_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+    
+    def schedule(self, task_id: Optional[str], status: Optional[str], payload: Optional[Dict] = None,
+                 flush: bool = False, timeout: Optional[float] = None) -> None:
+        """
+        提交任务状态更新
+        
+        Args:
+            task_id: 任务ID，为None时只等待之前的更新写完
+            status: 任务状态
+            payload: 任务结果数据
+            flush: 是否等待本次及之前的更新写入完成
+            timeout: flush时的最长等待时间（秒）
+        """
+        self._ensure_worker()
+        done = threading.Event() if flush else None
+        self._queue.put((task_id, status, payload, done))
+        if done is not None:
+            done.wait(timeout)
+    
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的更新全部写入"""
+        if self._worker is not None:
+            self.schedule(None, None, flush=True, timeout=timeout)
+    
+    def _ensure_worker(self) -> None:
+        """首次提交时启动后台写入线程"""
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='StatusWriter', daemon=True)
+                    self._worker.start()
+    
+    def _run(self) -> None:
+        """后台线程：收集一小段时间内的更新，按提交顺序批量写入"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_window
+            # 需要立即落盘的更新不再等待合并
+            while len(batch) < self.batch and batch[-1][3] is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            rows = [(task_id, status, payload) for task_id, status, payload, _ in batch if task_id is not None]
+            try:
+                if rows:
+                    TaskStatusManager.bulk_update_task_status(rows)
+            except Exception as e:
+                error(f"批量写入任务状态失败: {e}")
+            finally:
+                for _, _, _, done in batch:
+                    if done is not None:
+                        done.set()
+
+
+# 全局任务状态延迟写入器实例
+status_writer = StatusWriter()
+atexit.register(status_writer.flush, timeout=_EXIT_FLUSH_TIMEOUT)
+
+
+def schedule_status(task_id: str, status: str, payload: Optional[Dict] = None, flush: bool = False) -> None:
+    """提交任务状态更新，flush=True时等待写入完成"""
+    status_writer.schedule(task_id, status, payload, flush=flush)
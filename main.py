@@ -4,6 +4,15 @@
 """
 
 import os
+
+# 设置USE_GEVENT=1时用gevent协程替换线程、锁和socket等阻塞原语，必须在导入其他模块前执行
+if os.environ.get('USE_GEVENT') == '1':
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        print("USE_GEVENT=1 but gevent is not installed, falling back to threads")
+
 import sys
 import subprocess
 import time
@@ -27,8 +36,8 @@ def check_requirements():
     print("Checking environment...")
     
     # 检查Python版本
-    if sys.version_info < (3, 8):
-        print("[ERROR] Python 3.8+ required")
+    if sys.version_info < (3, 10):
+        print("[ERROR] Python 3.10+ required")
         return False
     
     # 检查依赖
@@ -30,8 +30,8 @@ def check_requirements():
     print("🔍 检查运行环境...")
     
     # 检查Python版本
-    if sys.version_info < (3, 8):
-        print("❌ 错误：需要Python 3.8或更高版本")
+    if sys.version_info < (3, 10):
+        print("❌ 错误：需要Python 3.10或更高版本")
         print("   当前版本：{}".format(sys.version))
         return False
     
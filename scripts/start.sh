@@ -11,16 +11,16 @@ echo
 
 # 检查Python是否安装
 if ! command -v python3 &> /dev/null; then
-    echo "❌ 错误：未找到Python3，请先安装Python 3.8+"
+    echo "❌ 错误：未找到Python3，请先安装Python 3.10+"
     exit 1
 fi
 
 # 检查Python版本
 python_version=$(python3 -c 'import sys; print(".".join(map(str, sys.version_info[:2])))')
-required_version="3.8"
+required_version="3.10"
 
 if [ "$(printf '%s\n' "$required_version" "$python_version" | sort -V | head -n1)" != "$required_version" ]; then
-    echo "❌ 错误：需要Python 3.8或更高版本，当前版本：$python_version"
+    echo "❌ 错误：需要Python 3.10或更高版本，当前版本：$python_version"
     exit 1
 fi
 